@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+# Besides being used from the command line, this script is imported by alignmentEntropy.py, alignmentConsensus.py,
+# fastaSplit.py and fastaStats.py, so keep it in the same folder as them.
+
+import argparse
+import hashlib
+import os
+import sys
+import numpy as np
+
+CACHE = os.path.join(os.path.expanduser("~"), ".cache", "fastaCache")
+
+SAMPLE = 1 << 20
+
+# Cache keys _______________________________________________________________________________________
+def cacheKey(fileIn):
+	"""Content-addressed key of a file: hash of its size, modification time and first and last MB.
+	Hashing the whole file would cost a full read every time, which is what the cache tries to avoid."""
+	stat = os.stat(fileIn)
+	h = hashlib.blake2b(digest_size=16)
+	h.update(str(stat.st_size).encode() + b"\t" + str(stat.st_mtime_ns).encode())
+	with open(fileIn, "rb") as f:
+		h.update(f.read(SAMPLE))
+		if stat.st_size > SAMPLE:
+			f.seek(max(SAMPLE, stat.st_size - SAMPLE))
+			h.update(f.read(SAMPLE))
+	return h.hexdigest()
+
+def cacheFiles(fileIn, cache):
+	key = os.path.join(cache, cacheKey(fileIn))
+	return key + ".names.txt", key + ".seqs.npy", key + ".offsets.npy"
+
+# Parsing __________________________________________________________________________________________
+def parseFasta(fileIn):
+	"""Parses a fasta file into a list of headers, one flat uint8 array with all sequences and the offsets of each sequence in it."""
+	names = list()
+	offsets = [0]
+	sequences = bytearray()
+	sequence = list()
+	for line in open(fileIn, "rb"):
+		if line.startswith(b">"):
+			if names:
+				sequences += b"".join(sequence)
+				offsets.append(len(sequences))
+				sequence = list()
+			names.append(line[1:].strip().decode())
+		else:
+			sequence.append(line.rstrip(b"\r\n"))
+	if names:
+		sequences += b"".join(sequence)
+		offsets.append(len(sequences))
+	return names, np.frombuffer(sequences, dtype=np.uint8), np.array(offsets, dtype=np.int64)
+
+# Loading __________________________________________________________________________________________
+def loadFasta(fileIn, cache=None, verbose=False):
+	"""Returns the headers, sequences and offsets of a fasta file (see parseFasta).
+	If a cache directory is given, they are read with a zero-copy memory map if the file was already parsed, or stored for the next time otherwise."""
+	if cache is None:
+		return parseFasta(fileIn)
+	namesFile, seqsFile, offsetsFile = cacheFiles(fileIn, cache)
+	if os.path.exists(namesFile) and os.path.exists(seqsFile) and os.path.exists(offsetsFile):
+		if verbose:
+			print("    Reading cached alignment:", seqsFile)
+		with open(namesFile) as f:
+			names = f.read().split("\n")[:-1]
+		return names, np.load(seqsFile, mmap_mode="r"), np.load(offsetsFile, mmap_mode="r")
+	names, sequences, offsets = parseFasta(fileIn)
+	os.makedirs(cache, exist_ok=True)
+	# Written to temporary files first so a half written cache is never read
+	for path, array in ((seqsFile, sequences), (offsetsFile, offsets)):
+		with open(path + ".tmp", "wb") as f:
+			np.save(f, array)
+		os.replace(path + ".tmp", path)
+	with open(namesFile + ".tmp", "w") as f:
+		for name in names:
+			f.write(name + "\n")
+	os.replace(namesFile + ".tmp", namesFile)
+	if verbose:
+		print("    Alignment cached in:", seqsFile)
+	return names, sequences, offsets
+
+def alignmentMatrix(sequences, offsets):
+	"""Returns the sequences as a (sequences x positions) matrix without copying them, or None if they are not aligned."""
+	lengths = np.diff(offsets)
+	if len(lengths) == 0 or (lengths != lengths[0]).any():
+		return None
+	return sequences.reshape(len(lengths), int(lengths[0]))
+
+def sequence(sequences, offsets, i):
+	"""Returns the i-th sequence as a string."""
+	return sequences[offsets[i]:offsets[i+1]].tobytes().decode()
+
+def seqRecords(names, sequences, offsets):
+	"""Yields every sequence as a Biopython SeqRecord, as SeqIO.parse would do."""
+	from Bio.Seq import Seq
+	from Bio.SeqRecord import SeqRecord
+	for i, name in enumerate(names):
+		tmp = name.split()
+		yield SeqRecord(Seq(sequence(sequences, offsets, i)), id=tmp[0] if tmp else "", name=tmp[0] if tmp else "", description=name)
+
+# Command line _____________________________________________________________________________________
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Parses fasta files once and stores them in a binary cache that can be memory-mapped by alignmentEntropy.py, alignmentConsensus.py, fastaSplit.py and fastaStats.py (with their '-C/--cache' option), or removes the cache.")
+
+	parser.add_argument("-f", "--file", dest="fileIn", nargs='+', required=False, default=list(),
+						help="Fasta file(s) to be cached.")
+
+	parser.add_argument("-C", "--cache", dest="cache", required=False, default=CACHE,
+						help="The cache directory. By default = %(default)s.")
+
+	parser.add_argument("-c", "--clear", dest="clear", required=False, action="store_true",
+						help="If selected, removes every file in the cache directory.")
+
+	parser.add_argument("-v", "--verbose", dest="verbose", required=False, action="store_false",
+						help="If selected, will not print information to the console.")
+
+	args = parser.parse_args()
+
+	if args.clear:
+		if os.path.isdir(args.cache):
+			for f in os.listdir(args.cache):
+				if f.endswith((".names.txt", ".seqs.npy", ".offsets.npy", ".tmp")):
+					os.remove(os.path.join(args.cache, f))
+		if args.verbose:
+			print("  Cache cleared:", args.cache)
+	elif len(args.fileIn) == 0:
+		print("Error: Please provide at least one fasta file with '-f/--file' or '-c/--clear'.")
+		sys.exit(1)
+
+	for fileIn in args.fileIn:
+		if args.verbose:
+			print("  Caching", fileIn)
+		loadFasta(fileIn, args.cache, args.verbose)
+
+	if args.verbose:
+		print("Done")
@@ -3,6 +3,9 @@
 import argparse
 import re
 import sys
+import numpy as np
+from alignmentCache import CACHE, loadFasta, alignmentMatrix
+from alignmentPatterns import BLOCK, sitePatterns, expand
 
 parser = argparse.ArgumentParser(description="Builds a consensus sequence of an alignment.")
 
@@ -36,36 +39,27 @@ parser.add_argument("-m", "--most", dest="most", required=False, action="store_t
 parser.add_argument("-r", "--removeGaps", dest="removeGaps", required=False, action="store_true",
                     help="If selected, gaps in the consensus sequence will be remove.")
 
+parser.add_argument("-O", "--outliers", dest="outliers", required=False, default=None,
+					help="If selected, compares every sequence to the most abundant base of each position (or the position is a gap if the proportion of gaps is more than 'g') and exports to the given file a table ranked by the proportion of mismatches, flagging outliers (e.g.; misaligned or chimeric sequences).")
+
+parser.add_argument("-G", "--groups", dest="groups", required=False, default=None,
+					help="A tab delimited table with the sequence names in one column and a group in the second column. If selected together with '-O/--outliers', each sequence is compared to the consensus of its group and outliers are detected within each group.")
+
+parser.add_argument("-z", "--zscore", dest="zscore", required=False, type=float, default=3.5,
+					help="Sequences with a robust z-score (based on the median and the median absolute deviation of the proportion of mismatches) above this value are flagged as outliers. If more than half of the sequences of a group have the median proportion (so the median absolute deviation is 0), the mean absolute deviation is used instead, and if all of them have the same proportion none is flagged. Default=%(default)s")
+
+parser.add_argument("-B", "--block", dest="block", required=False, type=int, default=4096,
+					help="Number of sequences processed at once when looking for outliers. Default=%(default)s")
+
+parser.add_argument("-C", "--cache", dest="cache", required=False, nargs='?', default=None, const=CACHE,
+					help="If selected, the parsed alignment is stored in (or read from) a binary cache so other tools do not have to parse it again. A directory can be given, by default = " + CACHE + ".")
+
 parser.add_argument("-v", "--verbose", dest="verbose", required=False, action="store_false",
 					help="If selected, will not print information to the console.")
 
 args = parser.parse_args()
 
 # Setting variables and functions __________________________________________________________________
-def readFasta(fastafile):
-	out = {}
-	for line in open(fastafile):
-		if line.startswith(">"):
-			name = line.replace(">", "")
-			name = name.replace("\n", "")
-			out[name] = str()
-		else:
-			sequence = line.replace("\n", "")
-			sequence = sequence.upper()
-			out[name] = (out[name] + sequence)
-	return out
-
-def parseAlignment(dictionary, length):
-	out = {}
-	for i in range(1, length+1):
-		out[i] = list()
-	for vals in fasta.values():
-		i = 0
-		for position in list(vals):
-			i += 1
-			out[i].append(position)
-	return out
-
 if args.verbose:
 	print("  Setting variables")
 	print("    Alignment:  ", args.inFile)
@@ -87,34 +81,34 @@ iupac = {"A":"A", "C":"C", "G":"G", "T":"T", "AG":"R", "GA":"R", "CT":"Y", "TC":
 if args.verbose:
 	print("  Reading and parsing alignment")
 
-fasta = readFasta(args.inFile)
-
-length = set()
-for vals in fasta.values():
-	length.add(len(vals))
-
-if len(length) != 1:
+names, sequences, offsets = loadFasta(args.inFile, args.cache, args.verbose)
+matrix = alignmentMatrix(sequences, offsets)
+if matrix is None:
 	print("  Error! Input file is not aligned. Exiting...")
 	sys.exit(1)
-else:
-	length = next(iter(length))
+sequences, length = matrix.shape
 
-sequences = len(fasta)
-
-fasta = parseAlignment(fasta, length)
+# Identical columns are compressed into unique site patterns, so the consensus is called once per pattern
+upper = bytes.maketrans(b"abcdefghijklmnopqrstuvwxyz", b"ABCDEFGHIJKLMNOPQRSTUVWXYZ")
+upper = np.frombuffer(upper, dtype=np.uint8)
+patterns, weights, index = sitePatterns(matrix, upper)
+fasta = {}
+for i in range(patterns.shape[1]):
+	fasta[i+1] = list(patterns[:, i].tobytes().decode())
 
 if args.verbose:
 	print("    Sequences: ", sequences, sep="")
 	print("    Positions: ", length, sep="")
+	print("    Site patterns: ", len(fasta), sep="")
 
 # Building consensus _______________________________________________________________________________
 if args.verbose:
 	print("  Building consensus", end="")
 	pcti = 0
-consensus = list()
+calls = list()
 for position, values in fasta.items():
 	if args.verbose:
-		pct = round(position/length*100)
+		pct = round(position/len(fasta)*100)
 		if pct > pcti:
 			pcti = pct
 			print("\r  Building consensus\t", pct, "%", sep="", end="")
@@ -151,6 +145,7 @@ for position, values in fasta.items():
 				most = b
 				mostAbun = C
 	# Now finally calling the base
+	consensus = list()
 	if base is not None:
 		if args.removeGaps:
 			if base != "-":
@@ -166,6 +161,9 @@ for position, values in fasta.items():
 			if base not in "ACGT":
 				base = "N"
 		consensus.append(base)
+	calls.append("".join(consensus))
+
+consensus = expand(calls, index)
 
 consensusOut = "".join(consensus)
 
@@ -190,6 +188,92 @@ if args.outFile is not None:
 else:
 	print(str(consensusOut))
 
+# Looking for outliers _____________________________________________________________________________
+if args.outliers is not None:
+	if args.verbose:
+		print("  Looking for outliers")
+	ids = [name.split(" ")[0] for name in names]
+	groupOf = np.zeros(sequences, dtype=np.int64)
+	groupNames = ["all"]
+	if args.groups is not None:
+		table = {}
+		for line in open(args.groups):
+			tmp = line.strip().split("\t")
+			if len(tmp) >= 2:
+				table[tmp[0]] = tmp[1]
+		groupNames = list(dict.fromkeys(table.get(i, "NA") for i in ids))
+		groupIndex = {g: i for i, g in enumerate(groupNames)}
+		groupOf = np.array([groupIndex[table.get(i, "NA")] for i in ids], dtype=np.int64)
+	characters = np.unique(patterns)
+	code = np.zeros(256, dtype=np.int64)
+	code[characters] = np.arange(len(characters))
+	isGap = np.zeros(256, dtype=bool)
+	isGap[[ord("-"), ord(".")]] = True
+	noCall = isGap.copy()
+	noCall[[ord("N"), ord("?")]] = True
+	gapCharacters = isGap[characters]
+	noCallCharacters = noCall[characters]
+	sizes = np.bincount(groupOf, minlength=len(groupNames))
+	# Consensus of each group: the most abundant base (ignoring 'N' and '?'), 'N' if there is none, or a gap if there are too many gaps.
+	# Characters are counted per group for a block of positions at a time, in blocks of sequences, so the counts never take more than about BLOCK bytes
+	groupChars = len(groupNames) * len(characters)
+	width = max(1, min(BLOCK // (8 * groupChars), BLOCK // (8 * args.block)))
+	consensusGroups = np.zeros((len(groupNames), length), dtype=np.uint8)
+	for p in range(0, length, width):
+		positions = min(width, length - p)
+		counts = np.zeros(groupChars * positions, dtype=np.int32)
+		for r in range(0, sequences, args.block):
+			block = code[upper[matrix[r:r+args.block, p:p+positions]]]
+			key = (groupOf[r:r+args.block, None] * len(characters) + block) * positions + np.arange(positions)
+			counts += np.bincount(key.ravel(), minlength=len(counts)).astype(np.int32)
+		counts = counts.reshape(len(groupNames), len(characters), positions)
+		gapped = counts[:, gapCharacters, :].sum(axis=1) / np.maximum(sizes, 1)[:, None] >= args.gaps
+		counts[:, noCallCharacters, :] = -1
+		consensusGroups[:, p:p+positions] = characters[counts.argmax(axis=1)]
+		consensusGroups[:, p:p+positions][counts.max(axis=1) <= 0] = ord("N")
+		consensusGroups[:, p:p+positions][gapped] = ord("-")
+	# Mismatches and gaps of every sequence against the consensus of its group
+	compared = np.zeros(sequences, dtype=np.int64)
+	mismatches = np.zeros(sequences, dtype=np.int64)
+	internalGaps = np.zeros(sequences, dtype=np.int64)
+	insertions = np.zeros(sequences, dtype=np.int64)
+	for r in range(0, sequences, args.block):
+		block = upper[matrix[r:r+args.block]]
+		ref = consensusGroups[groupOf[r:r+args.block]]
+		refBase = ~isGap[ref]
+		seqBase = ~isGap[block]
+		valid = refBase & ~noCall[ref] & ~noCall[block]
+		compared[r:r+args.block] = valid.sum(axis=1)
+		mismatches[r:r+args.block] = (valid & (block != ref)).sum(axis=1)
+		internalGaps[r:r+args.block] = (refBase & ~seqBase).sum(axis=1)
+		insertions[r:r+args.block] = (~refBase & seqBase).sum(axis=1)
+	proportion = mismatches / np.maximum(compared, 1)
+	# Robust z-scores within each group
+	zscores = np.zeros(sequences)
+	for g in range(len(groupNames)):
+		rows = groupOf == g
+		if rows.sum() == 0:
+			continue
+		median = np.median(proportion[rows])
+		deviation = np.abs(proportion[rows] - median)
+		# The mean absolute deviation (scaled as the median one to the standard deviation of a normal distribution) when the median absolute deviation is 0
+		scale = np.median(deviation) * 1.4826
+		if scale == 0:
+			scale = np.mean(deviation) * 1.2533
+		if scale > 0:
+			zscores[rows] = (proportion[rows] - median) / scale
+	order = np.argsort(-proportion, kind="stable")
+	outliers = 0
+	with open(args.outliers, "w") as outfile:
+		print("sequence\tgroup\tcompared\tmismatches\tproportionMismatches\tgaps\tinsertions\trobustZ\toutlier", file=outfile)
+		for i in order.tolist():
+			outlier = zscores[i] > args.zscore
+			outliers += int(outlier)
+			print(ids[i], groupNames[groupOf[i]], compared[i], mismatches[i], round(float(proportion[i]), 4), internalGaps[i], insertions[i], round(float(zscores[i]), 2), outlier, sep="\t", file=outfile)
+	if args.verbose:
+		print("    ", outliers, " outlier sequence(s) found", sep="")
+		print("    Table exported to:", args.outliers)
+
 # __________________________________________________________________________________________________
 if args.verbose:
 	if args.outFile is None:
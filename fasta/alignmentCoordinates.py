@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+# Besides being used from the command line, this script is imported by fastaSplit.py and fastaUnalign.py,
+# so keep it in the same folder as them.
+
+import argparse
+import re
+import sys
+import numpy as np
+from alignmentCache import CACHE, loadFasta, alignmentMatrix
+
+GAPS = b"-."
+
+# Building the index _______________________________________________________________________________
+def gapTable(gaps=GAPS):
+	isGap = np.zeros(256, dtype=bool)
+	isGap[list(gaps)] = True
+	return isGap
+
+def residueIndex(row, gaps=GAPS):
+	"""Cumulative number of residues (non gap characters) of an aligned sequence up to every column, as a compact integer array."""
+	dtype = np.uint16 if len(row) < 65535 else np.uint32
+	return np.cumsum(~gapTable(gaps)[np.asarray(row)], dtype=dtype)
+
+def columnToResidue(index, column):
+	"""Residue (1-based) found at a column (1-based) of the alignment, or the previous residue if the column is a gap (0 if there is none). O(1)."""
+	if column < 1 or column > len(index):
+		raise ValueError("column " + str(column) + " is out of the alignment (1-" + str(len(index)) + ")")
+	return int(index[column-1])
+
+def residueToColumn(index, residue):
+	"""Column (1-based) of the alignment where a residue (1-based) of the sequence is found. O(log n)."""
+	if residue < 1 or residue > index[-1]:
+		raise ValueError("residue " + str(residue) + " is out of the sequence (1-" + str(int(index[-1])) + ")")
+	return int(np.searchsorted(index, residue)) + 1
+
+def findSequence(names, name):
+	"""Position of a sequence given its name (the header up to the first space, or the whole header)."""
+	for i, header in enumerate(names):
+		if header == name or header.split(" ")[0] == name:
+			return i
+	raise ValueError("sequence '" + name + "' not found")
+
+def exportIndex(fileIn, fileOut, gaps=GAPS, cache=None, block=4096):
+	"""Exports the index of every sequence of an alignment as a (sequences x positions) '.npy' matrix, and the sequence names to a '_names.txt' file."""
+	names, sequences, offsets = loadFasta(fileIn, cache)
+	matrix = alignmentMatrix(sequences, offsets)
+	if matrix is None:
+		raise ValueError("'" + fileIn + "' is not aligned")
+	n, length = matrix.shape
+	isGap = gapTable(gaps)
+	out = np.lib.format.open_memmap(fileOut, mode="w+", dtype=np.uint16 if length < 65535 else np.uint32, shape=(n, length))
+	for r in range(0, n, block):
+		np.cumsum(~isGap[matrix[r:r+block]], axis=1, dtype=out.dtype, out=out[r:r+block])
+	out.flush()
+	del out
+	namesFile = re.sub("\\.npy$", "", fileOut) + "_names.txt"
+	with open(namesFile, "w") as outfile:
+		for name in names:
+			print(name, file=outfile)
+	return namesFile
+
+# Command line _____________________________________________________________________________________
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Maps alignment columns to positions in the ungapped sequences (residues) and the other way around. Either exports the index of every sequence, or prints the position of the given columns or residues for one sequence.")
+
+	requiredArgs = parser.add_argument_group('required arguments')
+
+	requiredArgs.add_argument("-f", "--file", dest="file_in", required=True,
+						help="An aligned fasta file.")
+
+	parser.add_argument("-o", "--output", dest="file_out", required=False, default=None,
+						help="Output index ('.npy') of every sequence, with the sequence names in a '_names.txt' file. By default will add '_coordinates.npy' to the file name excluding the extension.")
+
+	parser.add_argument("-s", "--sequence", dest="sequence", required=False, default=None,
+						help="A sequence name. If selected, prints to the console the residues of the given columns ('-c') or the columns of the given residues ('-r') of this sequence instead of exporting the index.")
+
+	parser.add_argument("-c", "--columns", dest="columns", required=False, nargs='+', type=int, default=list(),
+						help="Alignment columns (1-based) to be mapped to residues of the sequence.")
+
+	parser.add_argument("-r", "--residues", dest="residues", required=False, nargs='+', type=int, default=list(),
+						help="Residues (1-based) of the sequence to be mapped to alignment columns.")
+
+	parser.add_argument("-g", "--gaps", dest="gaps", required=False, default=GAPS.decode(),
+						help="The character(s) representing the gaps. By default='%(default)s'.")
+
+	parser.add_argument("-C", "--cache", dest="cache", required=False, nargs='?', default=None, const=CACHE,
+						help="If selected, the parsed alignment is stored in (or read from) a binary cache (see alignmentCache.py). A directory can be given, by default = " + CACHE + ".")
+
+	parser.add_argument("-v", "--verbose", dest="verbose", required=False, action="store_false",
+						help="If selected, will not print information to the console.")
+
+	args = parser.parse_args()
+
+	gaps = args.gaps.encode()
+	try:
+		if args.sequence is not None:
+			names, sequences, offsets = loadFasta(args.file_in, args.cache)
+			i = findSequence(names, args.sequence)
+			index = residueIndex(sequences[offsets[i]:offsets[i+1]], gaps)
+			print("column\tresidue")
+			for column in args.columns:
+				print(column, columnToResidue(index, column), sep="\t")
+			for residue in args.residues:
+				print(residueToColumn(index, residue), residue, sep="\t")
+		else:
+			if args.file_out is None:
+				outFile = re.sub("\\.[^\\.]+$", "", args.file_in) + "_coordinates.npy"
+			else:
+				outFile = args.file_out
+			namesFile = exportIndex(args.file_in, outFile, gaps, args.cache)
+			if args.verbose:
+				print("  Exported index:", outFile)
+				print("  Sequence names:", namesFile)
+				print("Done")
+	except (ValueError, IndexError) as e:
+		print("Error:", e)
+		sys.exit(1)
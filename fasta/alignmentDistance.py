@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+
+import argparse
+import re
+import sys
+from multiprocessing import Pool
+import numpy as np
+from alignmentCache import CACHE, loadFasta, alignmentMatrix
+
+parser = argparse.ArgumentParser(description="Computes the pairwise identity (or p-distance) between all sequences of an aligned fasta file. The matrix is exported as a memory-mapped numpy file (.npy) with the sequence names in a separate file, which can be given to 'networks/matrix2net.py', or as a tab separated matrix.")
+
+# Add the arguments to the parser
+requiredArgs = parser.add_argument_group('required arguments')
+
+requiredArgs.add_argument("-f", "--file", dest="file_in", required=True,
+					help="An aligned fasta file.")
+
+parser.add_argument("-o", "--output", dest="file_out", required=False, default=None,
+					help="Output file name. If it ends with '.tsv' a tab separated matrix is exported, otherwise a '.npy' matrix and a '_names.txt' file with the sequence names in the same order. By default will replace the extension of the input file by '_identity.npy' (or '_distance.npy').")
+
+parser.add_argument("-d", "--distance", dest="distance", required=False, action="store_true",
+					help="If selected, exports the p-distance (proportion of different positions, 0-1) instead of the identity (percentage of identical positions, 0-100).")
+
+parser.add_argument("-g", "--gaps", dest="gaps", required=False, default="pairwise", choices=['pairwise', 'count'],
+					help="How gaps ('-' and '.') are treated: 'pairwise' (default) ignores every position with a gap in any of the two sequences, 'count' counts a gap against a base as a difference and only ignores positions with a gap in both sequences.")
+
+parser.add_argument("-b", "--block", dest="block", required=False, default=1024, type=int,
+					help="Number of sequences compared at once in each block. By default=%(default)s.")
+
+parser.add_argument("-t", "--threads", dest="threads", required=False, default=1, type=int,
+					help="Number of blocks computed in parallel. By default=%(default)s.")
+
+parser.add_argument("-C", "--cache", dest="cache", required=False, nargs='?', default=None, const=CACHE,
+					help="If selected, the parsed alignment is stored in (or read from) a binary cache (see alignmentCache.py). A directory can be given, by default = " + CACHE + ".")
+
+parser.add_argument("-v", "--verbose", dest="verbose", required=False, action="store_false",
+					help="If selected, will not print information to the console.")
+
+args = parser.parse_args()
+
+# Setting variables ________________________________________________________________________________
+if args.file_out is None:
+	outFile = re.sub("\\.[^\\.]+$", "", args.file_in) + ("_distance.npy" if args.distance else "_identity.npy")
+else:
+	outFile = args.file_out
+tsv = outFile.endswith(".tsv")
+if tsv:
+	npyFile = outFile + ".tmp.npy"
+else:
+	npyFile = outFile if outFile.endswith(".npy") else outFile + ".npy"
+namesFile = re.sub("\\.npy$", "", npyFile) + "_names.txt"
+
+# Upper cases and every gap character coded as '-'
+code = bytes(range(256)).translate(bytes.maketrans(b"abcdefghijklmnopqrstuvwxyz.", b"ABCDEFGHIJKLMNOPQRSTUVWXYZ-"))
+code = np.frombuffer(code, dtype=np.uint8)
+GAP = ord("-")
+
+def presentStates(matrix, block):
+	"""Characters (once coded) found in the alignment other than gaps, from a table of the bytes seen in every block of sequences."""
+	seen = np.zeros(256, dtype=bool)
+	for r in range(0, matrix.shape[0], block):
+		seen |= np.bincount(matrix[r:r+block].ravel(), minlength=256) > 0
+	return [s for s in np.unique(code[np.flatnonzero(seen)]).tolist() if s != GAP]
+
+# Comparing blocks _________________________________________________________________________________
+def setup(alignment, alignmentStates):
+	"""Sets the alignment and its states in the main process and in every worker, so workers do not read the alignment again."""
+	global matrix, states, n
+	matrix = alignment
+	states = alignmentStates
+	n = matrix.shape[0]
+
+def oneHot(rows):
+	block = code[matrix[rows[0]:rows[1]]]
+	return [(block == s).astype(np.float32) for s in states], (block != GAP).astype(np.float32)
+
+def compareBlocks(pair):
+	# Identical positions and compared positions of every pair of sequences are counted with matrix products of one-hot encodings
+	bi, bj = pair
+	ri = (bi, min(bi + args.block, n))
+	rj = (bj, min(bj + args.block, n))
+	hotI, baseI = oneHot(ri)
+	if bi == bj:
+		hotJ, baseJ = hotI, baseI
+	else:
+		hotJ, baseJ = oneHot(rj)
+	same = sum(x @ y.T for x, y in zip(hotI, hotJ))
+	if args.gaps == "pairwise":
+		compared = baseI @ baseJ.T
+	else:
+		length = matrix.shape[1]
+		compared = length - (1 - baseI) @ (1 - baseJ).T
+	with np.errstate(divide="ignore", invalid="ignore"):
+		if args.distance:
+			values = 1 - same / compared
+		else:
+			values = same / compared * 100
+	out = np.lib.format.open_memmap(npyFile, mode="r+")
+	out[ri[0]:ri[1], rj[0]:rj[1]] = values
+	out[rj[0]:rj[1], ri[0]:ri[1]] = values.T
+	out.flush()
+	del out
+	return pair
+
+# Computing ________________________________________________________________________________________
+if __name__ == "__main__":
+	names, sequences, offsets = loadFasta(args.file_in, args.cache)
+	alignment = alignmentMatrix(sequences, offsets)
+	if alignment is None:
+		print("Error: Input file is not aligned.")
+		sys.exit(1)
+	ids = [name.split()[0] if name.strip() else name for name in names]
+	setup(alignment, presentStates(alignment, args.block))
+	if args.verbose:
+		print("  Comparing", n, "sequences of", matrix.shape[1], "positions")
+	out = np.lib.format.open_memmap(npyFile, mode="w+", dtype=np.float32, shape=(n, n))
+	del out
+	blocks = range(0, n, args.block)
+	pairs = [(bi, bj) for bi in blocks for bj in blocks if bj >= bi]
+	done = 0
+	if args.threads > 1:
+		with Pool(args.threads, initializer=setup, initargs=(matrix, states)) as pool:
+			for pair in pool.imap_unordered(compareBlocks, pairs):
+				done += 1
+				if args.verbose:
+					print("\r    ", done, "/", len(pairs), " blocks", sep="", end="")
+	else:
+		for pair in pairs:
+			compareBlocks(pair)
+			done += 1
+			if args.verbose:
+				print("\r    ", done, "/", len(pairs), " blocks", sep="", end="")
+	if args.verbose:
+		print("")
+
+	# Exporting ________________________________________________________________________________________
+	if tsv:
+		import os
+		out = np.load(npyFile, mmap_mode="r")
+		with open(outFile, "w") as outfile:
+			print("name", *ids, sep="\t", file=outfile)
+			for i, name in enumerate(ids):
+				print(name, "\t".join([str(round(float(v), 4)) for v in out[i]]), sep="\t", file=outfile)
+		del out
+		os.remove(npyFile)
+	else:
+		with open(namesFile, "w") as outfile:
+			for name in ids:
+				print(name, file=outfile)
+
+	if args.verbose:
+		print("  Exported file:", outFile)
+		if not tsv:
+			print("  Sequence names:", namesFile)
+		print("Done")
@@ -1,10 +1,11 @@
 #!/usr/bin/env python3
 
 import argparse
-from Bio import AlignIO
 import re
 import sys
 import math
+from alignmentCache import CACHE, loadFasta, alignmentMatrix
+from alignmentPatterns import sitePatterns, expand
 
 parser = argparse.ArgumentParser(description="Calculates Shannon entropy, richness, unique bases, number of repetitions, the alignment coverage and/or the running mean of the Shannon entropy (mean shannon entropy at given window) at every position in an aligned fasta file.")
 
@@ -29,6 +30,9 @@ parser.add_argument("-r", "--range", dest="rangeSmooth", required=False, action=
 parser.add_argument("-g", "--gaps", dest="clean", required=False, default=None, action="store_true",
                         help="If selected, will also compute values of Shannon entropy removing gaps (-).")
 
+parser.add_argument("-C", "--cache", dest="cache", required=False, nargs='?', default=None, const=CACHE,
+                    help="If selected, the parsed alignment is stored in (or read from) a binary cache so other tools do not have to parse it again. A directory can be given, by default = " + CACHE + ".")
+
 parser.add_argument("-v", "--verbose", dest="verbose", required=False, default=None, action="store_true",
                     help="If selected, will print information in the console.")
 
@@ -37,32 +41,26 @@ args = parser.parse_args()
 # __________________________________________________________________________________________________
 if args.verbose:
 	print("  Reading fasta...", end="")
-fasta =  AlignIO.read(args.fastaFile, "fasta")
-
-length = set()
-for seq in fasta:
-	length.add(len(seq))
-
-seqs = len(fasta)
+names, sequences, offsets = loadFasta(args.fastaFile, args.cache)
+fasta = alignmentMatrix(sequences, offsets)
 
-if len(length) != 1:
+if fasta is None:
 	print("\nError: Input file is not aligned.\nExiting\n")
 	sys.exit(1)
 else:
-	length = int(list(length)[0])
+	seqs, length = fasta.shape
 
 # __________________________________________________________________________________________________
+# Identical columns are compressed into unique site patterns, so values are computed once per pattern
 if args.verbose:
-	print("\r  Reading fasta and asigning positions...")
+	print("\r  Reading fasta and compressing site patterns...")
+patterns, weights, index = sitePatterns(fasta)
 nucleotides = {}
-for position in range(length):
-	p = position +1
-	if args.verbose:
-		print("\r    ", p, "/", length, sep="", end="")
-	nucleotides[p] = list(fasta[:, position])
+for pattern in range(patterns.shape[1]):
+	nucleotides[pattern] = list(patterns[:, pattern].tobytes().decode())
 
 if args.verbose:
-	print("\n    Fasta file contains '", seqs, "' sequences and '", length, "' alignment positions.", sep="")
+	print("    Fasta file contains '", seqs, "' sequences, '", length, "' alignment positions and '", len(nucleotides), "' unique site patterns.", sep="")
 
 # __________________________________________________________________________________________________
 if args.verbose:
@@ -123,8 +121,7 @@ if 'smooth' in fields:
 
 for key, value in nucleotides.items():
 	if args.verbose:
-		print("\r    ", key, "/", length, sep="", end="")
-	out['position'].append(str(key))
+		print("\r    ", key+1, "/", len(nucleotides), sep="", end="")
 	if 'shannon' in fields:
 		out['shannon'].append(str(shannon(value)))
 	if 'richness' in fields:
@@ -149,6 +146,14 @@ for key, value in nucleotides.items():
 				values_clean.append(v)
 		out['shannon_clean'].append(str(shannon(values_clean)))
 
+# Expanding patterns back to positions
+for field in out:
+	if field != 'position' and field != 'smooth':
+		out[field] = expand(out[field], index)
+out['position'] = [str(p) for p in range(1, length+1)]
+if 'smooth' in fields:
+	shan = expand(shan, index)
+
 # __________________________________________________________________________________________________
 if 'smooth' in fields:
 	if args.verbose:
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+
+# Besides being used from the command line, this script is imported by fasta2phylip.py, phylip2fasta.py and fastaConvert.py,
+# so keep it in the same folder as them.
+
+import argparse
+import re
+import sys
+
+FORMATS = ['fasta', 'phylip', 'phylip-strict', 'phylip-interleaved', 'nexus', 'stockholm']
+
+BUFFER = 1 << 24
+
+# Detecting formats ________________________________________________________________________________
+def detectFormat(fileIn):
+	"""Guesses the format of an alignment from its first non empty line: 'fasta', 'phylip', 'nexus' or 'stockholm'."""
+	with open(fileIn) as infile:
+		for line in infile:
+			line = line.strip()
+			if line == "":
+				continue
+			if line.startswith(">"):
+				return "fasta"
+			if line.upper().startswith("#NEXUS"):
+				return "nexus"
+			if line.upper().startswith("# STOCKHOLM"):
+				return "stockholm"
+			if re.match("^[0-9]+\\s+[0-9]+", line):
+				return "phylip"
+			break
+	raise ValueError("format of '" + fileIn + "' not recognised")
+
+# Readers __________________________________________________________________________________________
+def readFasta(fileIn):
+	name = None
+	sequence = list()
+	for line in open(fileIn):
+		if line.startswith(">"):
+			if name is not None:
+				yield name, "".join(sequence)
+			name = line[1:].strip()
+			sequence = list()
+		else:
+			sequence.append(line.strip())
+	if name is not None:
+		yield name, "".join(sequence)
+
+def splitPhylipLine(line, nchar=None):
+	# Relaxed names are separated from the sequence by spaces, strict names are always 10 characters long
+	tmp = line.split(None, 1)
+	if len(tmp) == 2 and (nchar is None or len(re.sub("\\s", "", tmp[1])) <= nchar):
+		return tmp[0], re.sub("\\s", "", tmp[1])
+	return line[:10].strip(), re.sub("\\s", "", line[10:])
+
+def phylipSequential(lines, nchar):
+	"""Records of a sequential PHYLIP alignment whose sequences may be wrapped over several lines, or None if the lines do not add up to 'nchar' residues per record."""
+	records = list()
+	i = 0
+	while i < len(lines):
+		name, sequence = splitPhylipLine(lines[i], nchar)
+		i += 1
+		parts = [sequence]
+		size = len(sequence)
+		while size < nchar and i < len(lines):
+			part = re.sub("\\s", "", lines[i])
+			parts.append(part)
+			size += len(part)
+			i += 1
+		if size != nchar:
+			return None
+		records.append((name, "".join(parts)))
+	return records
+
+def phylipInterleaved(lines, ntax, nchar):
+	"""Records of an interleaved PHYLIP alignment: the first block holds the names, next blocks are appended in the same order."""
+	if len(lines) < ntax:
+		raise ValueError("expected " + str(ntax) + " taxa but found only " + str(len(lines)) + " lines")
+	names = list()
+	sequences = list()
+	for line in lines[:ntax]:
+		name, sequence = splitPhylipLine(line, nchar)
+		names.append(name)
+		sequences.append([sequence])
+	for i, line in enumerate(lines[ntax:]):
+		sequences[i % ntax].append(re.sub("\\s", "", line))
+	records = [(name, "".join(sequence)) for name, sequence in zip(names, sequences)]
+	for name, sequence in records:
+		if len(sequence) != nchar:
+			raise ValueError("expected " + str(nchar) + " positions but '" + name + "' has " + str(len(sequence)) + ". The file may be truncated")
+	return records
+
+def readPhylip(fileIn):
+	with open(fileIn) as infile:
+		line = infile.readline()
+		while line != "" and line.strip() == "":
+			line = infile.readline()
+		if line == "":
+			return
+		ntax, nchar = [int(i) for i in line.split()[:2]]
+		lines = (line.rstrip("\n") for line in infile if line.strip() != "")
+		first = next(lines, None)
+		if first is None:
+			return
+		name, sequence = splitPhylipLine(first, nchar)
+		if len(sequence) == nchar:
+			# Sequential with one record per line: streamed
+			yield name, sequence
+			count = 1
+			for line in lines:
+				yield splitPhylipLine(line, nchar)
+				count += 1
+			if count != ntax:
+				raise ValueError("expected " + str(ntax) + " taxa but found " + str(count))
+			return
+		# Sequences wrapped over several lines, either sequential or interleaved: sequential if every record adds up to 'nchar' residues
+		lines = [first] + list(lines)
+		records = phylipSequential(lines, nchar)
+		if records is None or len(records) != ntax:
+			records = phylipInterleaved(lines, ntax, nchar)
+		for record in records:
+			yield record
+
+def readNexus(fileIn):
+	infile = open(fileIn)
+	interleaved = False
+	nchar = None
+	for line in infile:
+		dimensions = re.search("\\bnchar\\s*=\\s*(\\d+)", line, re.IGNORECASE)
+		if dimensions:
+			nchar = int(dimensions.group(1))
+		if re.search("\\binterleave\\b", line, re.IGNORECASE) and not re.search("interleave\\s*=\\s*no", line, re.IGNORECASE):
+			interleaved = True
+		if re.match("^\\s*matrix\\b", line, re.IGNORECASE):
+			break
+	# Sequential sequences may be wrapped over several lines, so a record takes the following lines until it has 'nchar' residues
+	sequences = {}
+	name = None
+	parts = list()
+	length = 0
+	for line in infile:
+		line = re.sub("\\[[^\\]]*\\]", "", line).strip()
+		if line == "":
+			continue
+		end = line.endswith(";")
+		line = line.rstrip(";").strip()
+		if line != "" and not interleaved and name is not None and nchar is not None and length < nchar:
+			sequence = re.sub("\\s", "", line)
+			parts.append(sequence)
+			length += len(sequence)
+		elif line != "":
+			if name is not None:
+				yield name, "".join(parts)
+			if line.startswith("'"):
+				name, sequence = re.match("^'((?:[^']|'')*)'\\s*(.*)$", line).groups()
+				name = name.replace("''", "'")
+			else:
+				tmp = line.split(None, 1)
+				name = tmp[0]
+				sequence = tmp[1] if len(tmp) > 1 else ""
+			sequence = re.sub("\\s", "", sequence)
+			if interleaved:
+				sequences.setdefault(name, list()).append(sequence)
+				name = None
+			else:
+				parts = [sequence]
+				length = len(sequence)
+		if end:
+			break
+	if name is not None:
+		yield name, "".join(parts)
+	for name, sequence in sequences.items():
+		yield name, "".join(sequence)
+	infile.close()
+
+def readStockholm(fileIn):
+	# Blocks of a Stockholm file may be interleaved, so sequences are gathered until the end of the alignment
+	sequences = {}
+	for line in open(fileIn):
+		line = line.strip()
+		if line == "" or line.startswith("#"):
+			continue
+		if line == "//":
+			break
+		name, sequence = line.split(None, 1)
+		sequences.setdefault(name, list()).append(re.sub("\\s", "", sequence))
+	for name, sequence in sequences.items():
+		yield name, "".join(sequence)
+
+def readAlignment(fileIn, formatIn=None):
+	"""Yields the name and sequence of every record of an alignment. If the format is not given it is guessed from the file."""
+	if formatIn is None or formatIn == "auto":
+		formatIn = detectFormat(fileIn)
+	if formatIn == "fasta":
+		return readFasta(fileIn)
+	if formatIn.startswith("phylip"):
+		return readPhylip(fileIn)
+	if formatIn == "nexus":
+		return readNexus(fileIn)
+	if formatIn == "stockholm":
+		return readStockholm(fileIn)
+	raise ValueError("unknown format '" + formatIn + "'. Accepted formats are: " + ", ".join(FORMATS))
+
+# Writers __________________________________________________________________________________________
+def seqId(name):
+	"""First word of a header, or the header itself if it is empty."""
+	return name.split()[0] if name.strip() else name
+
+def nexusName(name):
+	if re.search("[\\s()\\[\\]{}/\\\\,;:=*'\"`+<>-]", name):
+		return "'" + name.replace("'", "''") + "'"
+	return name
+
+def writeAlignment(records, fileOut, formatOut, width=60):
+	"""Writes the records of an alignment in the given format in one pass and returns the number of sequences and positions.
+	The counts in the PHYLIP and NEXUS headers are written as a placeholder and filled in at the end."""
+	if formatOut not in FORMATS:
+		raise ValueError("unknown format '" + formatOut + "'. Accepted formats are: " + ", ".join(FORMATS))
+	ntax = 0
+	nchar = None
+	placeholder = " " * (128 if formatOut == "nexus" else 32)
+	if formatOut == "phylip-interleaved":
+		# Interleaved blocks need every sequence, so this is the only format kept in memory
+		records = list(records)
+	with open(fileOut, "w", buffering=BUFFER) as outfile:
+		if formatOut.startswith("phylip"):
+			outfile.write(placeholder + "\n")
+		elif formatOut == "nexus":
+			outfile.write("#NEXUS\n\nbegin data;\n")
+			header = outfile.tell()
+			outfile.write(placeholder + "\n")
+			outfile.write("\tmatrix\n")
+		elif formatOut == "stockholm":
+			outfile.write("# STOCKHOLM 1.0\n")
+		for name, sequence in records:
+			ntax += 1
+			if nchar is None:
+				nchar = len(sequence)
+				datatype = "dna" if re.match("^[ACGTUNRYSWKMBDHV?.-]*$", sequence.upper()) else "protein"
+			elif len(sequence) != nchar and formatOut != "fasta":
+				raise ValueError("alignment contains sequences of different length. Sequence " + str(ntax) + " has " + str(len(sequence)) + " positions")
+			if formatOut == "fasta":
+				outfile.write(">" + name + "\n" + sequence + "\n")
+			elif formatOut == "phylip":
+				outfile.write(seqId(name) + "  " + sequence + "\n")
+			elif formatOut == "phylip-strict":
+				outfile.write(seqId(name)[:10].ljust(10) + sequence + "\n")
+			elif formatOut == "nexus":
+				outfile.write("\t\t" + nexusName(seqId(name)) + "  " + sequence + "\n")
+			elif formatOut == "stockholm":
+				outfile.write(seqId(name) + "  " + sequence + "\n")
+		if formatOut == "phylip-interleaved":
+			for i in range(0, nchar or 0, width):
+				if i > 0:
+					outfile.write("\n")
+				for name, sequence in records:
+					if i == 0:
+						outfile.write(seqId(name) + "  " + sequence[i:i+width] + "\n")
+					else:
+						outfile.write(sequence[i:i+width] + "\n")
+		if formatOut == "nexus":
+			outfile.write("\t;\nend;\n")
+		elif formatOut == "stockholm":
+			outfile.write("//\n")
+		# Back-patching the counts
+		if formatOut.startswith("phylip"):
+			outfile.seek(0)
+			outfile.write((str(ntax) + " " + str(nchar or 0)).ljust(len(placeholder)))
+		elif formatOut == "nexus":
+			outfile.seek(header)
+			dimensions = "\tdimensions ntax=" + str(ntax) + " nchar=" + str(nchar or 0) + ";\n\tformat datatype=" + (datatype if ntax > 0 else "dna") + " missing=? gap=-;"
+			outfile.write(dimensions.ljust(len(placeholder)))
+	return ntax, nchar or 0
+
+def convert(fileIn, fileOut, formatIn=None, formatOut="fasta"):
+	"""Converts an alignment between formats with one parse of the input."""
+	return writeAlignment(readAlignment(fileIn, formatIn), fileOut, formatOut)
+
+# Command line _____________________________________________________________________________________
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Converts alignments between fasta, phylip (relaxed, strict and interleaved), nexus and stockholm formats in one single pass.")
+
+	requiredArgs = parser.add_argument_group('required arguments')
+
+	requiredArgs.add_argument("-i", "--input", dest="file_in", required=True,
+						help="Input alignment.")
+
+	requiredArgs.add_argument("-o", "--output", dest="file_out", required=True,
+						help="Output alignment.")
+
+	parser.add_argument("-f", "--from", dest="formatIn", required=False, default="auto",
+						help="Input format. By default = %(default)s, guessing it from the file.")
+
+	parser.add_argument("-t", "--to", dest="formatOut", required=False, default="fasta", choices=FORMATS,
+						help="Output format. By default = %(default)s.")
+
+	parser.add_argument("-v", "--verbose", dest="verbose", required=False, action="store_false",
+						help="If selected, will not print information to the console.")
+
+	args = parser.parse_args()
+
+	try:
+		ntax, nchar = convert(args.file_in, args.file_out, args.formatIn, args.formatOut)
+	except ValueError as e:
+		print("Error:", e)
+		sys.exit(1)
+
+	if args.verbose:
+		print("  Exported ", ntax, " sequences and ", nchar, " positions to ", args.file_out, sep="")
+		print("Done")
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+# Site-pattern compression of alignments, imported by alignmentEntropy.py and alignmentConsensus.py,
+# so keep it in the same folder as them.
+
+import numpy as np
+
+BLOCK = 1 << 26
+
+def sitePatterns(matrix, table=None, block=BLOCK):
+	"""Compresses the columns of a (sequences x positions) alignment matrix into its unique site patterns.
+	Returns the unique patterns as a (sequences x patterns) matrix, the number of columns with each pattern (weights),
+	and the pattern of every column, so per-column statistics can be computed once per pattern and expanded back.
+	Columns are read in blocks of about 'block' bytes, so only one block and the unique patterns are kept in memory (the matrix can be memory-mapped),
+	and 'table' (256 bytes, e.g.; to upper cases) is applied to every block instead of to the whole matrix."""
+	n, length = matrix.shape
+	if n == 0 or length == 0:
+		return np.zeros((n, 0), dtype=np.uint8), np.zeros(0, dtype=np.int64), np.zeros(length, dtype=np.int64)
+	step = max(1, block // n)
+	ids = {}
+	patterns = list()
+	index = np.empty(length, dtype=np.int64)
+	for j in range(0, length, step):
+		columns = np.asarray(matrix[:, j:j+step])
+		if table is not None:
+			columns = table[columns]
+		columns = np.ascontiguousarray(columns.T)
+		# Each column is hashed as one opaque item of n bytes, and the unique ones of the block are merged with the previous blocks
+		items = columns.view(np.dtype((np.void, n))).ravel()
+		_, first, inverse = np.unique(items, return_index=True, return_inverse=True)
+		local = np.empty(len(first), dtype=np.int64)
+		# Patterns are numbered by order of appearance in the alignment
+		for k in np.argsort(first).tolist():
+			key = columns[first[k]].tobytes()
+			i = ids.get(key)
+			if i is None:
+				i = len(patterns)
+				ids[key] = i
+				patterns.append(key)
+			local[k] = i
+		index[j:j+step] = local[inverse.ravel()]
+	patterns = np.frombuffer(b"".join(patterns), dtype=np.uint8).reshape(len(patterns), n)
+	return patterns.T, np.bincount(index, minlength=len(patterns)), index
+
+def expand(values, index):
+	"""Expands a list of values computed per pattern back to every column of the alignment."""
+	return [values[i] for i in index.tolist()]
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+import argparse
+import re
+import sys
+import numpy as np
+from alignmentCache import CACHE, loadFasta, alignmentMatrix
+
+parser = argparse.ArgumentParser(description="Removes the columns of an alignment with too many gaps, optionally with a different threshold in each partition (e.g.; for concatenated genes). Similar to 'trimal -gt'.")
+
+# Add the arguments to the parser
+requiredArgs = parser.add_argument_group('required arguments')
+
+requiredArgs.add_argument("-f", "--file", dest="file_in", required=True,
+					help="An aligned fasta file.")
+
+requiredArgs.add_argument("-g", "--gapThreshold", dest="gapThreshold", required=True, nargs='+', type=float,
+					help="1 - (fraction of sequences with a gap allowed), as in 'trimal -gt'. Columns with a lower fraction of sequences without gaps are removed. Give one value for the whole alignment or one value per partition.")
+
+parser.add_argument("-o", "--output", dest="file_out", required=False, default=None,
+					help="Output fasta file. By default will add '_trim' before the extension.")
+
+parser.add_argument("-p", "--positions", dest="positions", required=False, default=None,
+					help="Positions where partitions end, separated by a '+' (i.e.; '1832+2204'), as in 'fastaSplit.py -p'. Each partition is trimmed independently.")
+
+parser.add_argument("-r", "--remove", dest="remove", required=False, action="store_true",
+					help="If selected, sequences composed only by gaps in a partition are not considered to compute the gap fraction of that partition (as 'fastaSplit.py -r' would do before trimming each partition).")
+
+parser.add_argument("-b", "--block", dest="block", required=False, default=4096, type=int,
+					help="Number of sequences read at once. By default=%(default)s.")
+
+parser.add_argument("-C", "--cache", dest="cache", required=False, nargs='?', default=None, const=CACHE,
+					help="If selected, the parsed alignment is stored in (or read from) a binary cache (see alignmentCache.py). A directory can be given, by default = " + CACHE + ".")
+
+parser.add_argument("-v", "--verbose", dest="verbose", required=False, action="store_false",
+					help="If selected, will not print information to the console.")
+
+args = parser.parse_args()
+
+# Setting variables ________________________________________________________________________________
+if args.file_out is None:
+	outFile = re.sub("\\.[^\\.]+$", "_trim.", args.file_in) + re.sub(".*\\.", "", args.file_in)
+else:
+	outFile = args.file_out
+
+names, sequences, offsets = loadFasta(args.file_in, args.cache)
+matrix = alignmentMatrix(sequences, offsets)
+if matrix is None:
+	print("Error: Input file is not aligned.")
+	sys.exit(1)
+n, length = matrix.shape
+
+partitions = [0]
+if args.positions is not None:
+	for p in args.positions.strip("+").split("+"):
+		if int(p) > partitions[-1] and int(p) < length:
+			partitions.append(int(p))
+partitions.append(length)
+partitions = list(zip(partitions[:-1], partitions[1:]))
+
+if len(args.gapThreshold) == 1:
+	thresholds = args.gapThreshold * len(partitions)
+elif len(args.gapThreshold) == len(partitions):
+	thresholds = args.gapThreshold
+else:
+	print("Error: Please give one gap threshold or one per partition (", len(partitions), " partitions).", sep="")
+	sys.exit(1)
+
+isGap = np.zeros(256, dtype=bool)
+isGap[[ord("-"), ord(".")]] = True
+
+# Counting gaps per column _________________________________________________________________________
+if args.verbose:
+	print("  Counting gaps in", n, "sequences and", length, "positions")
+gaps = np.zeros(length, dtype=np.int64)
+considered = np.zeros(len(partitions), dtype=np.int64)
+for r in range(0, n, args.block):
+	block = isGap[matrix[r:r+args.block]]
+	for i, (b, e) in enumerate(partitions):
+		part = block[:, b:e]
+		if args.remove:
+			part = part[~part.all(axis=1)]
+		gaps[b:e] += part.sum(axis=0)
+		considered[i] += part.shape[0]
+
+keep = np.zeros(length, dtype=bool)
+for i, (b, e) in enumerate(partitions):
+	if considered[i] > 0:
+		keep[b:e] = 1 - gaps[b:e] / considered[i] >= thresholds[i]
+	if args.verbose:
+		print("    Partition ", i+1, " (", b+1, "-", e, "): ", int(keep[b:e].sum()), " of ", e-b, " positions kept", sep="")
+
+# Writing __________________________________________________________________________________________
+with open(outFile, "wb") as outfile:
+	for r in range(0, n, args.block):
+		block = matrix[r:r+args.block][:, keep]
+		for i in range(block.shape[0]):
+			outfile.write(b">" + names[r+i].encode() + b"\n" + block[i].tobytes() + b"\n")
+
+if args.verbose:
+	print("  Trimmed alignment has", int(keep.sum()), "positions")
+	print("  Exported file:", outFile)
+	print("Done")
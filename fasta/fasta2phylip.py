@@ -1,9 +1,8 @@
 #!/usr/bin/env python3
 
 import argparse
-from Bio import SeqIO
-import re
 import sys
+from alignmentFormats import readFasta, writeAlignment
 
 
 parser = argparse.ArgumentParser(description="Converts a fasta file to phylip format, respecting the sequence name length")
@@ -16,31 +15,28 @@ requiredArgs.add_argument("-f", "--file", dest="file_in", required=True,
 requiredArgs.add_argument("-o", "--output", dest="file_out", required=True,
                     help="Output fasta file.")
 
+parser.add_argument("-s", "--strict", dest="strict", required=False, action="store_true",
+                    help="If selected, exports a strict phylip file, where sequence names are truncated to 10 characters.")
+
+parser.add_argument("-i", "--interleaved", dest="interleaved", required=False, action="store_true",
+                    help="If selected, exports an interleaved phylip file.")
+
 args = parser.parse_args()
 
-seqs = 0
-for line in open(args.file_in):
-	if ">" in line:
-		seqs += 1
-
-with open(args.file_out, "w") as outfile:
-	j = 0
-	for i in SeqIO.parse(open(args.file_in), "fasta"):
-		j += 1
-		sequence = i.seq
-		name = i.id
-		if j == 1:
-			alignLength = len(sequence)
-		if j == 1:
-			print(seqs, alignLength, file=outfile)
-			print(name, "  ", sequence, file=outfile)
-		else:
-			if len(sequence) != alignLength:
-				print("\nERROR: Alignment contains sequences of different length")
-				print("  Sequence", j, "has", len(sequence), "positions")
-				print("Stop converting\n")
-				sys.exit(1)
-			else:
-				print(name, "  ", sequence, file=outfile)
-
-				
+if args.strict and args.interleaved:
+	print("\nError: Please select either '-s/--strict' or '-i/--interleaved', but not the two options.\n")
+	sys.exit(1)
+
+if args.strict:
+	formatOut = "phylip-strict"
+elif args.interleaved:
+	formatOut = "phylip-interleaved"
+else:
+	formatOut = "phylip"
+
+try:
+	writeAlignment(readFasta(args.file_in), args.file_out, formatOut)
+except ValueError as e:
+	print("\nERROR:", e)
+	print("Stop converting\n")
+	sys.exit(1)
@@ -1,8 +1,9 @@
 #!/usr/bin/env python3
 
 import argparse
+from fastaTransform import compileTable, transformFile
 
-parser = argparse.ArgumentParser(description="Converts a fasta file where the sequences are in multiple lines to a fasta file where each sequence is in one line.")
+parser = argparse.ArgumentParser(description="Changes the sequences of a fasta file to upper or lower cases.")
 
 requiredArgs = parser.add_argument_group('required arguments')
 
@@ -17,13 +18,9 @@ parser.add_argument("-c", "--case", dest="case", required=False, default="u", ch
 
 args = parser.parse_args()
 
-with open(args.file_out, "w") as outfile:
-	for line in open(args.file_in):
-		if ">" in line:
-			print(line, end="", file=outfile)
-		else:
-			if args.case == "u" or args.case == "upper":
-				print(line.upper(), end="", file=outfile)
-			if args.case == "l" or args.case == "lower":
-				print(line.lower(), end="", file=outfile)
+if args.case == "u" or args.case == "upper":
+	table, delete, reverse = compileTable(["upper"])
+if args.case == "l" or args.case == "lower":
+	table, delete, reverse = compileTable(["lower"])
 
+transformFile(args.file_in, args.file_out, table, delete, reverse)
@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 
 import argparse
+import sys
+from fastaTransform import compileTable, transformFile
 
 parser = argparse.ArgumentParser(description="Replaces nucleotides characters, such as Us to Ts or ambiguities to Ns.")
 
@@ -15,7 +17,7 @@ parser.add_argument("-o", "--output", dest="file_out", required=False,
 parser.add_argument("-c", "--change", dest="change", required=False, nargs=2, default=None,
                     help="Replaces the first given character by the second given character (e.g., '-c U T' will replace all Us by Ts).")
 
-parser.add_argument("-a", "--ambiguities", dest="ambiguities", required=False, default=None,
+parser.add_argument("-a", "--ambiguities", dest="ambiguities", required=False, action="store_true",
                     help="A shortcut to replace all ambiguities by N.")
 
 parser.add_argument("-u", "--upper", dest="upper", required=False, action="store_true",
@@ -34,30 +36,25 @@ else:
 
 if args.upper and args.lower:
 	print("Error! Both -u/--upper and -l/--lower arguments cannot be provided. Please choose one.")
-	import sys
 	sys.exit(1)
 
-with open(outFile, "w") as outfile:
-	for line in open(args.file_in):
-		if ">" in line:
-			print(line, end="", file=outfile)
-		else:
-			lineout = list()
-			for l in list(line):
-				o = l
-				if args.change is not None:
-					if l == args.change[0]:
-						o = args.change[1]
-				if args.ambiguities is not None:
-					if l == "A" or l == "C" or l == "G" or l == "T" or l == "U":
-						o = l
-					else:
-						o = "N"
-				lineout.append(o)
-			lineout = "".join(lineout)
-			if args.upper:
-				lineout = lineout.upper()
-			if args.lower:
-				lineout = lineout.lower()
-			print(lineout, end="", file=outfile)
+operations = list()
+if args.change is not None:
+	if len(args.change[0]) != 1 or len(args.change[1]) != 1:
+		print("Error! Only single characters can be replaced with -c/--change.")
+		sys.exit(1)
+	operations.append(args.change[0] + ":" + args.change[1])
+if args.ambiguities:
+	operations.append("ambiguities")
+if args.upper:
+	operations.append("upper")
+if args.lower:
+	operations.append("lower")
+
+try:
+	table, delete, reverse = compileTable(operations)
+except ValueError as e:
+	print("Error!", e)
+	sys.exit(1)
 
+transformFile(args.file_in, outFile, table, delete, reverse)
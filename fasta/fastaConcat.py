@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
 
 import argparse
-from Bio import SeqIO
+import os
+import re
 import sys
 
 parser = argparse.ArgumentParser(description="Concatenate multiple fasta files. Bear in mind that the sequence names should be exactly the same in every file.")
@@ -19,83 +20,127 @@ parser.add_argument("-a", "--align", dest="align", required=False, default=None,
 parser.add_argument("-d", "--drop", dest="drop", required=False, default=None, action="store_true",
 					help="If selected, will only print sequences present in all files.")
 
+parser.add_argument("-p", "--partitions", dest="partitions", required=False, default=None,
+					help="If selected, will export to the given file the partitions of the concatenated alignment in RAxML/IQ-TREE format (e.g.; 'DNA, gene1 = 1-1832').")
+
+parser.add_argument("-t", "--type", dest="dataType", required=False, default="DNA",
+					help="The data type written in the partition file. By default = %(default)s.")
+
 args = parser.parse_args()
 
 if args.align is not None and args.drop is not None:
 	print("\nError: Either you want to keep the sequences or not, but '-a/--align' and '-d/--drop' arguments are doing kind of opposite stuff.\n")
 	sys.exit(1)
 
-files = {}
+# Indexing files ___________________________________________________________________________________
+# For every file, only the position, size and length of each sequence is kept
+def indexFasta(filei):
+	index = {}
+	lengths = set()
+	offset = 0
+	name = None
+	with open(filei, "rb") as f:
+		for line in f:
+			if line.startswith(b">"):
+				if name is not None:
+					index[name] = (start, offset, length)
+					lengths.add(length)
+				name = line[1:].split(None, 1)[0].decode() if line[1:].strip() else ""
+				start = offset + len(line)
+				length = 0
+			else:
+				length += len(line.rstrip(b"\r\n"))
+			offset += len(line)
+	if name is not None:
+		index[name] = (start, offset, length)
+		lengths.add(length)
+	return index, lengths
+
+indexes = list()
+fileLengths = list()
+names = {}
 for filei in args.files_in:
-	f = {}
-	for line in SeqIO.parse(open(filei), "fasta"):
-		f[line.id] = str(line.seq)
-	files[filei] = f
-
-out = {}
-for i in list(range(0, len(files))):
-	filen = list(files.keys())[i]
-	tmp = files[filen]
-	if i == 0:
-		for key, value in tmp.items():
-			out[key] = value
-	else:
-		if args.align is not None:
-			r = len(out[list(out.keys())[1]])
-		for key, value in tmp.items():
-			if key in out.keys():
-				out[key] = (out[key] + value)
-			elif key not in out.keys() and args.align is not None:
-				out[key] = ("-" * r + value)
-			elif key not in out.keys():
-				out[key] = value
-		for key, value in out.items():
-			if key not in tmp.keys():
-				if args.align is not None:
-					r = len(tmp[list(tmp.keys())[1]])
-					out[key] = (value + "-" * r)
+	index, lengths = indexFasta(filei)
+	indexes.append(index)
+	fileLengths.append(lengths)
+	for name in index:
+		names[name] = None
 
+d = len(names)
 if args.drop is not None:
-	d = len(out.keys())
-	toRemove = set()
-	for key in out.keys():
-		for i in files:
-			tmp = files[i]
-			if key not in tmp.keys():
-				toRemove.add(key)
-	for i in toRemove:
-		del out[i]
-
-with open(args.file_out, "w") as outfile:
-	for line in out:
-		l = ">" + str(line) + "\n" + str(''.join(out[line])) + "\n"
-		print(l, file=outfile)
-
-print("  Final file contains", len(out), "sequences.")
+	names = [name for name in names if all(name in index for index in indexes)]
+else:
+	names = list(names)
+
+# Opening files ____________________________________________________________________________________
+# Keep every file open if the system allows it, otherwise open them on demand
+handles = None
+try:
+	import resource
+	soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+	needed = len(args.files_in) + 64
+	if soft != resource.RLIM_INFINITY and soft < needed:
+		resource.setrlimit(resource.RLIMIT_NOFILE, (needed if hard == resource.RLIM_INFINITY else min(hard, needed), hard))
+		soft = resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+	if soft == resource.RLIM_INFINITY or soft >= needed:
+		handles = [open(filei, "rb") for filei in args.files_in]
+except (ImportError, ValueError, OSError):
+	handles = None
+
+def readSequence(i, start, end):
+	if handles is not None:
+		f = handles[i]
+		f.seek(start)
+		return f.read(end - start).translate(None, b"\r\n")
+	with open(args.files_in[i], "rb") as f:
+		f.seek(start)
+		return f.read(end - start).translate(None, b"\r\n")
+
+# Writing rows _____________________________________________________________________________________
+gapLengths = [max(lengths) if len(lengths) > 0 else 0 for lengths in fileLengths]
+rowLengths = set()
+gapped = 0
+with open(args.file_out, "wb") as outfile:
+	for name in names:
+		row = list()
+		for i, index in enumerate(indexes):
+			if name in index:
+				row.append(readSequence(i, index[name][0], index[name][1]))
+			elif args.align is not None:
+				row.append(b"-" * gapLengths[i])
+		row = b"".join(row)
+		rowLengths.add(len(row))
+		if b"-" in row:
+			gapped += 1
+		outfile.write(b">" + name.encode() + b"\n" + row + b"\n")
+
+if handles is not None:
+	for f in handles:
+		f.close()
+
+# Writing partitions _______________________________________________________________________________
+if args.partitions is not None:
+	with open(args.partitions, "w") as outfile:
+		b = 1
+		for filei, lengths in zip(args.files_in, fileLengths):
+			if len(lengths) > 1:
+				print("  Warning! Sequences in '", filei, "' are not aligned, partitions may not be correct.", sep="")
+			e = b + max(lengths) - 1 if len(lengths) > 0 else b - 1
+			gene = re.sub("\\.[^\\.]+$", "", os.path.basename(filei))
+			print(args.dataType, ", ", gene, " = ", b, "-", e, sep="", file=outfile)
+			b = e + 1
+	print("  Partitions exported to", args.partitions)
+
+# Checking output __________________________________________________________________________________
+print("  Final file contains", len(names), "sequences.")
 if args.align is not None:
-	tmp = out[list(out.keys())[1]]
-	tmp = ''.join(tmp)
-	tmp = len(tmp)
-	l = set()
-	for s in out.values():
-		l.add(len(s))
-	if len(l) > 1:
+	if len(rowLengths) > 1:
 		print("    Warning!\n    You have selected the option '-a/--align' in order to keep the aligned structure.\n    But sequences are not aligned.")
-	else:
-		print("    And has", tmp, "aligned positions.")
+	elif len(rowLengths) == 1:
+		print("    And has", *rowLengths, "aligned positions.")
 if args.drop is not None:
-	print("   ", d-len(out.keys()), "sequences were in the input files and are not in the final fasta.")
-
-
-if args.drop is None and args.align is None:        
-	l = set()
-	for s in out.values():
-		l.add(len(s))
-	g = 0
-	for val in out.values():
-		if "-" in val:
-			g += 1
-	if g > 0 and len(l) > 1:
-		print("  Warning!\n    You haven't selected any option to deal with gaps.\n    The final file has sequences of different length and with gaps.")
-
+	print("   ", d-len(names), "sequences were in the input files and are not in the final fasta.")
 
+if args.drop is None and args.align is None:
+	if gapped > 0 and len(rowLengths) > 1:
+		print("  Warning!\n    You haven't selected any option to deal with gaps.\n    The final file has sequences of different length and with gaps.")
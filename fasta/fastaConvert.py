@@ -1,9 +1,13 @@
 #!/usr/bin/env python3
 
 import argparse
-from Bio import SeqIO
+import sys
+from alignmentFormats import FORMATS, detectFormat, convert
 
-parser = argparse.ArgumentParser(description="Changes the names of a fasta file given a tab delimited table with the old names in one column and the new names in the second column.")
+# Formats are named as in Biopython, where 'phylip' has strict (10 characters) names
+BIONAMES = {"phylip": "phylip-strict", "phylip-relaxed": "phylip", "phylip-sequential": "phylip-strict"}
+
+parser = argparse.ArgumentParser(description="Converts a sequence or alignment file between formats.")
 
 requiredArgs = parser.add_argument_group('required arguments')
 
@@ -15,21 +19,43 @@ requiredArgs.add_argument("-o", "--output", dest="file_out", required=False,
 
 parser.add_argument("-f", "--from", dest="formatIn", required=False,
 					default="fasta",
-                    help="Input format. By default = %(default)s.")
+                    help="Input format. Use 'auto' to guess it from the file. By default = %(default)s.")
 
 parser.add_argument("-t", "--to", dest="formatOut", required=False,
 					default="stockholm",
-                    help="Output format. By default = %(default)s.")
+                    help="Output format, named as in Biopython: 'phylip' and 'phylip-sequential' have names truncated to 10 characters and 'phylip-relaxed' keeps full names. By default = %(default)s.")
 
 parser.add_argument("-v", "--verbose", dest="verbose", required=False, action="store_false",
 					help="If selected, will not print information to the console.")
 
 args = parser.parse_args()
 
-# Reading table ------------------------------------------------------------------------------------
+# Converting ---------------------------------------------------------------------------------------
+formatIn = BIONAMES.get(args.formatIn, args.formatIn)
+formatOut = BIONAMES.get(args.formatOut, args.formatOut)
+if formatIn == "auto":
+	try:
+		formatIn = detectFormat(args.file_in)
+	except ValueError as e:
+		print("Error:", e)
+		sys.exit(1)
+
 if args.verbose:
-	print("  Converting '", args.file_in, "' from '", args.formatIn, "' to '", args.formatOut, "'", sep="")
-SeqIO.convert(args.file_in, args.formatIn, args.file_out, args.formatOut)
+	print("  Converting '", args.file_in, "' from '", formatIn, "' to '", args.formatOut, "'", sep="")
+if formatIn in FORMATS and formatOut in FORMATS:
+	# Alignment formats are converted in one streaming pass, any other format is left to Biopython
+	try:
+		convert(args.file_in, args.file_out, formatIn, formatOut)
+	except ValueError as e:
+		print("Error:", e)
+		sys.exit(1)
+else:
+	from Bio import SeqIO
+	if args.formatIn != "auto":
+		formatIn = args.formatIn
+	elif formatIn == "phylip":
+		formatIn = "phylip-relaxed"
+	SeqIO.convert(args.file_in, formatIn, args.file_out, args.formatOut)
 
 if args.verbose:
 	print("  Exported file:", args.file_out)
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+# Besides being used from the command line, this script is imported by fastaStats.py,
+# so keep it in the same folder as it.
+
+import argparse
+
+BUFFER = 1 << 24
+
+def countFasta(fileIn, gaps=b"-.", block=BUFFER):
+	"""Counts the records, residues (sequence characters other than gaps) and gaps of a fasta file, scanning the raw bytes in large blocks without building any sequence.
+	Returns a tuple (records, residues, gaps)."""
+	records = 0
+	characters = 0
+	gapCount = 0
+	header = False # Inside a header line started in the previous block
+	newline = True # Previous block ended with a new line
+	with open(fileIn, "rb") as f:
+		while True:
+			chunk = f.read(block)
+			if not chunk:
+				break
+			pos = 0
+			if header:
+				eol = chunk.find(b"\n")
+				if eol == -1:
+					continue
+				header = False
+				pos = eol + 1
+			while True:
+				# Next header, starting at a line start
+				if pos == 0 and newline and chunk.startswith(b">"):
+					h = 0
+				else:
+					h = chunk.find(b"\n>", max(pos - 1, 0))
+					if h != -1:
+						h += 1
+				end = len(chunk) if h == -1 else h
+				characters += end - pos - chunk.count(b"\n", pos, end) - chunk.count(b"\r", pos, end)
+				for gap in gaps:
+					gapCount += chunk.count(bytes([gap]), pos, end)
+				if h == -1:
+					break
+				records += 1
+				eol = chunk.find(b"\n", h)
+				if eol == -1:
+					header = True
+					break
+				pos = eol + 1
+			newline = chunk.endswith(b"\n")
+	return records, characters - gapCount, gapCount
+
+# Command line _____________________________________________________________________________________
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Counts the number of sequences, residues and gaps of fasta files as fast as the disk can read them, without parsing the sequences.")
+
+	requiredArgs = parser.add_argument_group('required arguments')
+
+	requiredArgs.add_argument("-f", "--file", dest="fileIn", nargs='+', required=True,
+						help="Fasta file(s).")
+
+	parser.add_argument("-g", "--gaps", dest="gaps", required=False, default="-.",
+						help="The character(s) representing the gaps. By default='%(default)s'.")
+
+	args = parser.parse_args()
+
+	print("File\tSequences\tBases\tGaps")
+	for file in args.fileIn:
+		records, residues, gapCount = countFasta(file, args.gaps.encode())
+		print(file, records, residues, gapCount, sep="\t")
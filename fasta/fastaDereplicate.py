@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+
+# Besides being used from the command line, this script is imported by fastaRarefy.py,
+# so keep it in the same folder as it.
+
+import argparse
+import hashlib
+import os
+import re
+import sys
+from collections import Counter
+
+HEADER = "%%MatrixMarket matrix coordinate integer general\n"
+PLACEHOLDER = 64
+
+# Reading samples __________________________________________________________________________________
+def readSequences(fileIn):
+	"""Yields the header and the sequence (as bytes, without new lines) of every record of a fasta file."""
+	header = None
+	sequence = list()
+	for line in open(fileIn, "rb"):
+		if line.startswith(b">"):
+			if header is not None:
+				yield header, b"".join(sequence)
+			header = line[1:].rstrip(b"\r\n")
+			sequence = list()
+		else:
+			sequence.append(line.rstrip(b"\r\n"))
+	if header is not None:
+		yield header, b"".join(sequence)
+
+def readSize(header):
+	"""Abundance of a dereplicated sequence given in its header as ';size=N' (as in vsearch or usearch), or 1."""
+	size = re.search(b";size=([0-9]+)", header)
+	return int(size.group(1)) if size else 1
+
+# Dereplicating ____________________________________________________________________________________
+def dereplicate(files, fastaOut, matrixOut, prefix="OTU", ungap=False, size=False, verbose=False):
+	"""Streams every sample file, assigning every unique sequence a global integer ID (from a 16 bytes hash of the sequence) and writing it to a representative fasta the first time it is seen.
+	The counts of every sample are written to a sparse (unique sequences x samples) matrix in Matrix Market coordinate format as soon as the sample is read,
+	so only the hashes and the counts of the current sample are kept in memory. Returns the number of unique sequences and of non zero counts."""
+	ids = {}
+	entries = 0
+	with open(fastaOut, "wb") as outfasta, open(matrixOut, "w") as outmatrix:
+		outmatrix.write(HEADER)
+		# The size of the matrix is only known at the end, so it is written over a placeholder
+		start = outmatrix.tell()
+		outmatrix.write(" " * PLACEHOLDER + "\n")
+		for s, fileIn in enumerate(files):
+			counts = Counter()
+			for header, sequence in readSequences(fileIn):
+				sequence = sequence.upper()
+				if ungap:
+					sequence = sequence.translate(None, b"-.")
+				key = hashlib.blake2b(sequence, digest_size=16).digest()
+				i = ids.get(key)
+				if i is None:
+					i = len(ids)
+					ids[key] = i
+					outfasta.write(b">" + prefix.encode() + str(i+1).encode() + b"\n" + sequence + b"\n")
+				counts[i] += readSize(header) if size else 1
+			for i, count in sorted(counts.items()):
+				outmatrix.write(str(i+1) + " " + str(s+1) + " " + str(count) + "\n")
+			entries += len(counts)
+			if verbose:
+				print("\r    ", s+1, "/", len(files), " samples, ", len(ids), " unique sequences", sep="", end="")
+		outmatrix.seek(start)
+		outmatrix.write((str(len(ids)) + " " + str(len(files)) + " " + str(entries)).ljust(PLACEHOLDER))
+	if verbose:
+		print("")
+	return len(ids), entries
+
+# Reading the matrix _______________________________________________________________________________
+def readMatrix(fileIn):
+	"""Reads a sparse matrix in Matrix Market coordinate format. Returns the shape and the (0-based) rows, columns and values of the entries as numpy arrays."""
+	import numpy as np
+	with open(fileIn) as f:
+		line = f.readline()
+		while line.startswith("%"):
+			line = f.readline()
+		rows, cols, entries = [int(x) for x in line.split()]
+		data = np.loadtxt(f, dtype=np.int64, ndmin=2).reshape(-1, 3)
+	if data.shape[0] != entries:
+		raise ValueError("'" + fileIn + "' has " + str(data.shape[0]) + " entries instead of " + str(entries))
+	return (rows, cols), data[:, 0] - 1, data[:, 1] - 1, data[:, 2]
+
+# Command line _____________________________________________________________________________________
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Dereplicates the sequences of many sample fasta files at once, exporting an abundance table of every unique sequence in every sample as a sparse matrix (Matrix Market format, which can be given to 'fastaRarefy.py -m'), the sample names, and a fasta file with one representative of every unique sequence.")
+
+	requiredArgs = parser.add_argument_group('required arguments')
+
+	requiredArgs.add_argument("-f", "--files", dest="files", nargs='+', required=True,
+						help="Fasta file(s), one per sample.")
+
+	parser.add_argument("-o", "--output", dest="output", required=False, default="dereplicated",
+						help="Output name, to which '.mtx', '_samples.txt' and '.fasta' are added. By default='%(default)s'.")
+
+	parser.add_argument("-n", "--names", dest="names", nargs='+', required=False, default=None,
+						help="Sample names, in the same order as the files. By default the file names without the extension.")
+
+	parser.add_argument("-p", "--prefix", dest="prefix", required=False, default="OTU",
+						help="Prefix of the names of the unique sequences, followed by their row in the matrix. By default='%(default)s'.")
+
+	parser.add_argument("-u", "--ungap", dest="ungap", required=False, action="store_true",
+						help="If selected, gaps ('-' and '.') are removed before comparing sequences. Sequences are always compared in upper case.")
+
+	parser.add_argument("-s", "--size", dest="size", required=False, action="store_true",
+						help="If selected, the abundance of each sequence is read from its header as ';size=N' (as in already dereplicated samples), instead of counting one per sequence.")
+
+	parser.add_argument("-v", "--verbose", dest="verbose", required=False, action="store_false",
+						help="If selected, will not print information to the console.")
+
+	args = parser.parse_args()
+
+	if args.names is None:
+		names = [re.sub("\\.[^\\.]+$", "", os.path.basename(f)) for f in args.files]
+	elif len(args.names) == len(args.files):
+		names = args.names
+	else:
+		print("Error: Number of sample names do not match number of files.")
+		sys.exit(1)
+
+	if args.verbose:
+		print("  Dereplicating", len(args.files), "samples")
+	rows, entries = dereplicate(args.files, args.output + ".fasta", args.output + ".mtx", args.prefix, args.ungap, args.size, args.verbose)
+	with open(args.output + "_samples.txt", "w") as outfile:
+		for name in names:
+			print(name, file=outfile)
+
+	if args.verbose:
+		print("  Unique sequences:", rows)
+		print("  Non zero counts: ", entries)
+		print("  Exported files:", args.output + ".mtx", args.output + "_samples.txt", args.output + ".fasta")
+		print("Done")
@@ -2,16 +2,23 @@
 
 import argparse
 from Bio import SeqIO
+import numpy as np
+import os
 import statistics as st
 import random
+import re
+import sys
 
 parser = argparse.ArgumentParser(description="From a fasta file, will export a table of rarefied observations. If an abundance table is given, abundances will be taken into consideration.")
 
-requiredArgs = parser.add_argument_group('required arguments')
+requiredArgs = parser.add_argument_group('required arguments (one of)')
 
-requiredArgs.add_argument("-f", "--file", dest="fastaFile", required=True,
+requiredArgs.add_argument("-f", "--file", dest="fastaFile", required=False, default=None,
                     help="A fasta file.")
 
+requiredArgs.add_argument("-m", "--matrix", dest="matrix", required=False, default=None,
+                    help="A sparse abundance matrix of unique sequences in many samples, as exported by fastaDereplicate.py. If selected, every sample (column) is rarefied independently and exported to the same table, with the sample names read from the '_samples.txt' file next to the matrix if it exists.")
+
 parser.add_argument("-a", "--abundance", dest="abundance", required=False, default=None,
                     help="If selected, will accomodate sequence abundance for the rarification. Then a tab separated table will be needed with two columns: the name of the sequence and the abundance.")
 
@@ -33,6 +40,9 @@ parser.add_argument("-i", "--identifier", dest="identifier", required=False, act
 parser.add_argument("-R", "--replacement", dest="replacement", required=False, action="store_true",
                     help="If selected, the random sampling will be done without replacement.")
 
+parser.add_argument("-t", "--threads", dest="threads", required=False, type=int, default=1,
+                    help="Number of samples rarefied in parallel when using '-m/--matrix'. Default: '1'.")
+
 parser.add_argument("-p", "--printSummary", dest="printSummary", required=False, action="store_false",
                     help="If selected, will not print a summary at the end.")
 
@@ -42,9 +52,12 @@ parser.add_argument("-v", "--verbose", dest="verbose", required=False, action="s
 args = parser.parse_args()
 
 # Setting parameters _______________________________________________________________________________
+if (args.fastaFile is None) == (args.matrix is None):
+	print("Error: Please give either a fasta file (-f/--file) or an abundance matrix (-m/--matrix).")
+	sys.exit(1)
+
 if args.output is None:
-	import re
-	outFile = re.sub("\\.[^\\.]+$", "_rarefied.tsv", args.fastaFile)
+	outFile = re.sub("\\.[^\\.]+$", "_rarefied.tsv", args.fastaFile if args.matrix is None else args.matrix)
 else:
 	outFile = args.output
 
@@ -59,157 +72,217 @@ if args.identifier:
 else:
 	reading = "sequences"
 
-# Reading fasta ____________________________________________________________________________________
-if args.verbose:
-	print("  Reading fasta", args.fastaFile)
-fasta = {}
-for i in SeqIO.parse(open(args.fastaFile), "fasta"):
-	fasta[i.id] = str(i.seq)
+def summary(s, sample):
+	sort = sorted(sample)
+	return str(str(s) + '\t' +
+		 str(st.mean(sample)) + '\t' +
+		 str(st.stdev(sample)) + '\t' +
+		 str(min(sample)) + '\t' +
+		 str(sort[int(len(sample)*0.05)]) + '\t' +
+		 str(sort[int(len(sample)*0.25)]) + '\t' +
+		 str(sort[int(len(sample)*0.5)]) + '\t' +
+		 str(sort[int(len(sample)*0.75)]) + '\t' +
+		 str(sort[int(len(sample)*0.95)]) + '\t' +
+		 str(max(sample)) + '\t' +
+		 str(len(set(sample))) + '\n')
+
+# Rarefying matrix columns _________________________________________________________________________
+def readColumns(matrix):
+	"""Reads a sparse abundance matrix (as exported by fastaDereplicate.py) and returns its shape, the sample names and the non zero counts of every sample (column).
+	Sample names are read from the '_samples.txt' file next to the matrix if it exists."""
+	from fastaDereplicate import readMatrix
+	shape, rows, cols, values = readMatrix(matrix)
+	# Entries sorted by column once, and split at the cumulative number of entries of every column
+	order = np.argsort(cols, kind="stable")
+	columns = np.split(values[order], np.cumsum(np.bincount(cols, minlength=shape[1]))[:-1])
+	samplesFile = re.sub("\\.[^\\.]+$", "", matrix) + "_samples.txt"
+	if os.path.exists(samplesFile):
+		samples = [line.strip() for line in open(samplesFile)]
+	else:
+		samples = [str(j+1) for j in range(shape[1])]
+	return shape, samples, columns
+
+def rarefyColumn(column):
+	"""Rarefies one sample, given as its name and the counts of its unique sequences. Returns its name, number of reads and of unique sequences, and its rows of the table."""
+	# Drawing reads from the abundances of the unique sequences of a sample gives the number of reads of each one, so unique sequences are those drawn at least once
+	sample, counts = column
+	total = int(counts.sum())
+	rng = np.random.default_rng()
+	lines = list()
+	for s in steps:
+		if args.replacement:
+			if s > total:
+				break
+			drawn = rng.multivariate_hypergeometric(counts, s, size=args.replicates)
+		else:
+			drawn = rng.multinomial(s, counts / total, size=args.replicates)
+		lines.append(sample + '\t' + summary(s, np.count_nonzero(drawn, axis=1).tolist()))
+	return sample, total, len(counts), lines
 
-# Reading abundances _______________________________________________________________________________
-if args.abundance is not None:
-	abundance = {}
+if __name__ == "__main__" and args.matrix is not None:
+	from multiprocessing import Pool
 	if args.verbose:
-		print("  Reading abundance table", args.abundance)
-	for line in open(args.abundance):
-		line = line.strip().split()
-		abundance[line[0]] = line[1]
-
-# Extracting reads _________________________________________________________________________________
-reads = list()
-if args.abundance is not None:
+		print("  Reading matrix", args.matrix)
+	shape, samples, columns = readColumns(args.matrix)
 	if args.verbose:
-		print("  Replicating ", reading, " by abundance", end="")
-		i = 0
-		P = 0
-	for key, value in fasta.items():
+		print("  Rarefying", shape[1], "samples with", shape[0], "unique sequences from", min(steps), "to", max(steps), "reads by steps of", steps[1]-steps[0], "with", args.replicates, "replicates")
+	small = list()
+	with open(outFile, 'w') as outfile:
+		outfile.write("sample\tsampleSize\tmean\tsd\tmin\tp05\tp25\tp50\tp75\tp95\tmax\tcommon\n")
+		with Pool(args.threads) as pool:
+			for sample, total, unique, lines in pool.imap(rarefyColumn, zip(samples, columns)):
+				outfile.write("".join(lines))
+				if args.replacement and max(steps) > total:
+					small.append(sample)
+				if args.verbose:
+					print("    ", sample, ": ", total, " reads, ", unique, " unique sequences", sep="")
+	# Without replacement a sample cannot be drawn beyond its number of reads, as in the fasta path, but other samples are still exported
+	if len(small) > 0:
+		print("\nWarning! You have selected a maximum sampling of", max(steps),
+		"yet", len(small), "sample(s) have less reads:", ", ".join(small))
+		print("Their sampling sizes larger than their number of reads are not exported.\nPlease consider using a smaller range or removing the replacement option.\n")
+	if args.verbose:
+		print("  Table exported to:", outFile)
+		print("Done")
+	sys.exit(0)
+
+if __name__ == "__main__":
+	# Reading fasta ____________________________________________________________________________________
+	if args.verbose:
+		print("  Reading fasta", args.fastaFile)
+	fasta = {}
+	for i in SeqIO.parse(open(args.fastaFile), "fasta"):
+		fasta[i.id] = str(i.seq)
+
+	# Reading abundances _______________________________________________________________________________
+	if args.abundance is not None:
+		abundance = {}
 		if args.verbose:
-			i += 1
-			I = round(i/len(fasta)*100)
-			if I > P:
-				P = I
-				print("\r  Replicating ", reading, " by abundance ", P, "%", sep="", end="")
-		for j in range(int(abundance[key])):
+			print("  Reading abundance table", args.abundance)
+		for line in open(args.abundance):
+			line = line.strip().split()
+			abundance[line[0]] = line[1]
+
+	# Extracting reads _________________________________________________________________________________
+	reads = list()
+	if args.abundance is not None:
+		if args.verbose:
+			print("  Replicating ", reading, " by abundance", end="")
+			i = 0
+			P = 0
+		for key, value in fasta.items():
+			if args.verbose:
+				i += 1
+				I = round(i/len(fasta)*100)
+				if I > P:
+					P = I
+					print("\r  Replicating ", reading, " by abundance ", P, "%", sep="", end="")
+			for j in range(int(abundance[key])):
+				if args.identifier:
+					reads.append(key)
+				else:
+					reads.append(value)
+	else:
+		if args.verbose:
+			print("  Extracting ", reading, end="")
+			i = 0
+			P = 0
+		for key, value in fasta.items():
+			if args.verbose:
+				i += 1
+				I = round(i/len(fasta)*100)
+				if I > P:
+					P = I
+					print("\r  Extracting ", reading, " ", P, "%", sep="", end="")
 			if args.identifier:
 				reads.append(key)
 			else:
 				reads.append(value)
-else:
+	print("")
+
+	# Print information
+	if args.verbose:
+		if args.abundance is not None:
+			print("  Rarefication will be done:\n      -from", min(steps), "to", max(steps),
+			"sampling size\n      -by steps of", steps[1]-steps[0],
+			"\n      -with", args.replicates, "replicates\n      -in the total",
+			len(reads), reading, "after replicating by abundance")
+		else:
+			print("  Rarefication will be done:\n      -from", min(steps), "to", max(steps),
+			"sampling size\n      -by steps of", steps[1]-steps[0],
+			"\n      -with", args.replicates, "replicates\n      -in the total",
+			len(reads), reading)
+
+	# Test if it is possible to do not use replacement if selected
+	if args.replacement:
+		if max(steps) > len(reads):
+			print("\nWarning! You have selected a maximum sampling of", max(steps),
+			"yet the sample has", len(reads),
+			"reads.\nPlease consider using a smaller range or removing the replacement option.\nStopping\n")
+			sys.exit(1)
+
+	# Rarefying ________________________________________________________________________________________
 	if args.verbose:
-		print("  Extracting ", reading, end="")
+		print("  Rarefying", end="")
 		i = 0
 		P = 0
-	for key, value in fasta.items():
-		if args.verbose:
-			i += 1
-			I = round(i/len(fasta)*100)
-			if I > P:
-				P = I
-				print("\r  Extracting ", reading, " ", P, "%", sep="", end="")
-		if args.identifier:
-			reads.append(key)
-		else:
-			reads.append(value)
-print("")
+	with open(outFile, 'w') as outfile:
+		outfile.write("sampleSize\tmean\tsd\tmin\tp05\tp25\tp50\tp75\tp95\tmax\tcommon\n")
+		for s in steps:
+			if args.verbose:
+				i += 1
+				I = round(i/len(steps)*100)
+				if I > P:
+					P = I
+					print("\r  Rarefying ", P, "%", sep="", end="")
+			sample = list()
+			for j in range(0, args.replicates):
+				random.seed()
+				if args.replacement:
+					tmp = len(set(random.sample(reads, k=s)))
+				else:
+					tmp = len(set(random.choices(reads, k=s)))
+				sample.append(tmp)
+			outfile.write(summary(s, sample))
 
-# Print information
-if args.verbose:
-	if args.abundance is not None:
-		print("  Rarefication will be done:\n      -from", min(steps), "to", max(steps),
-		"sampling size\n      -by steps of", steps[1]-steps[0],
-		"\n      -with", args.replicates, "replicates\n      -in the total",
-		len(reads), reading, "after replicating by abundance")
-	else:
-		print("  Rarefication will be done:\n      -from", min(steps), "to", max(steps),
-		"sampling size\n      -by steps of", steps[1]-steps[0],
-		"\n      -with", args.replicates, "replicates\n      -in the total",
-		len(reads), reading)
-
-# Test if it is possible to do not use replacement if selected
-if args.replacement:
-	if max(steps) > len(reads):
-		print("\nWarning! You have selected a maximum sampling of", max(steps),
-		"yet the sample has", len(reads),
-		"reads.\nPlease consider using a smaller range or removing the replacement option.\nStopping\n")
-		import sys
-		sys.exit(1)
-
-# Rarefying ________________________________________________________________________________________
-if args.verbose:
-	print("  Rarefying", end="")
-	i = 0
-	P = 0
-with open(outFile, 'w') as outfile:
-	outfile.write("sampleSize\tmean\tsd\tmin\tp05\tp25\tp50\tp75\tp95\tmax\tcommon\n")
-	for s in steps:
-		if args.verbose:
-			i += 1
-			I = round(i/len(steps)*100)
-			if I > P:
-				P = I
-				print("\r  Rarefying ", P, "%", sep="", end="")
-		sample = list()
-		common = set()
-		for j in range(0, args.replicates):
-			random.seed()
-			if args.replacement:
-				tmp = len(set(random.sample(reads, k=s)))
-			else:
-				tmp = len(set(random.choices(reads, k=s)))
-			sample.append(tmp)
-			common.add(tmp)
-		sort = sorted(sample)
-		line = str(str(s) + '\t' +
-			 str(st.mean(sample)) + '\t' +
-			 str(st.stdev(sample)) + '\t' +
-			 str(min(sample)) + '\t' +
-			 str(sort[int(len(sample)*0.05)]) + '\t' +
-			 str(sort[int(len(sample)*0.25)]) + '\t' +
-			 str(sort[int(len(sample)*0.5)]) + '\t' +
-			 str(sort[int(len(sample)*0.75)]) + '\t' +
-			 str(sort[int(len(sample)*0.95)]) + '\t' +
-			 str(max(sample)) + '\t' +
-			 str(len(common)) + '\n')
-		outfile.write(line)
-
-if args.verbose:
-	print("\n  Table exported to:", outFile)
-
-# Summarising _____________________________________________________________________________________
-if args.printSummary:
-	print("  Final summary report:")
-	print("    Fasta has a total of", len(fasta), "entries and", len(set(fasta.values())), "unique sequences")
-	if args.abundance is not None:
-		print("      (and", str(len(reads)), reading, "after replicating by abundance)")
-	sampling = max([len(fasta), len(set(fasta.values()))])
-	tmp = list()
-	print("    Estimating", end="")
-	for j in range(0, args.replicates):
-		print("\r    Estimating ", j, "/", args.replicates, sep="", end="")
-		if args.replacement:
-			random.seed()
-			tmp1 = len(set(random.sample(reads, k=sampling)))
-		else:
-			random.seed()
-			tmp1 = len(set(random.choices(reads, k=sampling)))
-		tmp.append(tmp1)
-	tmp = st.mean(tmp)
-	print("\r    When sampling ", sampling, " ", reading, ", an average of ", tmp, " unique ", reading, " are retrieved (", round(tmp/sampling*100, 2), "%)", sep="")
-	if args.abundance is not None:
+	if args.verbose:
+		print("\n  Table exported to:", outFile)
+
+	# Summarising _____________________________________________________________________________________
+	if args.printSummary:
+		print("  Final summary report:")
+		print("    Fasta has a total of", len(fasta), "entries and", len(set(fasta.values())), "unique sequences")
+		if args.abundance is not None:
+			print("      (and", str(len(reads)), reading, "after replicating by abundance)")
+		sampling = max([len(fasta), len(set(fasta.values()))])
 		tmp = list()
 		print("    Estimating", end="")
 		for j in range(0, args.replicates):
 			print("\r    Estimating ", j, "/", args.replicates, sep="", end="")
-			random.seed()
 			if args.replacement:
-				tmp1 = len(set(random.sample(reads, k=len(reads))))
+				random.seed()
+				tmp1 = len(set(random.sample(reads, k=sampling)))
 			else:
-				tmp1 = len(set(random.choices(reads, k=len(reads))))
+				random.seed()
+				tmp1 = len(set(random.choices(reads, k=sampling)))
 			tmp.append(tmp1)
 		tmp = st.mean(tmp)
-		print("\r    When sampling ", len(reads), " ", reading, ", an average of ", tmp, " unique ", reading, " are retrieved (", round(tmp/sampling*100, 2), "%)", sep="")
+		print("\r    When sampling ", sampling, " ", reading, ", an average of ", tmp, " unique ", reading, " are retrieved (", round(tmp/sampling*100, 2), "%)", sep="")
+		if args.abundance is not None:
+			tmp = list()
+			print("    Estimating", end="")
+			for j in range(0, args.replicates):
+				print("\r    Estimating ", j, "/", args.replicates, sep="", end="")
+				random.seed()
+				if args.replacement:
+					tmp1 = len(set(random.sample(reads, k=len(reads))))
+				else:
+					tmp1 = len(set(random.choices(reads, k=len(reads))))
+				tmp.append(tmp1)
+			tmp = st.mean(tmp)
+			print("\r    When sampling ", len(reads), " ", reading, ", an average of ", tmp, " unique ", reading, " are retrieved (", round(tmp/sampling*100, 2), "%)", sep="")
 
-# __________________________________________________________________________________________________
-if args.verbose:
-	print("Done")
+	# __________________________________________________________________________________________________
+	if args.verbose:
+		print("Done")
 
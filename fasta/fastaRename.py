@@ -2,6 +2,7 @@
 
 import argparse
 import re
+from nameMap import openNames, lookupNames
 
 parser = argparse.ArgumentParser(description="Changes the names of a fasta file given a tab delimited table with the old names in one column and the new names in the second column.")
 
@@ -11,7 +12,7 @@ requiredArgs.add_argument("-f", "--file", dest="file_in", required=True,
                     help="Input fasta file.")
 
 requiredArgs.add_argument("-l", "--list", dest="table", required=True,
-                    help="A tab delimited table with the old names in one column and the new names in the second column.")
+                    help="A tab delimited table with the old names in one column and the new names in the second column. For very large tables, a database built with nameMap.py can be given instead.")
 
 parser.add_argument("-o", "--output", dest="file_out", required=False,
                     help="Output fasta file. By default will add '_newName' to the input file name before the extension.")
@@ -30,60 +31,71 @@ if args.file_out is None:
 else:
 	outFile = args.file_out
 
+BATCH = 10000
+
 # Reading table ------------------------------------------------------------------------------------
-if args.verbose:
-	print("  Reading table:", args.table)
 if args.order:
-	names = {}
-	for line in open(args.table):
-		tmp = line.strip().split()
-		oldname = tmp[0]
-		newname = tmp[1]
-		newname = re.sub("\n", "", newname)
-		names[oldname] = newname
-else:
-	names = list()
-	countl = 0
-	for line in open(args.table):
-		countl += 1
-		name = line.strip().split()
-		name = name[0]
-		name = re.sub("\n", "", name)
-		names.append(name)
+	if args.verbose:
+		print("  Reading table:", args.table)
+	names = openNames(args.table)
 
-# Reading table ------------------------------------------------------------------------------------
+# Changing names -----------------------------------------------------------------------------------
 if args.order:
 	if args.verbose:
 		print("  Changing names")
 	notFound = list()
 	with open(outFile, "w") as outfile:
-		for line in open(args.file_in):
-			if ">" in line:
-				oldname = re.sub(r"\>", "", line)
-				oldname = re.sub("\n", "", oldname)
-				if oldname in names:
-					newname = names[oldname]
-					print(">" + newname, end="\n", file=outfile)
+		# Lines are kept until a batch of headers is collected, and all headers of the batch are looked up at once
+		lines = list()
+		headers = list()
+		def writeBatch():
+			found = lookupNames(names, headers)
+			for line in lines:
+				if line.startswith(">"):
+					oldname = line[1:].rstrip("\n")
+					if oldname in found:
+						outfile.write(">" + found[oldname] + "\n")
+					else:
+						notFound.append(oldname)
+						outfile.write(">" + oldname + "\n")
 				else:
-					notFound.append(oldname)
-					print(">" + oldname, end="\n", file=outfile)
-			else:
-				print(line, end="", file=outfile)
+					outfile.write(line)
+		for line in open(args.file_in):
+			if line.startswith(">"):
+				headers.append(line[1:].rstrip("\n"))
+				if len(headers) > BATCH:
+					headers.pop()
+					writeBatch()
+					lines = list()
+					headers = [line[1:].rstrip("\n")]
+			lines.append(line)
+		writeBatch()
 	if len(notFound) > 0:
 		print("  The following tips were not found in the list, and therefore not renamed:")
 		for name in notFound:
-			print("   ", name, end="")
+			print("   ", name)
 else:
 	if args.verbose:
 		print("  Changing names in the given order")
 	with open(outFile, "w") as outfile:
+		countl = 0
 		countf = 0
+		table = open(args.table)
 		for line in open(args.file_in):
-			if ">" in line:
-				print(">" + names[countf], end="\n", file=outfile)
+			if line.startswith(">"):
 				countf += 1
+				name = table.readline().strip().split()
+				if len(name) > 0:
+					countl += 1
+					print(">" + name[0], end="\n", file=outfile)
+				else:
+					print(line, end="", file=outfile)
 			else:
 				print(line, end="", file=outfile)
+		for line in table:
+			if line.strip() != "":
+				countl += 1
+		table.close()
 	if countl != countf:
 		print("  Warning! Different number of sequences (", countf, ") and names (", countl, ") provided.", sep="")
 
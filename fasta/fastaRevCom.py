@@ -1,8 +1,8 @@
 #!/usr/bin/env python3
 
 import argparse
-from Bio import SeqIO
 import sys
+from fastaTransform import compileTable, transformFile
 
 parser = argparse.ArgumentParser(description="Reverse and(/or) complement sequeces in a fasta file.")
 
@@ -20,20 +20,20 @@ parser.add_argument("-c", "--complement", dest="complement", required=False, def
 parser.add_argument("-r", "--reverse", dest="reverse", required=False, default=None, action="store_true",
                     help="If selected, returns only the reverse sequences.")
 
+parser.add_argument("-w", "--wrap", dest="wrap", required=False, type=int, default=None,
+                    help="Line width of the output sequences. By default the line width of every input sequence is kept, '0' writes each sequence in one line.")
+
 args = parser.parse_args()
 
 if args.complement is not None and args.reverse is not None:
     print("\nError: Either you want the reverse or the complement sequences.\n  Please select either '-c/--complement', '-r/--reverse' or none, but not the two options.\n")
     sys.exit(1)
 
-with open(args.file_out, "w") as outfile:
-    for i in SeqIO.parse(open(args.file_in), "fasta"):
-        sequence = i.seq
-        name = i.id
-        if args.complement is None and args.reverse is None:
-            sequence = sequence.reverse_complement()
-        if args.complement is not None:
-            sequence = sequence.complement()
-        if args.reverse is not None:
-            sequence = sequence[::-1]
-        print(">" + str(name) + "\n" + str(sequence), file=outfile)
+if args.complement is None and args.reverse is None:
+    table, delete, reverse = compileTable(["revcom"])
+if args.complement is not None:
+    table, delete, reverse = compileTable(["complement"])
+if args.reverse is not None:
+    table, delete, reverse = compileTable(["reverse"])
+
+transformFile(args.file_in, args.file_out, table, delete, reverse, args.wrap)
@@ -4,6 +4,9 @@ import argparse
 from Bio import SeqIO
 import re
 import os
+from alignmentCache import CACHE, loadFasta, seqRecords
+from alignmentCoordinates import residueIndex, residueToColumn, findSequence
+import sys
 
 parser = argparse.ArgumentParser(description="Split a fasta file at given positions. Output files will be exported to the input file name followed by increasing integers.")
 
@@ -25,6 +28,12 @@ parser.add_argument("-r", "--remove", dest="remove", required=False, default=Non
 parser.add_argument("-u", "--unaligned", dest="unalign", required=False, default=None, action="store_true",
                         help="If selected, removes gaps ('-') in output files.")
 
+parser.add_argument("-R", "--reference", dest="reference", required=False, default=None,
+                    help="A sequence name. If selected, the positions given in '-p/--positions' are residues of this (ungapped) sequence instead of alignment columns (e.g.; to split at a primer position).")
+
+parser.add_argument("-C", "--cache", dest="cache", required=False, nargs='?', default=None, const=CACHE,
+                    help="If selected, the parsed alignment is stored in (or read from) a binary cache so other tools do not have to parse it again. A directory can be given, by default = " + CACHE + ".")
+
 args = parser.parse_args()
 
 position = re.sub("^\+", "0+", args.position)
@@ -36,6 +45,25 @@ for pos in position.split('+'):
     file_i += 1
     positions[pos] = file_i
 
+if args.cache is not None or args.reference is not None:
+    cached = loadFasta(args.file_in, args.cache)
+
+if args.reference is not None:
+    try:
+        ref = findSequence(cached[0], args.reference)
+        index = residueIndex(cached[1][cached[2][ref]:cached[2][ref+1]])
+        columns = {}
+        for pos, file_i in positions.items():
+            if pos != "0" and pos != "end":
+                col = str(residueToColumn(index, int(pos)))
+                print("  Residue ", pos, " of '", args.reference, "' is at alignment position ", col, sep="")
+                pos = col
+            columns[pos] = file_i
+        positions = columns
+    except ValueError as e:
+        print("Error:", e)
+        sys.exit(1)
+
 if args.directory is not None:
     d = args.directory + "/"
     if not os.path.exists(args.directory):
@@ -43,6 +71,11 @@ if args.directory is not None:
 else:
     d = ""
 
+def records():
+    if args.cache is not None or args.reference is not None:
+        return seqRecords(*cached)
+    return SeqIO.parse(open(args.file_in), "fasta")
+
 for i in list(range(0, len(positions)-1)):
     b=list(positions.keys())[i]
     e=list(positions.keys())[i+1]
@@ -51,7 +84,7 @@ for i in list(range(0, len(positions)-1)):
     r = 0
     u = 0
     with open(fileout, "w") as outfile:
-        for f in SeqIO.parse(open(args.file_in), "fasta"):
+        for f in records():
             if e == "end":
                  f.seq = f.seq[int(b):]
             else:
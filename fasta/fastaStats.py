@@ -4,7 +4,10 @@ import argparse
 from Bio import SeqIO
 import re
 import statistics
+import sys
 import numpy as np
+from alignmentCache import CACHE, loadFasta, seqRecords
+from fastaCount import countFasta
 
 parser = argparse.ArgumentParser(description="Returns overall statistics and numbers from a fasta file.")
 
@@ -20,11 +23,32 @@ parser.add_argument("-s", "--short", dest="short", required=False, action="store
 parser.add_argument("-d", "--detailed", dest="detailed", required=False, action="store_true",
 					help="If selected, besides printing the overall statistics, will print similar statistics for every sequence. This option is incopatible with the '-s/--short' option.")
 
+parser.add_argument("-c", "--count", dest="count", required=False, action="store_true",
+					help="If selected, will only count the number of sequences, bases and gaps scanning the raw file without parsing the sequences, which is much faster for large or many files. Alignment is not checked.")
+
+parser.add_argument("-g", "--gaps", dest="gaps", required=False, default="-.",
+					help="With '-c/--count', the character(s) representing the gaps, as in fastaCount.py. By default='%(default)s'.")
+
+parser.add_argument("-C", "--cache", dest="cache", required=False, nargs='?', default=None, const=CACHE,
+					help="If selected, the parsed alignment is stored in (or read from) a binary cache so other tools do not have to parse it again. A directory can be given, by default = " + CACHE + ".")
+
 args = parser.parse_args()
 
+if args.count:
+	print("File\tSequences\tBases\tGaps")
+	for file in args.fileIn:
+		seqs, totalbp, gaps = countFasta(file, args.gaps.encode())
+		print(str(file), ":\t", seqs, "\t", totalbp, "\t", gaps, sep="")
+	sys.exit(0)
+
 if(args.short):
 	print("File\tSequences\tBases\t(Positions\tGaps)")
 
+def records(file):
+	if args.cache is not None:
+		return seqRecords(*loadFasta(file, args.cache))
+	return SeqIO.parse(open(file), "fasta")
+
 for file in args.fileIn:
 	seqs = 0
 	lengths = []
@@ -36,7 +60,7 @@ for file in args.fileIn:
 	Ns = 0
 	gaps = 0
 	ambiguities = list()
-	for i in SeqIO.parse(open(file), "fasta"):
+	for i in records(file):
 		seqs += 1
 		seq = i.seq
 		lengthsRaw.append(len(seq))
@@ -107,7 +131,7 @@ for file in args.fileIn:
 				print("sequence\tlength\tA\tC\tG\tT\tambiguities")
 			else:
 				print("sequence\tlength\tA\tC\tG\tT\tambiguities\tgaps\tproportionGaps")
-			for i in SeqIO.parse(open(file), "fasta"):
+			for i in records(file):
 				name = i.id
 				seq = i.seq
 				l = len(re.sub("-", "", str(seq)))
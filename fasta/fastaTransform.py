@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+
+# Besides being used from the command line, this script is imported by fastaUnalign.py, fastaChangeCases.py,
+# fastaChangeNucleotides.py and fastaRevCom.py, so keep it in the same folder as them.
+
+import argparse
+import re
+import sys
+
+BUFFER = 1 << 24
+
+# Complement of every IUPAC nucleotide code, in upper and lower cases
+COMPLEMENT = bytes.maketrans(b"ACGTUNRYSWKMBDHVacgtunryswkmbdhv",
+							 b"TGCAANYRSWMKVHDBtgcaanyrswmkvhdb")
+
+AMBIGUITIES = bytes.maketrans(b"RYSWKMBDHVryswkmbdhv",
+							  b"NNNNNNNNNNnnnnnnnnnn")
+
+OPERATIONS = "ungap, upper, lower, X:Y (replaces X by Y), ambiguities (replaces ambiguities by N), complement, reverse and revcom"
+
+# Compiling the operations _________________________________________________________________________
+def compileTable(operations, gaps="-"):
+	"""Compiles a chain of operations into one translation table, the bytes to be deleted and whether the sequences have to be reversed."""
+	table = bytes(range(256))
+	delete = set()
+	reverse = False
+	for operation in operations:
+		if operation == "ungap":
+			gapSet = set(gaps.encode())
+			if ord(">") in gapSet or ord("\n") in gapSet:
+				raise ValueError("'>' and new lines cannot be used as gap characters")
+			delete.update(b for b in range(256) if table[b] in gapSet)
+		elif operation == "upper":
+			table = table.translate(bytes.maketrans(b"abcdefghijklmnopqrstuvwxyz", b"ABCDEFGHIJKLMNOPQRSTUVWXYZ"))
+		elif operation == "lower":
+			table = table.translate(bytes.maketrans(b"ABCDEFGHIJKLMNOPQRSTUVWXYZ", b"abcdefghijklmnopqrstuvwxyz"))
+		elif operation == "ambiguities":
+			table = table.translate(AMBIGUITIES)
+		elif operation == "complement":
+			table = table.translate(COMPLEMENT)
+		elif operation == "reverse":
+			reverse = not reverse
+		elif operation == "revcom":
+			table = table.translate(COMPLEMENT)
+			reverse = not reverse
+		elif re.match("^.:.$", operation):
+			table = table.translate(bytes.maketrans(operation[0].encode(), operation[2].encode()))
+		else:
+			raise ValueError("unknown operation '" + operation + "'. Accepted operations are: " + OPERATIONS)
+	for c in b">\n":
+		if table[c] != c or table.count(c) != 1:
+			raise ValueError("'>' and new lines cannot be replaced")
+	return table, bytes(sorted(delete)), reverse
+
+# Applying the table _______________________________________________________________________________
+def transformBlock(block, table, delete):
+	# Sequences never contain '>', so everything between a '>' and the next new line is a header
+	out = list()
+	start = 0
+	while True:
+		h = block.find(b">", start)
+		if h == -1:
+			out.append(block[start:].translate(table, delete))
+			break
+		out.append(block[start:h].translate(table, delete))
+		e = block.find(b"\n", h)
+		if e == -1:
+			out.append(block[h:])
+			break
+		out.append(block[h:e+1])
+		start = e+1
+	return b"".join(out)
+
+def reverseRecords(chunk, table, delete, wrap=None):
+	"""Translates and reverses every record of a chunk of complete fasta records. If 'wrap' is None the line width of each input record is kept, if 0 each sequence is written in one line."""
+	out = list()
+	delete = delete + b"\r\n"
+	for i, record in enumerate(chunk.split(b"\n>")):
+		if i > 0:
+			record = b">" + record
+		if record.startswith(b">"):
+			e = record.find(b"\n")
+			if e == -1:
+				out.append(record + b"\n")
+				continue
+			out.append(record[:e+1])
+			record = record[e+1:]
+		if wrap is None:
+			w = record.find(b"\n")
+			if w > 0 and record[w-1:w] == b"\r":
+				w -= 1
+		else:
+			w = wrap
+		# Translating, removing new lines and reversing in place
+		sequence = bytearray(record).translate(table, delete)
+		if not sequence:
+			continue
+		sequence.reverse()
+		if w > 0 and len(sequence) > w:
+			view = memoryview(sequence)
+			out.append(b"\n".join([view[j:j+w] for j in range(0, len(sequence), w)]))
+		else:
+			out.append(sequence)
+		out.append(b"\n")
+	return b"".join(out)
+
+def transformFile(fileIn, fileOut, table, delete=b"", reverse=False, wrap=None):
+	"""Applies a compiled table to every sequence of a fasta file in one streaming pass. The 'wrap' argument only applies to reversed sequences (see reverseRecords)."""
+	with open(fileIn, "rb") as infile, open(fileOut, "wb", buffering=BUFFER) as outfile:
+		if not reverse:
+			while True:
+				# Read a large block and complete it up to the end of the line
+				block = infile.read(BUFFER)
+				if not block:
+					break
+				block += infile.readline()
+				outfile.write(transformBlock(block, table, delete))
+		else:
+			# Records are reversed once complete, so the buffer holds at most the records of one block or one long record
+			buffer = bytearray()
+			while True:
+				block = infile.read(BUFFER)
+				if not block:
+					break
+				block += infile.readline()
+				last = block.rfind(b"\n>")
+				if last != -1:
+					last += 1
+				elif block.startswith(b">"):
+					last = 0
+				else:
+					buffer += block
+					continue
+				buffer += block[:last]
+				outfile.write(reverseRecords(buffer, table, delete, wrap))
+				buffer = bytearray(block[last:])
+			outfile.write(reverseRecords(buffer, table, delete, wrap))
+
+# Command line _____________________________________________________________________________________
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Applies a chain of operations to the sequences of a fasta file in one single pass (e.g.; removing gaps, changing cases, replacing characters, masking ambiguities and reverse complementing).")
+
+	requiredArgs = parser.add_argument_group('required arguments')
+
+	requiredArgs.add_argument("-f", "--file", dest="file_in", required=True,
+						help="Input fasta file.")
+
+	requiredArgs.add_argument("-p", "--operations", dest="operations", required=True,
+						help="Operations to be applied in the given order, separated by a '+' (i.e.; 'ungap+upper+U:T+ambiguities+revcom'). Accepted operations are: " + OPERATIONS + ".")
+
+	parser.add_argument("-o", "--output", dest="file_out", required=False, default=None,
+						help="Output fasta file. By default will add '_transformed' before the extension.")
+
+	parser.add_argument("-g", "--gaps", dest="gaps", required=False, default="-",
+						help="The character(s) removed by the 'ungap' operation. By default='%(default)s'.")
+
+	parser.add_argument("-w", "--wrap", dest="wrap", required=False, type=int, default=None,
+						help="Line width of reversed sequences. By default the line width of every input sequence is kept, '0' writes each sequence in one line.")
+
+	parser.add_argument("-v", "--verbose", dest="verbose", required=False, action="store_false",
+						help="If selected, will not print information to the console.")
+
+	args = parser.parse_args()
+
+	if args.file_out is None:
+		outFile = re.sub("\\.[^\\.]+$", "_transformed.", args.file_in) + re.sub(".*\\.", "", args.file_in)
+	else:
+		outFile = args.file_out
+
+	try:
+		table, delete, reverse = compileTable(args.operations.split("+"), args.gaps)
+	except ValueError as e:
+		print("Error:", e)
+		sys.exit(1)
+
+	if args.verbose:
+		print("  Transforming", args.file_in)
+	transformFile(args.file_in, outFile, table, delete, reverse, args.wrap)
+
+	if args.verbose:
+		print("  Exported file:", outFile)
+		print("Done")
@@ -2,6 +2,9 @@
 
 import argparse
 import re
+import sys
+from multiprocessing import Pool
+from fastaTransform import compileTable, transformFile
 
 parser = argparse.ArgumentParser(description="Removes gaps from sequences in a fasta file.")
 
@@ -11,41 +14,69 @@ requiredArgs = parser.add_argument_group('required arguments')
 requiredArgs.add_argument("-f", "--file", dest="fileIn", nargs='+', required=True,
 						  help="Input fasta file(s).")
 
-parser.add_argument("-o", "--output", dest="fileOut", nargs='+', required=False, 
+parser.add_argument("-o", "--output", dest="fileOut", nargs='+', required=False,
 					default=None,
 					help="Output fasta file(s). By default will append '_unaligned' to the end of the file name (respecting the extension).")
 
-parser.add_argument("-g", "--gaps", dest="gap", required=False, 
+parser.add_argument("-g", "--gaps", dest="gap", required=False,
 					default="-",
-					help="The character representing the gaps. By default='-'.")
+					help="The character(s) representing the gaps. Every character given is taken literally and removed (e.g.; '-g=-.' will remove both '-' and '.'). By default='-'.")
+
+parser.add_argument("-t", "--threads", dest="threads", required=False, type=int,
+					default=1,
+					help="Number of input files to be unaligned in parallel. By default=%(default)s.")
+
+parser.add_argument("-i", "--index", dest="index", required=False, action="store_true",
+					help="If selected, will also export for every input file the index mapping alignment columns to positions in the unaligned sequences (see alignmentCoordinates.py), adding '_coordinates.npy' to the output file name excluding the extension. Files that are not aligned are unaligned without index.")
 
 parser.add_argument("-v", "--verbose", dest="verbose", required=False, action="store_false",
 					help="If selected, will not print information to the console.")
 
 args = parser.parse_args()
 
+# Setting variables and functions __________________________________________________________________
 if args.fileOut is not None:
-	i = 0
 	if len(args.fileIn) != len(args.fileOut):
-		import sys
 		print("Error: Number of input files do not match number of output files.")
 		sys.exit(1)
+	outFiles = args.fileOut
+else:
+	outFiles = [re.sub("\\.[^\\.]+$", "_unaligned.", filei) + re.sub(".*\\.", "", filei) for filei in args.fileIn]
 
-for filei in args.fileIn:
-	if args.verbose:
-		print("  Unaligning", filei)
-	if args.fileOut is None:
-		outFile = re.sub("\\.[^\\.]+$", "_unaligned.", filei) + re.sub(".*\\.", "", filei)
+try:
+	table, delete, reverse = compileTable(["ungap"], args.gap)
+except ValueError as e:
+	print("Error:", e)
+	sys.exit(1)
+
+def unalign(files):
+	"""Unaligns one file and exports its index if selected. Returns the file name and the error message if the index could not be exported (e.g.; the input is not aligned)."""
+	filei, outFile = files
+	transformFile(filei, outFile, table, delete)
+	if args.index:
+		from alignmentCoordinates import exportIndex
+		try:
+			exportIndex(filei, re.sub("\\.[^\\.]+$", "", outFile) + "_coordinates.npy", args.gap.encode())
+		except ValueError as e:
+			return filei, str(e)
+	return filei, None
+
+# Unaligning _______________________________________________________________________________________
+if __name__ == "__main__":
+	if args.threads > 1 and len(args.fileIn) > 1:
+		with Pool(min(args.threads, len(args.fileIn))) as pool:
+			for filei, error in pool.imap(unalign, zip(args.fileIn, outFiles)):
+				if args.verbose:
+					print("  Unaligned", filei)
+				if error is not None:
+					print("Error:", error + ", the index is not exported")
 	else:
-		outFile = args.fileOut[i]
-		i += 1
-	with open(outFile, "w") as outfile:
-		for line in open(filei):
-			if line.startswith(">"):
-				print(line, end="", file=outfile)
-			else:
-				lineout = re.sub(args.gap, "", line)
-				print(lineout, end="", file=outfile)
-
-if args.verbose:
-	print("Done")
+		for filei, outFile in zip(args.fileIn, outFiles):
+			if args.verbose:
+				print("  Unaligning", filei)
+			error = unalign((filei, outFile))[1]
+			if error is not None:
+				print("Error:", error + ", the index is not exported")
+
+	if args.verbose:
+		print("Done")
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+
+# Besides being used from the command line, this script is imported by sequenceSelect.py, findSeqs.py and checkConstrainTree.py,
+# so keep it in the same folder as them (or in the 'fasta' folder of this repository).
+
+import argparse
+import mmap
+import os
+import pathlib
+import re
+import sqlite3
+
+SUFFIX = ".headers.sqlite"
+
+# Building the index _______________________________________________________________________________
+def indexPath(fasta):
+	"""Default path of the header index of a fasta file."""
+	return fasta + SUFFIX
+
+def fileStamp(fasta):
+	stat = os.stat(fasta)
+	return str(stat.st_size) + ":" + str(stat.st_mtime_ns)
+
+def readHeaders(fasta):
+	"""Yields the record number, header (without '>'), and start and end offsets in bytes of every record of a fasta file."""
+	with open(fasta, "rb") as f:
+		if os.fstat(f.fileno()).st_size == 0:
+			return
+		with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+			start = 0 if mm[:1] == b">" else mm.find(b"\n>")
+			if start == -1:
+				return
+			if start > 0:
+				start += 1
+			i = 0
+			while start != -1:
+				eol = mm.find(b"\n", start)
+				if eol == -1:
+					eol = len(mm)
+				header = mm[start+1:eol].rstrip(b"\r").decode()
+				end = mm.find(b"\n>", eol)
+				end = len(mm) if end == -1 else end + 1
+				yield i, header, start, end
+				i += 1
+				start = end if end < len(mm) else -1
+
+def buildHeaderIndex(fasta, index=None, verbose=False):
+	"""Stores the headers and offsets of every record of a fasta file in an SQLite file, with a trigram full-text index for substring queries."""
+	if index is None:
+		index = indexPath(fasta)
+	if os.path.exists(index):
+		os.remove(index)
+	con = sqlite3.connect(index)
+	con.execute("PRAGMA journal_mode = OFF")
+	con.execute("PRAGMA synchronous = OFF")
+	con.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+	con.execute("CREATE TABLE headers (id INTEGER PRIMARY KEY, name TEXT, header TEXT, start INTEGER, end INTEGER)")
+	count = 0
+	batch = list()
+	for i, header, start, end in readHeaders(fasta):
+		name = header.split(None, 1)[0] if header.strip() else header
+		batch.append((i, name, header, start, end))
+		if len(batch) == 100000:
+			con.executemany("INSERT INTO headers VALUES (?, ?, ?, ?, ?)", batch)
+			count += len(batch)
+			batch = list()
+			if verbose:
+				print("\r    ", count, " headers stored", sep="", end="")
+	con.executemany("INSERT INTO headers VALUES (?, ?, ?, ?, ?)", batch)
+	count += len(batch)
+	if verbose:
+		print("\r    ", count, " headers stored", sep="")
+	try:
+		con.execute("CREATE VIRTUAL TABLE tokens USING fts5(header, content='headers', content_rowid='id', tokenize='trigram case_sensitive 1')")
+		con.execute("INSERT INTO tokens(tokens) VALUES ('rebuild')")
+	except sqlite3.OperationalError:
+		# SQLite older than 3.34 has no trigram tokenizer: queries will scan the stored headers instead
+		if verbose:
+			print("    Warning! Full-text search not available in this SQLite version")
+	con.executemany("INSERT INTO meta VALUES (?, ?)", [("fasta", os.path.abspath(fasta)), ("stamp", fileStamp(fasta))])
+	con.commit()
+	con.close()
+	return count
+
+# Querying the index _______________________________________________________________________________
+def openHeaderIndex(fasta, index=None):
+	"""Returns a read-only connection to the header index of a fasta file, or None if there is no index or it is older than the fasta file."""
+	if index is None:
+		index = indexPath(fasta)
+	if not os.path.exists(index):
+		return None
+	con = sqlite3.connect(pathlib.Path(index).resolve().as_uri() + "?mode=ro", uri=True)
+	con.execute("PRAGMA mmap_size = " + str(1 << 40))
+	stamp = con.execute("SELECT value FROM meta WHERE key = 'stamp'").fetchone()
+	if stamp is None or stamp[0] != fileStamp(fasta):
+		con.close()
+		return None
+	return con
+
+def hasTokens(con):
+	return con.execute("SELECT 1 FROM sqlite_master WHERE name = 'tokens'").fetchone() is not None
+
+def searchHeaders(con, pattern, regex=False, field="header"):
+	"""Returns the record number, name (header up to the first space), and start and end offsets of the records whose header (or 'name') contains the pattern, or matches it if 'regex' is True, in order of appearance."""
+	literal = not regex or re.escape(pattern) == pattern
+	if literal and len(pattern) >= 3 and hasTokens(con):
+		# Candidates are found by the trigram index and confirmed in the requested field
+		rows = con.execute("SELECT h.id, h.name, h." + field + ", h.start, h.end FROM tokens JOIN headers h ON h.id = tokens.rowid WHERE tokens MATCH ? ORDER BY h.id", ['"' + pattern.replace('"', '""') + '"'])
+	else:
+		rows = con.execute("SELECT id, name, " + field + ", start, end FROM headers ORDER BY id")
+	if literal:
+		return [(i, name, start, end) for i, name, text, start, end in rows if pattern in text]
+	compiled = re.compile(pattern)
+	return [(i, name, start, end) for i, name, text, start, end in rows if compiled.search(text)]
+
+def headerNames(con):
+	"""Returns the names (header up to the first space) of every record, in order of appearance."""
+	return [name for name, in con.execute("SELECT name FROM headers ORDER BY id")]
+
+def headerCount(con):
+	return con.execute("SELECT count(*) FROM headers").fetchone()[0]
+
+def readRecord(handle, start, end):
+	"""Reads a record (header and sequence) from a fasta file opened in binary mode given its offsets."""
+	handle.seek(start)
+	return handle.read(end - start)
+
+# Command line _____________________________________________________________________________________
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Builds once an index of the headers of a (large) fasta file, so sequenceSelect.py, findSeqs.py and checkConstrainTree.py can search the headers with substring or regex patterns without reading the file again. Or searches an existing index.")
+
+	requiredArgs = parser.add_argument_group('required arguments')
+
+	requiredArgs.add_argument("-f", "--file", dest="file_in", required=True,
+						help="Input fasta file.")
+
+	parser.add_argument("-o", "--output", dest="index", required=False, default=None,
+						help="Output index. By default will add '" + SUFFIX + "' to the fasta file name, where the other scripts will look for it.")
+
+	parser.add_argument("-p", "--pattern", dest="pattern", required=False, default=None, nargs="+",
+						help="Pattern(s) to be searched in an existing index. If selected, prints to the console the record number, name and offsets of the matching records instead of building the index.")
+
+	parser.add_argument("-r", "--regex", dest="regex", required=False, action="store_true",
+						help="If selected, patterns are regular expressions instead of literal strings.")
+
+	parser.add_argument("-v", "--verbose", dest="verbose", required=False, action="store_false",
+						help="If selected, will not print information to the console.")
+
+	args = parser.parse_args()
+
+	if args.pattern is not None:
+		con = openHeaderIndex(args.file_in, args.index)
+		if con is None:
+			import sys
+			print("Error: No index found, or the index is older than the fasta file. Please build it first.")
+			sys.exit(1)
+		print("record\tname\tstart\tend")
+		for pattern in args.pattern:
+			for i, name, start, end in searchHeaders(con, pattern, args.regex):
+				print(i + 1, name, start, end, sep="\t")
+	else:
+		index = indexPath(args.file_in) if args.index is None else args.index
+		if args.verbose:
+			print("  Indexing headers of:", args.file_in)
+		buildHeaderIndex(args.file_in, index, args.verbose)
+		if args.verbose:
+			print("  Exported index:", index)
+			print("Done")
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+# Besides being used from the command line, this script is imported by fastaRename.py and treeTipRename.py,
+# so keep it in the same folder as them (or in the 'fasta' folder of this repository).
+
+import argparse
+import pathlib
+import re
+import sqlite3
+
+BATCH = 500
+
+# Building the database ____________________________________________________________________________
+def isNameDatabase(path):
+	"""Checks whether a file is an SQLite database built with this script instead of a tab delimited table."""
+	with open(path, "rb") as f:
+		return f.read(16) == b"SQLite format 3\x00"
+
+def buildNameDatabase(table, database, verbose=False):
+	"""Stores a tab delimited table with the old names in one column and the new names in the second column in an SQLite key-value file."""
+	con = sqlite3.connect(database)
+	con.execute("PRAGMA journal_mode = OFF")
+	con.execute("PRAGMA synchronous = OFF")
+	con.execute("DROP TABLE IF EXISTS names")
+	con.execute("CREATE TABLE names (old TEXT PRIMARY KEY, new TEXT) WITHOUT ROWID")
+	count = 0
+	batch = list()
+	for line in open(table):
+		tmp = line.strip().split()
+		if len(tmp) < 2:
+			continue
+		batch.append((tmp[0], tmp[1]))
+		if len(batch) == 100000:
+			con.executemany("INSERT OR REPLACE INTO names VALUES (?, ?)", batch)
+			count += len(batch)
+			batch = list()
+			if verbose:
+				print("\r    ", count, " names stored", sep="", end="")
+	con.executemany("INSERT OR REPLACE INTO names VALUES (?, ?)", batch)
+	count += len(batch)
+	con.commit()
+	con.close()
+	if verbose:
+		print("\r    ", count, " names stored", sep="")
+	return count
+
+# Reading names ____________________________________________________________________________________
+def openNames(path):
+	"""Returns the names of a tab delimited table in a dictionary, or a read-only memory-mapped connection if the file is a database built with this script."""
+	if isNameDatabase(path):
+		# The path is given as a file URI, so characters such as '?', '#' or '%' are escaped
+		con = sqlite3.connect(pathlib.Path(path).resolve().as_uri() + "?mode=ro", uri=True)
+		con.execute("PRAGMA mmap_size = " + str(1 << 40))
+		return con
+	names = {}
+	for line in open(path):
+		tmp = line.strip().split()
+		if len(tmp) >= 2:
+			names[tmp[0]] = tmp[1]
+	return names
+
+def lookupNames(names, keys):
+	"""Looks up a batch of names and returns a dictionary with the new name of the names found."""
+	if isinstance(names, dict):
+		return {key: names[key] for key in keys if key in names}
+	out = {}
+	keys = list(set(keys))
+	for i in range(0, len(keys), BATCH):
+		batch = keys[i:i+BATCH]
+		query = "SELECT old, new FROM names WHERE old IN (" + ",".join("?" * len(batch)) + ")"
+		out.update(names.execute(query, batch))
+	return out
+
+# Command line _____________________________________________________________________________________
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Builds once a key-value database from a tab delimited table with the old names in one column and the new names in the second column. The database can then be given to fastaRename.py and treeTipRename.py instead of the table, keeping the memory flat for very large tables.")
+
+	requiredArgs = parser.add_argument_group('required arguments')
+
+	requiredArgs.add_argument("-l", "--list", dest="table", required=True,
+						help="A tab delimited table with the old names in one column and the new names in the second column.")
+
+	parser.add_argument("-o", "--output", dest="database", required=False, default=None,
+						help="Output database. By default will replace the extension of the table by '.sqlite'.")
+
+	parser.add_argument("-v", "--verbose", dest="verbose", required=False, action="store_false",
+						help="If selected, will not print information to the console.")
+
+	args = parser.parse_args()
+
+	if args.database is None:
+		database = re.sub("\\.[^\\.]+$", "", args.table) + ".sqlite"
+	else:
+		database = args.database
+
+	if args.verbose:
+		print("  Building database from:", args.table)
+	buildNameDatabase(args.table, database, args.verbose)
+
+	if args.verbose:
+		print("  Exported database:", database)
+		print("Done")
@@ -2,9 +2,10 @@
 
 import argparse
 import sys
+from alignmentFormats import readPhylip, writeAlignment
 
 
-parser = argparse.ArgumentParser(description="Converts a phylip file to fasta format, respecting the sequence name length.")
+parser = argparse.ArgumentParser(description="Converts a phylip file (sequential or interleaved) to fasta format, respecting the sequence name length.")
 
 requiredArgs = parser.add_argument_group('required arguments')
 
@@ -16,22 +17,19 @@ requiredArgs.add_argument("-o", "--output", dest="file_out", required=True,
 
 args = parser.parse_args()
 
-with open(args.file_out, "w") as outfile:
+with open(args.file_in) as infile:
+	line = infile.readline().strip().split()
+print("Alignment has", line[0], "sequences and ", line[1], "positions\nConverting")
+
+def checkLengths(records):
 	j = 0
-	for i in open(args.file_in):
+	for name, sequence in records:
 		j += 1
-		line = i.strip().split()
-		name = line[0]
-		sequence = line[1]
-		if j == 1:
-			alignLength = int(sequence)
-			print("Alignment has", name, "sequences and ", sequence, "positions\nConverting")
-		else:
-			if len(sequence) != alignLength:
-				print("\nERROR: Alignment contains sequences of different length")
-				print("  Sequence", j, "has", len(sequence), "positions")
-				print("Stop converting\n")
-				sys.exit(1)
-			else:
-				print(">", name, "\n", sequence, sep="", file=outfile)
-
+		if len(sequence) != int(line[1]):
+			print("\nERROR: Alignment contains sequences of different length")
+			print("  Sequence", j, "has", len(sequence), "positions")
+			print("Stop converting\n")
+			sys.exit(1)
+		yield name, sequence
+
+writeAlignment(checkLengths(readPhylip(args.file_in)), args.file_out, "fasta")
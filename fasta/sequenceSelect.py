@@ -2,6 +2,7 @@
 
 import argparse
 import re
+from headerIndex import openHeaderIndex, searchHeaders, headerCount, readRecord
 
 version='0.4.0-beta'
 
@@ -19,7 +20,7 @@ eitherArgs.add_argument("-l", "--list", dest="listSeq", required=False, default=
 						help="List of sequences to be selected. This must be a different file with each sequence name in a different line.")
 
 eitherArgs.add_argument("-p", "--pattern", dest="pattern", required=False, default=None, nargs="+",
-						help="Pattern(s) to be matched for selection of the sequences. When using this option in combination with '-k/--keep', it might be faster to use 'grep -A 1 PATTERN FILE_IN > FILE_OUT' if each sequence from the input file is in a single line.")
+						help="Pattern(s) to be matched for selection of the sequences. When using this option in combination with '-k/--keep', it might be faster to use 'grep -A 1 PATTERN FILE_IN > FILE_OUT' if each sequence from the input file is in a single line. If the headers of the input file have been indexed with headerIndex.py, the index is used instead of reading the whole file.")
 
 outputArgs.add_argument("-o", "--output", dest="file_out", required=False, default=None,
 						help="Output file. By default will add '_selected' to the input file name. If the file already exists, sequences will be appended at the end of the file.")
@@ -85,9 +86,31 @@ else:
 if args.listSeq is not None:
 	listSeq = [line.strip() for line in open(args.listSeq)]
 
-if args.verbose:
-	print("  Reading input file:    ", args.file_in)
-infile = readFasta(args.file_in)
+# Only the matching records are read when the headers are indexed
+index = None
+if args.pattern is not None and args.listSeq is None:
+	index = openHeaderIndex(args.file_in)
+
+if index is not None:
+	if args.verbose:
+		print("  Reading header index:  ", args.file_in)
+	matches = set()
+	for pattern in args.pattern:
+		matches.update((i, start, end) for i, name, start, end in searchHeaders(index, pattern))
+	if keep:
+		records = sorted(matches)
+	else:
+		matched = {i for i, start, end in matches}
+		records = [(i, start, end) for i, start, end in index.execute("SELECT id, start, end FROM headers ORDER BY id") if i not in matched]
+	infile = {}
+	with open(args.file_in, "rb") as handle:
+		for i, start, end in records:
+			lines = readRecord(handle, start, end).decode().splitlines()
+			infile[lines[0][1:]] = "".join(lines[1:]).replace("-", "").upper()
+else:
+	if args.verbose:
+		print("  Reading input file:    ", args.file_in)
+	infile = readFasta(args.file_in)
 
 # Selecting sequences ______________________________________________________________________________
 seq_in = 0
@@ -107,6 +130,7 @@ with open(outFile, "a") as outfile:
 					if pattern in key:
 						seq_out += 1
 						print(">" + str(key) + "\n" + str(val), file=outfile, flush=True)
+						break
 		elif remove:
 			if args.listSeq is not None:
 				if key not in listSeq:
@@ -121,6 +145,9 @@ with open(outFile, "a") as outfile:
 					seq_out += 1
 					print(">" + str(key) + "\n" + str(val), file=outfile, flush=True)
 
+if index is not None:
+	seq_in = headerCount(index)
+
 if args.verbose:
 	print("  Output file written to:", outFile)
 	if args.listSeq is not None:
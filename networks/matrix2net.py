@@ -3,13 +3,13 @@
 import argparse
 import re
 
-parser = argparse.ArgumentParser(description="Creates a network file from a matrix of similarities.O")
+parser = argparse.ArgumentParser(description="Creates a network file from a matrix of similarities.")
 
 # Add the arguments to the parser
 requiredArgs = parser.add_argument_group('required arguments')
 
 requiredArgs.add_argument("-f", "--file", dest="file_in", required=True,
-					help="A tab separated matrix file, with headers and row names.")
+					help="A tab separated matrix file, with headers and row names. A square numpy matrix ('.npy', as exported by 'fasta/alignmentDistance.py') can also be given, with the names in a separate file.")
 
 parser.add_argument("-o", "--output", dest="file_out", required=False, default=None,
 					help="Output file. By default will add '_net.net' to the input file")
@@ -17,6 +17,15 @@ parser.add_argument("-o", "--output", dest="file_out", required=False, default=N
 parser.add_argument("-t", "--threshold", dest="threshold", required=False, default=1, type=float,
 					help="Considers only hits equal or above the given threshold. By default=1")
 
+parser.add_argument("-n", "--names", dest="names", required=False, default=None,
+					help="For '.npy' matrices, a file with the row (and column) names, one per line. By default will replace '.npy' by '_names.txt' in the input file.")
+
+parser.add_argument("-k", "--clean", dest="cleaning", required=False, action="store_true",
+					help="If selected, assuming a square matrix with rows and columns in the same order, reciprocal (A-B = B-A) and equal (A-A) hits are not exported.")
+
+parser.add_argument("-c", "--chunk", dest="chunk", required=False, default=1024, type=int,
+					help="For '.npy' matrices, number of rows thresholded at once. By default=%(default)s.")
+
 parser.add_argument("-a", "--addHeaders", dest="addHeaders", required=False, action="store_true",
 					help="If selected, will add the following headers to the net: 'source target id'.")
 
@@ -36,26 +45,50 @@ if args.verbose:
 with open(out, "w") as outfile:
 	if args.addHeaders:
 		print("source\ttarget\tid", file=outfile)
-	names = list()
-	i = 0
-	for line in open(args.file_in):
-		i += 1
-		linei = line.strip().split('\t')
-		if i == 1:
-			j = 0
-			for tmp in linei:
-				j += 1
-				if j != 1:
-					names.append(tmp)
+	if args.file_in.endswith(".npy"):
+		# The matrix is memory-mapped and thresholded in chunks of rows
+		import numpy as np
+		matrix = np.load(args.file_in, mmap_mode="r")
+		if args.names is None:
+			namesFile = re.sub("\\.npy$", "_names.txt", args.file_in)
 		else:
-			hit = linei[0]
-			hits = linei[1:]
-			hitc = 0
-			for h in hits:
-				hitc += 1
-				if float(h) >= args.threshold:
-					tmp = names[hitc-1]
-					print(hit, "\t", tmp, "\t", h, sep="", file=outfile)
+			namesFile = args.names
+		names = [line.rstrip("\n") for line in open(namesFile)]
+		for b in range(0, matrix.shape[0], args.chunk):
+			if args.verbose:
+				print("\r    ", b, "/", matrix.shape[0], " rows", sep="", end="")
+			chunk = np.asarray(matrix[b:b+args.chunk])
+			rows, cols = np.nonzero(chunk >= args.threshold)
+			if args.cleaning:
+				keep = cols > rows + b
+				rows, cols = rows[keep], cols[keep]
+			for r, c in zip(rows.tolist(), cols.tolist()):
+				print(names[r+b], "\t", names[c], "\t", round(float(chunk[r, c]), 4), sep="", file=outfile)
+		if args.verbose:
+			print("\r    ", matrix.shape[0], "/", matrix.shape[0], " rows", sep="")
+	else:
+		names = list()
+		i = 0
+		for line in open(args.file_in):
+			i += 1
+			linei = line.strip().split('\t')
+			if i == 1:
+				j = 0
+				for tmp in linei:
+					j += 1
+					if j != 1:
+						names.append(tmp)
+			else:
+				hit = linei[0]
+				hits = linei[1:]
+				hitc = 0
+				for h in hits:
+					hitc += 1
+					if args.cleaning and hitc-1 <= i-2:
+						continue
+					if float(h) >= args.threshold:
+						tmp = names[hitc-1]
+						print(hit, "\t", tmp, "\t", h, sep="", file=outfile)
 
 if args.verbose:
 	print("Done")
@@ -4,6 +4,9 @@ import argparse
 from Bio import SeqIO, Phylo
 import os
 import re
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "fasta"))
+from headerIndex import openHeaderIndex, searchHeaders, headerNames
 
 parser = argparse.ArgumentParser(description="From every tree tip in a newick tree, searches every sequence name in a fasta file and exports a polytomic tree with the sequence names.")
 
@@ -14,7 +17,7 @@ requiredArgs.add_argument("-t", "--tree", dest="tree", required=True,
 						  help="A tree file.")
 
 requiredArgs.add_argument("-f", "--fasta", dest="fasta", required=True,
-						  help="A Fasta file.")
+						  help="A Fasta file. If its headers have been indexed with headerIndex.py (in the 'fasta' folder), the index is used instead of reading and searching the whole file.")
 
 parser.add_argument("-d", "--outputDir", dest="dir_out", required=False, action="store",
 					help="The output direcotry file where it will export a text file for every tree tip containing the sequence names found in the fasta file.")
@@ -47,11 +50,17 @@ if args.verbose:
 	print("  Reading tree")
 T = Phylo.read(args.tree, 'newick')
 
-if args.verbose:
-	print("  Reading fasta")
-fasta = list()
-for line in SeqIO.parse(open(args.fasta), "fasta"):
-	fasta.append(line.id)
+index = openHeaderIndex(args.fasta)
+if index is not None:
+	if args.verbose:
+		print("  Reading header index")
+	fasta = headerNames(index)
+else:
+	if args.verbose:
+		print("  Reading fasta")
+	fasta = list()
+	for line in SeqIO.parse(open(args.fasta), "fasta"):
+		fasta.append(line.id)
 
 # Start the search ---------------------------------------------------------------------------------
 if args.verbose:
@@ -65,17 +74,18 @@ for line in T.get_terminals():
 	repeated = 0
 	seqsRep = set()
 	tmpFile = outDir + "/" + sp + ".txt"
+	if index is not None:
+		matches = [name for j, name, start, end in searchHeaders(index, sp, regex=True, field="name")]
+	else:
+		matches = [i for i in fasta if re.search(sp, i)]
 	with open(tmpFile, "w") as tmp:
-		for i in fasta:
-			match = re.search(sp, i)
-			if match:
-				if i in seqs:
-					repeated += 1
-					seqsRep.add(i)
-				seqs.add(i)
-				print(i, file=tmp)
-			if match is None:
-				warnings += 1
+		for i in matches:
+			if i in seqs:
+				repeated += 1
+				seqsRep.add(i)
+			seqs.add(i)
+			print(i, file=tmp)
+		warnings = len(fasta) - len(matches)
 		if warnings == len(fasta):
 			print("    Warning! Taxa '", sp, "' has no matching sequences", sep="")
 			excluded.append(sp)
@@ -4,6 +4,9 @@ import argparse
 from Bio import SeqIO, Phylo
 import os
 import re
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "fasta"))
+from headerIndex import openHeaderIndex, headerNames
 
 parser = argparse.ArgumentParser(description="Checks if all sequences from a fasta file are in the tree file and viceversa")
 
@@ -14,7 +17,7 @@ requiredArgs.add_argument("-t", "--tree", dest="tree", required=True,
 						  help="A tree file in newick format.")
 
 requiredArgs.add_argument("-f", "--fasta", dest="fasta", required=True,
-						  help="A Fasta file.")
+						  help="A Fasta file. If its headers have been indexed with headerIndex.py (in the 'fasta' folder), the names are read from the index instead.")
 
 parser.add_argument("-c", "--check", dest="check", required=False, default=None, choices=['t', 'treeInFasta', 'f', 'fastaInTree'],
 						  help="Only checks in one way: either if all tree tips are present in the fasta file ('t' or 'treeInFasta') or if all sequences in the fasta file are present in the tree file ('f' or 'fastaInTree').")
@@ -27,9 +30,17 @@ tree = list()
 for line in T.get_terminals():
 	tree.append(line.name)
 
-fasta = list()
-for line in SeqIO.parse(open(args.fasta), "fasta"):
-	fasta.append(line.id)
+index = openHeaderIndex(args.fasta)
+if index is not None:
+	fasta = headerNames(index)
+else:
+	fasta = list()
+	for line in SeqIO.parse(open(args.fasta), "fasta"):
+		fasta.append(line.id)
+
+# Sets for constant time membership checks
+treeSet = set(tree)
+fastaSet = set(fasta)
 
 # Start the search ---------------------------------------------------------------------------------
 if args.check is None:
@@ -48,7 +59,7 @@ if checkT == True:
 	allGoodT2F = True
 	seqsT2F = set()
 	for tip in tree:
-		if tip not in fasta:
+		if tip not in fastaSet:
 			allGoodT2F = False
 			seqsT2F.add(tip)
 
@@ -56,7 +67,7 @@ if checkF == True:
 	allGoodF2T = True
 	seqsF2T = set()
 	for seq in fasta:
-		if seq not in tree:
+		if seq not in treeSet:
 			allGoodF2T = False
 			seqsF2T.add(seq)
 
@@ -0,0 +1,529 @@
+#!/usr/bin/env python3
+
+# Compact array representation of phylogenetic trees with a fast newick/nexus reader and writer,
+# imported by other scripts of this folder, so keep it in the same folder as them.
+# Besides, it converts (and counts) trees from the command line.
+
+import argparse
+import hashlib
+import re
+import numpy as np
+
+# Same tokens as Bio.Phylo, so trees are read the same way
+TOKENS = re.compile(r"\(|\)|[^\s\(\)\[\]\'\:\;\,]+|\:\ ?[+-]?[0-9]*\.?[0-9]+(?:[eE][+-]?[0-9]+)?|\,|\[(?:\\.|[^\]])*\]|\'(?:\\.|[^\'])*\'|\;|\n")
+UNQUOTED = re.compile(r"[^\s\(\)\[\]\'\:\;\,]+")
+
+LENGTH = "%1.8g"
+SUPPORT = "%1.2f"
+
+FORMATS = ['newick', 'nexus']
+
+# Tree _____________________________________________________________________________________________
+class Tree:
+	"""A tree stored as arrays indexed by node, with nodes numbered in preorder (the root is 0 and every node comes after its parent), so a
+	forward pass over the arrays visits parents before children and a backward pass visits children before parents.
+	parent: index of the parent of every node (-1 for the root).
+	length: branch length of every node (nan if missing).
+	label: index of the name of every node in 'names' (-1 if it has no name). Names are interned, so repeated labels are stored once.
+	support: support value of every node (nan if missing).
+	comments: dictionary with the comment of the nodes that have one (e.g.; FigTree or BEAST annotations)."""
+
+	def __init__(self, parent, length=None, label=None, names=None, support=None, comments=None, rooted=False, name=None):
+		self.parent = np.asarray(parent, dtype=np.int32)
+		n = len(self.parent)
+		self.length = np.full(n, np.nan) if length is None else np.asarray(length, dtype=np.float64)
+		self.label = np.full(n, -1, dtype=np.int32) if label is None else np.asarray(label, dtype=np.int32)
+		self.names = list() if names is None else names
+		self.support = np.full(n, np.nan) if support is None else np.asarray(support, dtype=np.float64)
+		self.comments = {} if comments is None else comments
+		self.rooted = rooted
+		self.name = name
+		self._start = None
+		self._children = None
+		self._end = None
+
+	def __len__(self):
+		return len(self.parent)
+
+	def childIndex(self):
+		"""Children of every node in compressed sparse rows: the children of node i are children[start[i]:start[i+1]], in order."""
+		if self._start is None:
+			counts = np.bincount(self.parent[1:], minlength=len(self))
+			self._start = np.zeros(len(self) + 1, dtype=np.int64)
+			np.cumsum(counts, out=self._start[1:])
+			self._children = (np.argsort(self.parent[1:], kind="stable") + 1).astype(np.int32)
+		return self._start, self._children
+
+	def children(self, node):
+		start, children = self.childIndex()
+		return children[start[node]:start[node+1]]
+
+	def childCounts(self):
+		start, children = self.childIndex()
+		return np.diff(start)
+
+	def isTip(self):
+		return self.childCounts() == 0
+
+	def tips(self):
+		"""Indexes of the tips, in the order they appear in the tree."""
+		return np.flatnonzero(self.isTip())
+
+	def internals(self):
+		"""Indexes of the internal nodes in preorder (the order of Bio.Phylo 'get_nonterminals()')."""
+		return np.flatnonzero(~self.isTip())
+
+	def preorder(self):
+		return np.arange(len(self))
+
+	def postorder(self):
+		"""Nodes ordered with every node after all its descendants."""
+		return np.arange(len(self) - 1, -1, -1)
+
+	def subtreeEnd(self):
+		"""As nodes are in preorder, the clade of node i is made of nodes i to end[i]-1. Computed in one pass from the tips to the root."""
+		if self._end is None:
+			end = list(range(1, len(self) + 1))
+			parent = self.parent.tolist()
+			for i in range(len(self) - 1, 0, -1):
+				if end[i] > end[parent[i]]:
+					end[parent[i]] = end[i]
+			self._end = np.array(end, dtype=np.int64)
+		return self._end
+
+	def cladeCounts(self, codes, k):
+		"""Number of tips with every code (0 to k-1, negative codes are ignored) in the clade of every node, as a (nodes x k) matrix.
+		Clades are contiguous in preorder, so counts are differences of cumulative counts: O(nodes x k) instead of visiting the tips of every clade."""
+		codes = np.asarray(codes)
+		cumulative = np.zeros((len(self) + 1, k), dtype=np.int32)
+		valid = np.flatnonzero(codes >= 0)
+		cumulative[valid + 1, codes[valid]] = 1
+		np.cumsum(cumulative, axis=0, out=cumulative)
+		return cumulative[self.subtreeEnd()] - cumulative[:-1]
+
+	def tipCounts(self):
+		"""Number of tips in the clade of every node."""
+		cumulative = np.zeros(len(self) + 1, dtype=np.int64)
+		np.cumsum(self.isTip(), out=cumulative[1:])
+		return cumulative[self.subtreeEnd()] - cumulative[:-1]
+
+	def cladeSums(self, values):
+		"""Sum of the values (one per node, nan counted as 0) of all the nodes in the clade of every node, itself included."""
+		cumulative = np.zeros(len(self) + 1)
+		np.cumsum(np.nan_to_num(values), out=cumulative[1:])
+		return cumulative[self.subtreeEnd()] - cumulative[:-1]
+
+	def enclosingClades(self, k):
+		"""For every node, the smallest clade with at least k tips containing it (the root if there is none), in one pass from the root to the tips."""
+		counts = (self.tipCounts() >= k).tolist()
+		parent = self.parent.tolist()
+		enclosing = [0] * len(self)
+		for i in range(1, len(self)):
+			enclosing[i] = i if counts[i] else enclosing[parent[i]]
+		return np.array(enclosing, dtype=np.int64)
+
+	def depths(self):
+		"""Distance from the root to every node (missing branch lengths count as 0), in one pass from the root to the tips."""
+		lengths = np.nan_to_num(self.length).tolist()
+		parent = self.parent.tolist()
+		depth = [0.0] * len(self)
+		for i in range(1, len(self)):
+			depth[i] = depth[parent[i]] + lengths[i]
+		return np.array(depth)
+
+	def heights(self):
+		"""Distance from every node to its farthest tip (its age in a time calibrated tree), from the depths of the tips in one pass from the tips to the root.
+		Also returns the difference between the farthest and the closest tip of every node, which is 0 in ultrametric trees."""
+		depth = self.depths()
+		isTip = self.isTip().tolist()
+		parent = self.parent.tolist()
+		farthest = [d if tip else -np.inf for d, tip in zip(depth.tolist(), isTip)]
+		closest = [d if tip else np.inf for d, tip in zip(depth.tolist(), isTip)]
+		for i in range(len(self) - 1, 0, -1):
+			p = parent[i]
+			if farthest[i] > farthest[p]:
+				farthest[p] = farthest[i]
+			if closest[i] < closest[p]:
+				closest[p] = closest[i]
+		farthest = np.array(farthest)
+		return farthest - depth, farthest - np.array(closest)
+
+	def cladeTips(self, nodes):
+		"""Boolean array marking the tips within the clade of any of the given nodes, in one pass whatever the number of nodes."""
+		nodes = np.asarray(nodes, dtype=np.int64)
+		cover = np.zeros(len(self) + 1, dtype=np.int64)
+		np.add.at(cover, nodes, 1)
+		np.add.at(cover, self.subtreeEnd()[nodes], -1)
+		return (np.cumsum(cover[:-1]) > 0) & self.isTip()
+
+	def cladeHashes(self):
+		"""Hash of the tips of the clade of every node (the XOR of the identifiers of their names), so the same clade has the same hash in any tree.
+		Clades are contiguous in preorder, so hashes are differences (XOR) of cumulative XORs: O(nodes) for all clades."""
+		ids = np.zeros(len(self) + 1, dtype=np.uint64)
+		ids[self.tips() + 1] = [tipId(name) for name in self.tipNames()]
+		cumulative = np.bitwise_xor.accumulate(ids)
+		return cumulative[self.subtreeEnd()] ^ cumulative[:-1]
+
+	def nodeName(self, node):
+		return None if self.label[node] < 0 else self.names[self.label[node]]
+
+	def tipNames(self):
+		return [self.nodeName(i) for i in self.tips()]
+
+	def firstChild(self):
+		"""First child (-1 for tips) and next sibling (-1 for last children) of every node."""
+		start, children = self.childIndex()
+		counts = np.diff(start)
+		first = np.full(len(self), -1, dtype=np.int32)
+		first[counts > 0] = children[start[:-1][counts > 0]]
+		sibling = np.full(len(self), -1, dtype=np.int32)
+		last = np.zeros(len(children), dtype=bool)
+		last[start[1:][counts > 0] - 1] = True
+		sibling[children[~last]] = children[np.flatnonzero(~last) + 1]
+		return first, sibling
+
+	def tipMask(self, names):
+		"""Boolean array marking the tips whose name is in 'names' (better a set)."""
+		mask = np.zeros(len(self), dtype=bool)
+		tips = self.tips()
+		mask[tips] = [name in names for name in self.tipNames()]
+		return mask
+
+	def prune(self, remove):
+		"""Returns a new tree without the tips marked in 'remove' (boolean array over the nodes), as Bio.Phylo 'prune()' would leave it after removing them one by one:
+		clades left without tips are removed, and nodes left with one child (the root included) are replaced by it, adding their branch length to it.
+		Done in one pass from the tips to the root counting the remaining children, and one pass back to renumber the nodes."""
+		n = len(self)
+		parent = self.parent.tolist()
+		counts = self.childCounts().tolist()
+		remove = np.asarray(remove).tolist()
+		remaining = [0] * n
+		alive = [False] * n
+		for i in range(n - 1, -1, -1):
+			alive[i] = not remove[i] if counts[i] == 0 else remaining[i] > 0
+			if alive[i] and i > 0:
+				remaining[parent[i]] += 1
+		lengths = self.length.tolist()
+		# Every node kept is linked to the closest ancestor kept, carrying the branch lengths of the collapsed nodes in between
+		new = [-1] * n
+		up = [-1] * n
+		carry = [0.0] * n
+		keep = list()
+		newParent = list()
+		newLength = list()
+		for i in range(n):
+			if not alive[i]:
+				continue
+			p = parent[i]
+			above = -1 if p < 0 else new[p] if new[p] >= 0 else up[p]
+			extra = 0.0 if p < 0 or new[p] >= 0 else carry[p]
+			if counts[i] > 1 and remaining[i] == 1:
+				up[i] = above
+				carry[i] = extra + (0.0 if lengths[i] != lengths[i] else lengths[i])
+				continue
+			new[i] = len(keep)
+			keep.append(i)
+			newParent.append(above)
+			newLength.append(lengths[i] + extra)
+		keep = np.array(keep, dtype=np.int64)
+		comments = {new[i]: comment for i, comment in self.comments.items() if new[i] >= 0}
+		return Tree(newParent, newLength, self.label[keep], self.names, self.support[keep], comments, self.rooted, self.name)
+
+TIPIDS = {}
+
+def tipId(name):
+	"""64 bits identifier of a tip name from its hash, so it is the same in every tree and process."""
+	i = TIPIDS.get(name)
+	if i is None:
+		i = int.from_bytes(hashlib.blake2b(str(name).encode(), digest_size=8).digest(), "little")
+		TIPIDS[name] = i
+	return i
+
+def intern(names, index, name):
+	if name is None:
+		return -1
+	i = index.get(name)
+	if i is None:
+		i = len(names)
+		index[name] = i
+		names.append(name)
+	return i
+
+def parseSupport(text):
+	try:
+		return float(text)
+	except ValueError:
+		return None
+
+# Reading __________________________________________________________________________________________
+def parseNewick(text, rooted=False, name=None):
+	"""Parses one tree in newick format. Numeric labels of internal nodes are read as support values, as in Bio.Phylo."""
+	parent = [-1]
+	length = [np.nan]
+	labels = [None]
+	comments = {}
+	current = 0
+	opened = 0
+	closed = 0
+	for match in TOKENS.finditer(text.strip()):
+		token = match.group()
+		c = token[0]
+		if c == "(":
+			parent.append(current)
+			length.append(np.nan)
+			labels.append(None)
+			current = len(parent) - 1
+			opened += 1
+		elif c == ",":
+			if parent[current] == -1:
+				raise ValueError("Missing parenthesis around the tree")
+			parent.append(parent[current])
+			length.append(np.nan)
+			labels.append(None)
+			current = len(parent) - 1
+		elif c == ")":
+			current = parent[current]
+			if current == -1:
+				raise ValueError("Parenthesis mismatch")
+			closed += 1
+		elif c == ":":
+			length[current] = float(token[1:])
+		elif c == "[":
+			comments[current] = token[1:-1]
+		elif c == "'":
+			labels[current] = token[1:-1] if labels[current] is None else labels[current] + token[:-1]
+		elif c == ";":
+			break
+		elif c != "\n":
+			labels[current] = token
+	if opened != closed:
+		raise ValueError("Mismatch, " + str(opened) + " open vs " + str(closed) + " close parentheses")
+	tree = Tree(parent, length, rooted=rooted, name=name)
+	isTip = tree.isTip()
+	names = list()
+	index = {}
+	label = np.full(len(parent), -1, dtype=np.int32)
+	support = np.full(len(parent), np.nan)
+	for i, l in enumerate(labels):
+		if l is None or l == "":
+			continue
+		if not isTip[i]:
+			s = parseSupport(l)
+			if s is not None:
+				support[i] = s
+				continue
+		label[i] = intern(names, index, l)
+	tree.label = label
+	tree.names = names
+	tree.support = support
+	tree.comments = comments
+	return tree
+
+def splitTrees(handle):
+	"""Yields the text of every tree (up to the ';') of a newick file."""
+	buffer = ""
+	for line in handle:
+		buffer += line
+		while ";" in buffer:
+			text, buffer = buffer.split(";", 1)
+			if text.strip():
+				yield text + ";"
+	if buffer.strip():
+		yield buffer
+
+def readNexus(handle):
+	"""Yields the name, text and rooting of every tree of the trees block of a nexus file, with the tip names translated if there is a translate table."""
+	inTrees = False
+	translate = None
+	statement = ""
+	for line in handle:
+		if not inTrees:
+			if line.strip().lower().startswith("begin trees"):
+				inTrees = True
+			continue
+		statement += line
+		if not statement.rstrip().endswith(";"):
+			continue
+		text = statement.strip()
+		statement = ""
+		low = text.lower()
+		if low.startswith("end"):
+			inTrees = False
+		elif low.startswith("translate"):
+			translate = {}
+			for pair in text[len("translate"):].rstrip(";").split(","):
+				pair = pair.strip().split(None, 1)
+				if len(pair) == 2:
+					translate[pair[0]] = pair[1].strip("'\"")
+		elif low.startswith("tree"):
+			# The name can be followed by comments with '=' (e.g.; BEAST '[&lnP=...]')
+			head = re.match("tree\\s*([^\\s=\\[]*)\\s*(?:\\[[^\\]]*\\]\\s*)*=", text, re.IGNORECASE)
+			if head is None:
+				raise ValueError("Syntax error in tree description: " + text[:50])
+			name = head.group(1) or None
+			newick = text[head.end():].strip()
+			rooted = False
+			while newick.startswith("["):
+				if newick[:4].upper() == "[&R]":
+					rooted = True
+				newick = newick[newick.index("]")+1:].strip()
+			yield name, newick, rooted, translate
+
+def readTrees(fileIn, formaTree="newick"):
+	"""Yields every tree of a newick or nexus file, one at a time. Other formats are read with Bio.Phylo and converted."""
+	if formaTree not in FORMATS:
+		from Bio import Phylo
+		for T in Phylo.parse(fileIn, formaTree):
+			yield fromPhylo(T)
+		return
+	with open(fileIn) as handle:
+		if formaTree == "newick":
+			for text in splitTrees(handle):
+				yield parseNewick(text)
+		else:
+			for name, text, rooted, translate in readNexus(handle):
+				tree = parseNewick(text, rooted, name)
+				if translate:
+					tree.names = [translate.get(n, n) for n in tree.names]
+				yield tree
+
+def readTree(fileIn, formaTree="newick"):
+	"""Reads the first tree of a newick or nexus file."""
+	for tree in readTrees(fileIn, formaTree):
+		return tree
+	raise ValueError("no tree found in '" + fileIn + "'")
+
+# Writing __________________________________________________________________________________________
+def quote(name):
+	match = UNQUOTED.match(name)
+	if match is None or match.end() < len(name):
+		return "'" + name.replace("'", "''") + "'"
+	return name
+
+def toNewick(tree, formatLength=LENGTH, formatSupport=SUPPORT):
+	"""Returns a tree as a newick string, formatted as recent Bio.Phylo versions write it: branch lengths as '%1.8g' (e.g.; '0.1' and a root of ':0',
+	where older versions wrote '0.10000' and ':0.00000') and supports as '%1.2f'."""
+	start, children = tree.childIndex()
+	labels = [None if l < 0 else quote(tree.names[l]) for l in tree.label.tolist()]
+	lengths = np.nan_to_num(tree.length, nan=0.0).tolist()
+	support = tree.support.tolist()
+	out = list()
+	def info(node):
+		text = labels[node] or ""
+		if start[node+1] > start[node] and support[node] == support[node]:
+			text += formatSupport % support[node]
+		text += ":" + formatLength % lengths[node]
+		if tree.comments.get(node):
+			text += "[" + tree.comments[node].replace("[", "\\[").replace("]", "\\]") + "]"
+		return text
+	# Iterative depth first walk: a node is visited when entering, and again (as -node-1) to close its parenthesis
+	stack = [0]
+	while stack:
+		node = stack.pop()
+		if node is None:
+			out.append(",")
+		elif node < 0:
+			out.append(")" + info(-node-1))
+		elif start[node+1] > start[node]:
+			out.append("(")
+			stack.append(-node-1)
+			kids = children[start[node]:start[node+1]].tolist()
+			for k, child in enumerate(reversed(kids)):
+				if k > 0:
+					stack.append(None)
+				stack.append(child)
+		else:
+			out.append(info(node))
+	return "".join(out) + ";"
+
+def writeTrees(trees, fileOut, formaTree="newick"):
+	"""Writes one or several trees to a newick or nexus file. Other formats are converted and written with Bio.Phylo. Returns the number of trees written."""
+	if isinstance(trees, Tree):
+		trees = [trees]
+	if formaTree not in FORMATS:
+		from Bio import Phylo
+		return Phylo.write([toPhylo(tree) for tree in trees], fileOut, formaTree)
+	count = 0
+	with open(fileOut, "w") as outfile:
+		if formaTree == "newick":
+			for tree in trees:
+				outfile.write(toNewick(tree) + "\n")
+				count += 1
+		else:
+			trees = list(trees)
+			labels = [str(name) for tree in trees for name in tree.tipNames()]
+			lines = list()
+			for tree in trees:
+				count += 1
+				lines.append("Tree tree" + str(count) + "=" + toNewick(tree))
+			outfile.write("#NEXUS\nBegin Taxa;\n Dimensions NTax=" + str(len(labels)) + ";\n TaxLabels " + " ".join(labels) + ";\nEnd;\nBegin Trees;\n " + "\n".join(lines) + "\nEnd;\n")
+	return count
+
+# Bio.Phylo conversion _____________________________________________________________________________
+def fromPhylo(T):
+	"""Converts a Bio.Phylo tree into a Tree."""
+	parent = list()
+	length = list()
+	label = list()
+	support = list()
+	comments = {}
+	names = list()
+	index = {}
+	stack = [(T.root, -1)]
+	while stack:
+		clade, p = stack.pop()
+		i = len(parent)
+		parent.append(p)
+		length.append(np.nan if clade.branch_length is None else clade.branch_length)
+		label.append(intern(names, index, clade.name or None))
+		support.append(np.nan if getattr(clade, "confidence", None) is None else clade.confidence)
+		if getattr(clade, "comment", None):
+			comments[i] = clade.comment
+		for child in reversed(clade.clades):
+			stack.append((child, i))
+	return Tree(parent, length, label, names, support, comments, T.rooted, T.name)
+
+def toPhylo(tree):
+	"""Converts a Tree into a Bio.Phylo tree, so scripts can be migrated step by step."""
+	from Bio.Phylo import Newick
+	clades = list()
+	lengths = tree.length.tolist()
+	labels = tree.label.tolist()
+	support = tree.support.tolist()
+	for i, p in enumerate(tree.parent.tolist()):
+		clade = Newick.Clade(branch_length=None if lengths[i] != lengths[i] else lengths[i],
+							name=None if labels[i] < 0 else tree.names[labels[i]],
+							confidence=None if support[i] != support[i] else support[i],
+							comment=tree.comments.get(i))
+		clades.append(clade)
+		if p >= 0:
+			clades[p].clades.append(clade)
+	return Newick.Tree(root=clades[0], rooted=tree.rooted, name=tree.name)
+
+# Command line _____________________________________________________________________________________
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Reads trees with a fast array based parser and counts their tips and nodes, or converts them between newick and nexus formats.")
+
+	requiredArgs = parser.add_argument_group('required arguments')
+
+	requiredArgs.add_argument("-t", "--tree", dest="tree", required=True,
+						help="A tree file, with one or several trees.")
+
+	parser.add_argument("-f", "--format", dest="formaTree", required=False, default='newick', choices=FORMATS,
+						help="The tree file format: newick (default) or nexus.")
+
+	parser.add_argument("-o", "--output", dest="output", required=False, default=None,
+						help="If selected, the trees are written to this file in the format given by '-F/--formatOut'.")
+
+	parser.add_argument("-F", "--formatOut", dest="formatOut", required=False, default=None, choices=FORMATS,
+						help="The output tree file format. By default the input format.")
+
+	args = parser.parse_args()
+
+	if args.output is not None:
+		count = writeTrees(readTrees(args.tree, args.formaTree), args.output, args.formatOut or args.formaTree)
+		print("  ", count, " tree(s) written to ", args.output, sep="")
+	else:
+		print("tree\ttips\tnodes")
+		for i, tree in enumerate(readTrees(args.tree, args.formaTree)):
+			print(tree.name or i+1, int(tree.isTip().sum()), len(tree), sep="\t")
@@ -1,8 +1,9 @@
 #!/usr/bin/env python3
 
 import argparse
-from Bio import Phylo
+import numpy as np
 import re
+from treeArray import readTree, writeTrees
 
 parser = argparse.ArgumentParser(description="Given an attribute list of the tree tips, will search for conflicting nodes and print a list of potential intruders. Useful for very large trees (>10000 tips). USE WITH CAUTION!!")
 
@@ -55,7 +56,9 @@ if args.prune:
 # Reading files ------------------------------------------------------------------------------------
 if args.verbose:
 	print("  Reading files")
-T = Phylo.read(args.tree, args.formaTree)
+T = readTree(args.tree, args.formaTree)
+tips = T.tips()
+tipNames = T.tipNames()
 
 if args.attribute == 'supergroup' or args.attribute == 'supergroups':
 	attribute={"Amoebozoa":     "Amoebozoa",
@@ -112,112 +115,83 @@ if args.verbose:
 	else:
 		print("    Tips without attributes will be taken into a count")
 attrCount = {}
-for tip in T.get_terminals():
+tipAttr = list()
+for name in tipNames:
 	comment = None
-	if tip.name in attribute.keys():
-		comment = attribute[tip.name]
+	if name in attribute.keys():
+		comment = attribute[name]
 	else:
 		for pattern, attr in attribute.items():
-			if pattern in tip.name:
+			if pattern in name:
 				comment = attr
-	if args.none and comment is not None:
+	if not args.none and comment is None:
+		comment = "None"
+	if comment is not None:
 		if comment not in attrCount.keys():
 			attrCount[comment] = 1
 		elif comment in attrCount.keys():
 			attrCount[comment] += 1
-		tip.comment = comment
-	elif not args.none:
-		if comment is None:
-			comment = "None"
-		if comment not in attrCount.keys():
-			attrCount[comment] = 1
-		elif comment in attrCount.keys():
-			attrCount[comment] += 1
-		tip.comment = comment
+	tipAttr.append(comment)
+
+# Attributes are coded as integers (-1 for tips without attribute)
+attrs = list(attrCount.keys())
+attrCode = {attr: i for i, attr in enumerate(attrs)}
+codes = np.full(len(T), -1)
+codes[tips] = [attrCode.get(attr, -1) for attr in tipAttr]
+tipsOf = [np.flatnonzero(codes == c) for c in range(len(attrs))]
 
 # Assigning internal nodes -------------------------------------------------------------------------
 if args.verbose:
 	print("  Assigning internal nodes")
-for clade in T.get_nonterminals():
-	unique = set()
-	for tip in clade.get_terminals():
-		comment = tip.comment
-		unique.add(comment)
-	if len(unique) == 1:
-		clade.comment = next(iter(unique))
-	if args.none:
-		if len(unique) == 2 and None in unique:
-			unique.remove(None)
-			clade.comment = next(iter(unique))
+# Attribute counts of every clade, from one pass from the tips to the root
+end = T.subtreeEnd()
+counts = T.cladeCounts(codes, len(attrs))
+present = (counts > 0).sum(axis=1)
+uniform = np.where(present == 1, counts.argmax(axis=1), -1)
+
+def markTips(marks, candidates):
+	"""Tips among the candidates (sorted node indexes) found within the clade of any of the marked nodes."""
+	cover = np.zeros(len(candidates) + 1, dtype=np.int64)
+	for node in marks:
+		cover[np.searchsorted(candidates, node)] += 1
+		cover[np.searchsorted(candidates, end[node])] -= 1
+	return candidates[np.cumsum(cover[:-1]) > 0]
 
 # Identifying intruders ----------------------------------------------------------------------------
 if args.verbose:
-	print("  Identifying intruders", end="")
-	nnodes = len(T.get_nonterminals())
-	i = 0
-	pl = 0
-intruders = set()
-prev = None
-for clade in T.get_nonterminals():
-	if args.verbose:
-		i += 1
-		p = round(i/nnodes*100)
-		if p > pl:
-			pl = p
-			print("\r  Identifying intruders ", p, "%",sep="", end="")
-	if clade.comment is None:
-		attrCountClade = {}
-		for tip in clade.get_terminals():
-			comment = tip.comment
-			if args.none and comment is not None:
-				if comment not in attrCountClade.keys():
-					attrCountClade[comment] = 1
-				elif comment in attrCountClade.keys():
-					attrCountClade[comment] += 1
-			elif not args.none:
-				if comment is None:
-					comment = "None"
-				if comment not in attrCountClade.keys():
-					attrCountClade[comment] = 1
-				elif comment in attrCountClade.keys():
-					attrCountClade[comment] += 1
-		for attr, count in attrCountClade.items():
-			if attr != prev:
-				test = count / attrCount[attr] * 100
+	print("  Identifying intruders")
+marks = [list() for c in attrs]
+prev = -1
+totals = [attrCount[attr] for attr in attrs]
+for clade in T.internals().tolist():
+	if uniform[clade] == -1:
+		row = counts[clade].tolist()
+		found = [c for c, count in enumerate(row) if count > 0]
+		for c in found:
+			if c != prev:
+				test = row[c] / totals[c] * 100
 				if test < args.minimum:
-					for tip in clade.get_terminals():
-						if tip.comment == attr:
-							intruders.add(tip.name)
-		if len(attrCountClade) > 0:
-			prev = max(attrCountClade, key=attrCountClade.get)
+					marks[c].append(clade)
+		if len(found) > 0:
+			# Most frequent attribute, and in case of ties the first one found in the clade
+			top = max(row)
+			tied = [c for c in found if row[c] == top]
+			prev = min(tied, key=lambda c: tipsOf[c][np.searchsorted(tipsOf[c], clade)])
+intruders = set()
+for c in range(len(attrs)):
+	if len(marks[c]) > 0:
+		intruders.update(T.nodeName(i) for i in markTips(marks[c], tipsOf[c]))
 
 # Check if there are monophyletic clades with only intruders and tips with no attribute
 if args.verbose:
-	print("\n  Identifying intruders without an attribute", end="")
-	i = 0
-	pl = 0
-intrudersNone = set()
-for clade in T.get_nonterminals():
-	if args.verbose:
-		i += 1
-		p = round(i/nnodes*100)
-		if p > pl:
-			pl = p
-			print("\r  Identifying intruders without an attribute ", p, "%",sep="", end="")
-	tmpIntr = 0
-	tmpNone = 0
-	tmp = set()
-	unique = set()
-	for tip in clade.get_terminals():
-		if tip.name in intruders:
-			tmpIntr += 1
-		if tip.comment is None:
-			tmpNone += 1
-	if (tmpIntr + tmpNone) == clade.count_terminals() and tmpIntr != 0:
-		for tip in clade.get_terminals():
-			if tip.comment is None:
-				intrudersNone.add(tip.name)
-print("")
+	print("  Identifying intruders without an attribute")
+# 0: intruder, 1: no attribute, 2: any other tip
+status = np.full(len(T), -1)
+status[tips] = [0 if name in intruders else 1 if attr is None else 2 for name, attr in zip(tipNames, tipAttr)]
+statusCounts = T.cladeCounts(status, 3)
+internals = T.internals()
+closed = internals[(statusCounts[internals, 0] + statusCounts[internals, 1] == statusCounts[internals].sum(axis=1)) & (statusCounts[internals, 0] != 0)]
+intrudersNone = set(T.nodeName(i) for i in markTips(closed.tolist(), np.flatnonzero(status == 1)))
 
 if len(intrudersNone) > 0:
 	for i in intrudersNone:
@@ -235,7 +209,7 @@ if args.exclude is not None:
 
 # Exporting list of intruders ----------------------------------------------------------------------
 if args.verbose:
-	tips = T.count_terminals()
+	tips = len(tipNames)
 	tipsi = len(intruders)
 	print("  From the total", tips, "tips and the given attributes:")
 	print("    ", tipsi, " (", round(tipsi / tips * 100, 2), "%) tips were identified as intruders", sep="")
@@ -257,33 +231,19 @@ if args.colour:
 	import subprocess
 	treeMarked = re.sub("\\.[^\\.]+$", ".tre", out)
 	if args.verbose:
-		print("    Colouring terminal nodes")
-	for clade in T.get_terminals():
-		clade.comment = None
-		if clade.name in intruders:
-			clade.comment = str("[&!color=#FFB000]") # Orange -> intruder
-		else:
-			clade.comment = str("[&!color=#648FFF]") # Blue -> good
-	if args.verbose:
-		print("    Colouring internal nodes, this might take a while...", end="")
-		i = 0
-		pl = 0
-	for clade in T.get_nonterminals():
-		if args.verbose:
-			i += 1
-			p = round(i/nnodes*100)
-			if p > pl:
-				pl = p
-				print("\r    Colouring internal nodes, this might take a while... ", p, "%",sep="", end="")
-		clade.comment = None
-		unique = set()
-		for tip in clade.get_terminals():
-			unique.add(tip.comment)
-		if len(unique) == 1:
-			clade.comment = next(iter(unique))
+		print("    Colouring terminal and internal nodes")
+	# 0: intruder, 1: good
+	marked = np.full(len(T), -1)
+	marked[T.tips()] = [0 if name in intruders else 1 for name in tipNames]
+	markedCounts = T.cladeCounts(marked, 2)
+	T.comments = {}
+	for clade in np.flatnonzero(markedCounts[:, 1] == 0).tolist():
+		T.comments[clade] = str("[&!color=#FFB000]") # Orange -> intruder
+	for clade in np.flatnonzero(markedCounts[:, 0] == 0).tolist():
+		T.comments[clade] = str("[&!color=#648FFF]") # Blue -> good
 	if args.verbose:
-		print("\n    Writing coloured tree to", treeMarked)
-	Phylo.write(T, treeMarked, "nexus")
+		print("    Writing coloured tree to", treeMarked)
+	writeTrees(T, treeMarked, "nexus")
 	subprocess.call(["sed", "-i", "-e",  's/\\\]//g', treeMarked])
 	subprocess.call(["sed", "-i", "-e",  's/\\[\\\//g', treeMarked])
 
@@ -291,24 +251,12 @@ if args.colour:
 if args.prune:
 	if args.verbose:
 		print("  Pruning")
-		i = 0
-		pl = 0
-	for tip in intruders:
-		if args.verbose:
-			i += 1
-			p = round(i/len(intruders)*100)
-			if p > pl:
-				pl = p
-				print("\r  Pruning ", p, "%",sep="", end="")
-		T.prune(tip)
+	T = T.prune(T.tipMask(intruders))
 	if args.verbose:
-		print("\n    Writing pruned tree to", pruned)
+		print("    Writing pruned tree to", pruned)
 		print("\n      Please, use this tree with caution!!")
-	for clade in T.get_terminals():
-		clade.comment = None
-	for clade in T.get_nonterminals():
-		clade.comment = None
-	Phylo.write(T, pruned, "newick")
+	T.comments = {}
+	writeTrees(T, pruned, "newick")
 
 if args.verbose:
 	print("Done")
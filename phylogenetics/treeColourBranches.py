@@ -1,9 +1,10 @@
 #!/usr/bin/env python3
 
 import argparse
-from Bio import Phylo
+import numpy as np
 import re
 import subprocess
+from treeArray import readTree, writeTrees
 
 parser = argparse.ArgumentParser(description="Colours a tree based on a table with colours and exports a coloured nexus tree file.")
 
@@ -46,7 +47,8 @@ else:
 if args.verbose:
 	print("  Reading files")
 
-T = Phylo.read(args.tree, args.formaTree)
+T = readTree(args.tree, args.formaTree)
+tips = T.tips()
 
 if args.colours == 'eukProt' or args.colours == 'EukProt' or args.colours == 'eukprot':
 	colours={"Amoebozoa":       "#9ecae1",
@@ -95,20 +97,20 @@ if args.verbose and not args.internal:
 
 c = 0
 C = 0
-for tip in T.get_terminals():
+for tip, name in zip(tips.tolist(), T.tipNames()):
 	coloured = False
-	if tip.name in colours.keys():
-		colour = colours[tip.name]
+	if name in colours.keys():
+		colour = colours[name]
 		if "#" not in colour:
 			colour = "#" + colour
-		tip.comment = str("[&!color=" + colour + "]")
+		T.comments[tip] = str("[&!color=" + colour + "]")
 		coloured = True
 	else:
 		for pattern, colour in colours.items():
-			if pattern in tip.name:
+			if pattern in name:
 				if "#" not in colour:
 					colour = "#" + colour
-				tip.comment = str("[&!color=" + colour + "]")
+				T.comments[tip] = str("[&!color=" + colour + "]")
 				coloured = True
 	if coloured:
 		c += 1
@@ -120,36 +122,29 @@ if args.internal:
 	i = 0
 	I = 0
 	if args.verbose:
-		print("  Colouring internal nodes, this might take a while...", end="")
-		pi = 0
-		pl = 0
-		nnodes=len(T.get_nonterminals())
-	for clade in T.get_nonterminals():
-		if args.verbose:
-			pi += 1
-			p = round(pi/nnodes*100)
-			if p > pl:
-				pl = p
-				print("\r  Colouring internal nodes, this might take a while... ", p, "%",sep="", end="")
+		print("  Colouring internal nodes")
+	# Tip comments (None included) are coded as integers and counted in every clade in one pass from the tips to the root
+	tipComments = [T.comments.get(tip) for tip in tips.tolist()]
+	unique = list(dict.fromkeys(tipComments))
+	code = {comment: k for k, comment in enumerate(unique)}
+	codes = np.full(len(T), -1)
+	codes[tips] = [code[comment] for comment in tipComments]
+	counts = T.cladeCounts(codes, len(unique))
+	for clade in T.internals().tolist():
 		coloured = False
-		unique = set()
-		for tip in clade.get_terminals():
-			comment = tip.comment
-			unique.add(comment)
-		if len(unique) == 1:
-			clade.comment = next(iter(unique))
+		found = [unique[k] for k in np.flatnonzero(counts[clade]).tolist()]
+		if len(found) == 1:
+			T.comments[clade] = found[0]
 			coloured = True
 		if args.none:
-			if len(unique) == 2 and None in unique:
-				unique.remove(None)
-				clade.comment = next(iter(unique))
+			if len(found) == 2 and None in found:
+				found.remove(None)
+				T.comments[clade] = found[0]
 				coloured = True
 		if coloured:
 			i += 1
 		else:
 			I += 1
-	if args.verbose:
-		print("")
 
 # Collapsing internal nodes ------------------------------------------------------------------------
 if args.collapse:
@@ -157,24 +152,24 @@ if args.collapse:
 		print("  Collapsing nodes")
 		if not args.internal:
 			print("    Internal branches have not been coloured, this might affect the collapse")
-	branchLength = list()
-	for tip in T.get_terminals():
-		branchLength.append(tip.branch_length)
-	import statistics
-	branchLength = str(round(statistics.mean(branchLength), 2))
+	branchLength = str(round(float(np.mean(T.length[tips])), 2))
 	collapsed = str(',!collapse={"collapsed",' + branchLength + "}]")
 	collapsedCount = 0
 	lastComment = None
-	for clade in T.get_nonterminals():
-		comment = clade.comment
+	# The comments (other than None) found in the path from the root (excluded) to every internal node, visited in preorder:
+	# None if there is none, the comment if they are all the same, and False if they differ
+	parent = T.parent.tolist()
+	path = {0: None}
+	for clade in T.internals().tolist()[1:]:
+		above = path[parent[clade]]
+		comment = T.comments.get(clade)
 		if comment is not None and comment != lastComment:
-			uniques = set()
-			for subclade in T.get_path(clade):
-				uniques.add(subclade.comment)
-			if len(uniques) == 1 and next(iter(uniques)) == None or len(uniques) == 1 and next(iter(uniques)) == comment or len(uniques) == 2 and None in uniques:
-				clade.comment = re.sub("\]", collapsed, clade.comment)
+			if above is None or above == comment:
+				T.comments[clade] = re.sub("\]", collapsed, comment)
 				lastComment = comment
 				collapsedCount += 1
+		comment = T.comments.get(clade)
+		path[clade] = above if comment is None or above == comment else comment if above is None else False
 	if args.verbose:
 		print("    In total", str(collapsedCount), "branches were collapsed")
 
@@ -188,7 +183,7 @@ if args.verbose:
 	else:
 		print("    0 branches were coloured, please check table for possible typos.")
 	print("  Writting file to:", out)
-Phylo.write(T, out, "nexus")
+writeTrees(T, out, "nexus")
 subprocess.call(["sed", "-i", "-e",  's/\\\]//g', out])
 subprocess.call(["sed", "-i", "-e",  's/\\[\\\//g', out])
 
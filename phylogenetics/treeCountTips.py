@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 
 import argparse
-from Bio import Phylo
+from treeArray import readTree
 
 parser = argparse.ArgumentParser(description="Given a tree or a list of tree names in newick format, counts the number of tips and prints to the console.")
 
@@ -15,5 +15,5 @@ args = parser.parse_args()
 
 
 for tree in args.tree:
-	T = Phylo.read(tree, "newick")
-	print(T.count_terminals(), "\t", tree)
+	T = readTree(tree, "newick")
+	print(int(T.isTip().sum()), "\t", tree)
@@ -1,38 +1,50 @@
 #!/usr/bin/env python3
 
 import argparse
-from Bio import Phylo
+import itertools
+import numpy as np
 import re
+import struct
+import sys
+from treeArray import readTree, readTrees, parseNewick, splitTrees, readNexus, FORMATS
 
-parser = argparse.ArgumentParser(description="From an ultrametric tree, extracts all node lengths (from node to the first tip of the given node) to a table.")
+BATCH = 1000
+PLACEHOLDER = 128
+
+parser = argparse.ArgumentParser(description="From an ultrametric tree, extracts all node lengths (from node to the farthest tip of the given node, the same for all tips in an ultrametric tree) to a table.")
 
 # Add the arguments to the parser
 requiredArgs = parser.add_argument_group('required arguments')
 
 requiredArgs.add_argument("-t", "--tree", dest="tree", required=True,
-						  help="A tree file containing one or several trees. If several, all trees should have the same bifurcation patterns.")
+						  help="A tree file containing one or several trees. If several, the nodes are matched to those of the first tree by their clade (the set of tips they contain), so trees can have different bifurcation patterns (e.g.; a posterior sample).")
 
 parser.add_argument("-f", "--format", dest="formaTree", required=False, default='newick',
 					help="The annotated tree file format: accepted formats are: newick (default), nexus, nexml, phyloxml or cdao.")
 
-parser.add_argument("-o", "--output", dest="output", required=False, default=None, nargs="+",
-					help="The output table name, with columns for the nodes and rows for the different heights(if more than one tree). By default will take the name of the input tree file name followed by '_nodeHeights.tsv'.")
+parser.add_argument("-o", "--output", dest="output", required=False, default=None,
+					help="The output table name, with columns for the nodes and rows for the different heights(if more than one tree). By default will take the name of the input tree file name followed by '_nodeHeights.tsv' (or '.npy' if '-b/--binary'). Columns are named by a hash of their clade, and the clades of every column are described in a table with the same name ending in '_clades.tsv'.")
 
 parser.add_argument("-n", "--nodes", dest="nodes", required=False, default='all',
-					help="The number of the nodes to be extracted, given in a string separated by commas or hyphens for ranges (e.g.; '2,4,6-10' = 2 4 6 7 8 9 10). Default='all")
+					help="The number of the nodes (in the first tree) to be extracted, given in a string separated by commas or hyphens for ranges (e.g.; '2,4,6-10' = 2 4 6 7 8 9 10). Default='all")
+
+parser.add_argument("-b", "--binary", dest="binary", required=False, action="store_true",
+					help="If selected, the table is exported as a numpy binary file (.npy, trees x nodes, with nan for nodes not found in a tree), which can be read with 'numpy.load(file, mmap_mode=\"r\")'. Much smaller and faster for large tables.")
+
+parser.add_argument("-T", "--threads", dest="threads", required=False, type=int, default=1,
+					help="The number of processes used to read the trees. Default=%(default)s.")
 
 parser.add_argument("-v", "--verbose", dest="verbose", required=False, action="store_false",
 					help="If selected, will not print information to the console.")
 
-methodsHelp = parser.add_argument_group('Methods')
-
 args = parser.parse_args()
 
 # Setting options ----------------------------------------------------------------------------------
 if args.output is None:
-	outFile = re.sub("\\.[^\\.]+$", "_nodeHeights.tsv", args.tree)
+	outFile = re.sub("\\.[^\\.]+$", "_nodeHeights.npy" if args.binary else "_nodeHeights.tsv", args.tree)
 else:
 	outFile = args.output
+cladesFile = re.sub("\\.[^\\.]+$", "", outFile) + "_clades.tsv"
 
 if args.nodes == 'all':
 	allNodes = True
@@ -49,54 +61,119 @@ else:
 		else:
 			nodes.append(int(n))
 
+def nodeHeights(tree, columns, translate=None):
+	"""Heights of the clades of the columns (a dictionary of clade hash to column) in one tree, given as a tree or as newick text. Clades not found are nan."""
+	if isinstance(tree, str):
+		tree = parseNewick(tree)
+		if translate:
+			tree.names = [translate.get(n, n) for n in tree.names]
+	internals = tree.internals()
+	hashes = tree.cladeHashes()[internals].tolist()
+	ages = tree.heights()[0][internals]
+	found = [(columns[h], k) for k, h in enumerate(hashes) if h in columns]
+	row = np.full(len(columns), np.nan)
+	if len(found) > 0:
+		cols, ks = zip(*found)
+		row[list(cols)] = ages[list(ks)]
+	return row
+
+def npyHeader(rows, cols):
+	"""Header of a numpy binary file of (rows x cols) float64, padded to a fixed size so it can be written again once the number of rows is known."""
+	header = str({'descr': '<f8', 'fortran_order': False, 'shape': (rows, cols)})
+	header = header.ljust(PLACEHOLDER - 11) + "\n"
+	return b"\x93NUMPY\x01\x00" + struct.pack("<H", len(header)) + header.encode("latin1")
+
 # Reading files ------------------------------------------------------------------------------------
-if args.verbose:
-	print("  Reading input tree: ", args.tree)
-trees = Phylo.parse(args.tree, args.formaTree)
-
-with open(args.tree, 'r') as tc:
-    for count, line in enumerate(tc):
-        pass
-treeCount = count + 1
-
-# Exporting heights to table -----------------------------------------------------------------------
-if args.verbose:
-	print("  Exporting table to: ", outFile, end="")
-i = 0
-with open(outFile, 'w') as outfile:
-	for tree in trees:
-		heights = []
-		i += 1
-		print("\r  Exporting table to:  ", outFile, "\t", str(round(i/treeCount*100)), "%", sep="", end="")
-		if i == 1:
-			if allNodes:
-				nnodes = len(tree.get_nonterminals())
-				cols = []
-				for j in range(0,nnodes):
-					cols.append("n"+str(j+1))
-			else:
-				cols = []
-				for j in nodes:
-					cols.append("n"+str(j))
-			row = '\t'.join(cols)
-			print(str(row), file=outfile)
-		j = 0
-		for node in tree.get_nonterminals():
-			height = None
-			if allNodes:
-				for tip in node.get_terminals():
-					if height is None:
-						height = node.distance(node, tip)
-						heights.append(str(height))
-			else:
-				j += 1
-				if j in nodes:
-					for tip in node.get_terminals():
-						if height is None:
-							height = node.distance(node, tip)
-							heights.append(str(height))
-		row = '\t'.join(heights)
-		print(str(row), file=outfile)
-
-if args.verbose:
-	print("\nDone")
+if __name__ == "__main__":
+	if args.verbose:
+		print("  Reading input tree: ", args.tree)
+	# Newick and nexus trees are read as text and parsed by the workers, other formats are read (serially) with Bio.Phylo
+	translate = None
+	handle = None
+	if args.formaTree in FORMATS:
+		handle = open(args.tree)
+		if args.formaTree == "newick":
+			trees = splitTrees(handle)
+		else:
+			nexus = readNexus(handle)
+			head = next(nexus, None)
+			translate = None if head is None else head[3]
+			trees = (entry[1] for entry in itertools.chain([] if head is None else [head], nexus))
+	else:
+		trees = readTrees(args.tree, args.formaTree)
+	first = next(trees, None)
+	if first is None:
+		print("Error: No trees found in", args.tree)
+		sys.exit(1)
+	reference = readTree(args.tree, args.formaTree) if args.formaTree in FORMATS else first
+
+	# The columns are the clades of the selected nodes of the first tree
+	internals = reference.internals()
+	if allNodes:
+		selected = list(range(len(internals)))
+	else:
+		selected = [j-1 for j in nodes if 0 < j <= len(internals)]
+		if len(selected) < len(nodes):
+			print("  Warning! Some nodes are not in the first tree, which has", len(internals), "nodes")
+	hashes = reference.cladeHashes()[internals].tolist()
+	columns = {}
+	kept = []
+	for j in selected:
+		if hashes[j] in columns:
+			print("  Warning! Node", j+1, "has the same clade as node", kept[columns[hashes[j]]]+1, "and is ignored")
+		else:
+			columns[hashes[j]] = len(columns)
+			kept.append(j)
+	if args.verbose:
+		print("  Writing the clades of the", len(columns), "columns to: ", cladesFile)
+	tipCounts = reference.tipCounts()
+	end = reference.subtreeEnd()
+	isTip = reference.isTip()
+	with open(cladesFile, "w") as outfile:
+		print("clade\tnode\ttips\ttipNames", file=outfile)
+		for j in kept:
+			clade = internals[j]
+			names = [reference.nodeName(i) for i in np.flatnonzero(isTip[clade:end[clade]]) + clade]
+			print(format(hashes[j], "016x"), "n" + str(j+1), tipCounts[clade], ",".join(str(name) for name in names), sep="\t", file=outfile)
+
+	# Exporting heights to table -------------------------------------------------------------------
+	if args.verbose:
+		print("  Exporting table to: ", outFile)
+	from multiprocessing import Pool
+	from functools import partial
+	worker = partial(nodeHeights, columns=columns, translate=translate)
+	pool = Pool(args.threads) if args.threads > 1 else None
+	trees = itertools.chain([first], trees)
+	count = 0
+	missing = 0
+	with open(outFile, "wb" if args.binary else "w") as outfile:
+		if args.binary:
+			outfile.write(npyHeader(0, len(columns)))
+		else:
+			print("\t".join(format(h, "016x") for h in columns), file=outfile)
+		while True:
+			batch = list(itertools.islice(trees, BATCH))
+			if len(batch) == 0:
+				break
+			results = map(worker, batch) if pool is None else pool.imap(worker, batch, chunksize=max(1, BATCH // (4 * args.threads)))
+			for row in results:
+				if args.binary:
+					outfile.write(row.tobytes())
+				else:
+					print("\t".join(str(height) for height in row.tolist()), file=outfile)
+				count += 1
+				missing += int(np.isnan(row).any())
+			if args.verbose:
+				print("\r    ", count, " trees", sep="", end="")
+		if args.binary:
+			outfile.seek(0)
+			outfile.write(npyHeader(count, len(columns)))
+	if pool is not None:
+		pool.close()
+	if handle is not None:
+		handle.close()
+
+	if args.verbose:
+		if missing > 0:
+			print("\n  Warning!", missing, "trees miss some of the clades of the first tree, their heights are given as nan", end="")
+		print("\nDone")
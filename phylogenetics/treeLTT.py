@@ -1,9 +1,12 @@
 #!/usr/bin/env python3
 
 import argparse
-from Bio import Phylo
+import bisect
 import math
+import numpy as np
 import re
+import sys
+from treeArray import readTree, parseNewick, splitTrees, readNexus
 
 parser = argparse.ArgumentParser(description="From a time calibrated tree, it will export a tab delimited table with the number of Lineages Through Time (LTT).")
 
@@ -28,6 +31,24 @@ parser.add_argument("-d", "--hpd", dest="hpd", required=False, action="store_tru
 parser.add_argument("-u", "--ultrametric", dest="ultrametric", required=False, action="store_false",
 					help="If selected, will not take the maximum of all distances from clade to tip but return an error if these are different.")
 
+parser.add_argument("-p", "--posterior", dest="posterior", required=False, action="store_true",
+					help="If selected, will read one at a time all the trees of the file (e.g.; a BEAST or MrBayes posterior sample) and export the median, mean and credible interval of the number of lineages at every time of a common time grid, instead of the LTT of a single tree. The memory used does not grow with the number of trees.")
+
+parser.add_argument("-b", "--burnin", dest="burnin", required=False, type=int, default=0,
+					help="With '-p/--posterior', the number of trees to be discarded at the beginning of the file. Default=%(default)s.")
+
+parser.add_argument("-g", "--grid", dest="grid", required=False, type=int, default=100,
+					help="With '-p/--posterior', the number of time points of the grid, evenly spaced from the present to '-a/--age'. Default=%(default)s.")
+
+parser.add_argument("-a", "--age", dest="age", required=False, type=float, default=None,
+					help="With '-p/--posterior', the oldest time of the grid. By default 1.25 times the root age of the first tree.")
+
+parser.add_argument("-c", "--credible", dest="credible", required=False, type=float, default=0.95,
+					help="With '-p/--posterior', the probability of the (equal tailed) credible interval. Default=%(default)s.")
+
+parser.add_argument("-T", "--threads", dest="threads", required=False, type=int, default=1,
+					help="With '-p/--posterior', the number of trees processed in parallel. Default=%(default)s.")
+
 parser.add_argument("-v", "--verbose", dest="verbose", required=False, action="store_false",
 					help="If selected, will not print information to the console.")
 
@@ -39,144 +60,218 @@ if args.out is None:
 else:
 	out = args.out
 
-# Reading files ------------------------------------------------------------------------------------
-if args.verbose:
-	print("  Reading files")
-T = Phylo.read(args.tree, args.formaTree)
-
-dists = set()
-for t in T.get_terminals():
-	d = T.distance(t)
-	d = round(d, 4)
-	dists.add(d)
-if len(dists) != 0:
-	print("  Warning! The tree is not ultrametric...")
-
-# Extracting node ages -----------------------------------------------------------------------------
-if args.verbose:
-	print("  Extracting node ages")
-if args.hpd:
-	heights = {}
-else:
-	heights = list()
-for clade in T.get_nonterminals():
-	height = set()
-	for tip in clade.get_terminals():
-		dist = clade.distance(clade, tip)
-		dist = round(dist, 6)
-		height.add(dist)
-	if len(height) != 1 and not args.ultrametric:
-		import sys
-		print("  Error: Different distances from node to tips. Please check your tree is ultrametric.")
+# Posterior sample ---------------------------------------------------------------------------------
+BATCH = 1000
+
+def lttGrid(text, grid):
+	"""Number of lineages at every time of the grid for one tree (given as newick text), from its sorted node heights.
+	Returns also the root age."""
+	tree = parseNewick(text)
+	heights = tree.heights()[0]
+	internals = tree.internals()
+	order = np.argsort(heights[internals], kind="stable")
+	# Every node adds its number of children minus one lineage (one in bifurcating trees) to the times younger than it
+	cumulative = np.concatenate(([0], np.cumsum(tree.childCounts()[internals][order] - 1)))
+	older = np.searchsorted(heights[internals][order], grid, side="right")
+	return 1 + cumulative[-1] - cumulative[older], heights[0]
+
+def quantile(cumulative, total, q):
+	"""Quantile of every row of a cumulative histogram of counts (columns are the number of lineages)."""
+	return np.argmax(cumulative >= q * total, axis=1)
+
+if __name__ == "__main__" and args.posterior:
+	import itertools
+	from multiprocessing import Pool
+	from functools import partial
+	if args.subtrees or args.hpd:
+		print("Error: '-s/--subtrees' and '-d/--hpd' are not available with '-p/--posterior'.")
 		sys.exit(1)
-	height = max(height)
-	if args.hpd:
-		tmp = clade.comment
-		tmp = re.sub(".*HPD=", "", tmp)
-		tmp = re.sub("{", "", tmp)
-		tmp = re.sub("}.*", "", tmp)
-		hpd05 = re.sub(",.*", "", tmp)
-		hpd95 = re.sub(".*,", "", tmp)
-		heights[height] = [hpd05, hpd95]
+	if args.formaTree not in ["newick", "nexus"]:
+		print("Error: Only newick and nexus files can be read with '-p/--posterior'.")
+		sys.exit(1)
+	handle = open(args.tree)
+	if args.formaTree == "newick":
+		texts = splitTrees(handle)
+	else:
+		texts = (newick for name, newick, rooted, translate in readNexus(handle))
+	texts = itertools.islice(texts, args.burnin, None)
+	first = next(texts, None)
+	if first is None:
+		print("Error: No trees left after the burn-in.")
+		sys.exit(1)
+	if args.age is None:
+		age = lttGrid(first, np.zeros(1))[1] * 1.25
 	else:
-		heights.append(height)
+		age = args.age
+	grid = np.linspace(0, age, args.grid)
+	if args.verbose:
+		print("  Computing the LTT of every tree at", args.grid, "time points from 0 to", round(age, 4))
+	# The number of lineages at every time point of every tree is added to a histogram (time points x lineages),
+	# from which the quantiles are exact and which does not grow with the number of trees
+	histogram = np.zeros((args.grid, 1), dtype=np.int64)
+	trees = 0
+	older = 0
+	worker = partial(lttGrid, grid=grid)
+	pool = Pool(args.threads) if args.threads > 1 else None
+	texts = itertools.chain([first], texts)
+	while True:
+		batch = list(itertools.islice(texts, BATCH))
+		if len(batch) == 0:
+			break
+		results = map(worker, batch) if pool is None else pool.imap(worker, batch, chunksize=max(1, BATCH // (4 * args.threads)))
+		for lineages, rootAge in results:
+			if lineages.max() >= histogram.shape[1]:
+				histogram = np.pad(histogram, ((0, 0), (0, lineages.max() + 1 - histogram.shape[1])))
+			histogram[np.arange(args.grid), lineages] += 1
+			trees += 1
+			if rootAge > age:
+				older += 1
+		if args.verbose:
+			print("\r    ", trees, " trees", sep="", end="")
+	if pool is not None:
+		pool.close()
+	handle.close()
+	if args.verbose:
+		print("")
+		if older > 0:
+			print("  Warning!", older, "trees are older than the time grid, consider increasing '-a/--age'")
+		print("  Writing table to", out)
+	cumulative = np.cumsum(histogram, axis=1)
+	median = quantile(cumulative, trees, 0.5)
+	lower = quantile(cumulative, trees, (1 - args.credible) / 2)
+	upper = quantile(cumulative, trees, (1 + args.credible) / 2)
+	mean = histogram @ np.arange(histogram.shape[1]) / trees
+	with open(out, "w") as outfile:
+		print("time\tlineages\tlnLineages\tmean\tlower\tupper", file=outfile)
+		for g in range(args.grid - 1, -1, -1):
+			print(str(grid[g]) + "\t" + str(median[g]) + "\t" + str(math.log(median[g])) + "\t" + str(mean[g]) + "\t" + str(lower[g]) + "\t" + str(upper[g]), file=outfile)
+	if args.verbose:
+		print("Done")
+	sys.exit(0)
+
+# Single tree --------------------------------------------------------------------------------------
+def readHPD(comment):
+	"""Lower and upper limits of the Highest Posterior Density interval given in a node comment (e.g.; '&height_95%_HPD={10.2,14.7}')."""
+	tmp = re.sub(".*HPD=", "", comment)
+	tmp = re.sub("{", "", tmp)
+	tmp = re.sub("}.*", "", tmp)
+	return [re.sub(",.*", "", tmp), re.sub(".*,", "", tmp)]
 
-# Extracting subtrees ------------------------------------------------------------------------------
-if args.subtrees:
+if __name__ == "__main__":
+	# Reading files ------------------------------------------------------------------------------------
 	if args.verbose:
-		print("  Extracting subtrees")
-	subtrees = {}
-	for clade in T.get_nonterminals():
-		if clade.comment is not None:
-			comment = clade.comment
-			if "name" in comment:
-				name = re.sub('.*name="', "", comment)
-				name = re.sub(',.*', "", name)
-				name = re.sub('"', "", name)
-				name = re.sub('\\]', "", name)
-				if args.hpd:
-					subtrees[name] = {}
-				else:
-					subtrees[name] = list()
-				for subclade in clade.get_nonterminals():
-					height = set()
-					for tip in subclade.get_terminals():
-						dist = subclade.distance(subclade, tip)
-						dist = round(dist, 6)
-						height.add(dist)
-					height = max(height)
+		print("  Reading files")
+	T = readTree(args.tree, args.formaTree)
+
+	# Extracting node ages -----------------------------------------------------------------------------
+	if args.verbose:
+		print("  Extracting node ages")
+	# Node heights from the distances of the tips to the root, computed once for the whole tree. The difference
+	# between the farthest and closest tip of every node tells whether the tree is ultrametric
+	ages, spread = T.heights()
+	if round(spread[0], 4) != 0:
+		print("  Warning! The tree is not ultrametric...")
+	internals = T.internals().tolist()
+	ages = [round(h, 6) for h in ages.tolist()]
+	if args.hpd:
+		heights = {}
+	else:
+		heights = list()
+	for clade in internals:
+		if spread[clade] >= 0.000001 and not args.ultrametric:
+			print("  Error: Different distances from node to tips. Please check your tree is ultrametric.")
+			sys.exit(1)
+		if args.hpd:
+			heights[ages[clade]] = readHPD(T.comments.get(clade))
+		else:
+			heights.append(ages[clade])
+
+	# Extracting subtrees ------------------------------------------------------------------------------
+	if args.subtrees:
+		if args.verbose:
+			print("  Extracting subtrees")
+		subtrees = {}
+		end = T.subtreeEnd()
+		for clade in internals:
+			if T.comments.get(clade) is not None:
+				comment = T.comments[clade]
+				if "name" in comment:
+					name = re.sub('.*name="', "", comment)
+					name = re.sub(',.*', "", name)
+					name = re.sub('"', "", name)
+					name = re.sub('\\]', "", name)
 					if args.hpd:
-						tmp = subclade.comment
-						tmp = re.sub(".*HPD=", "", tmp)
-						tmp = re.sub("{", "", tmp)
-						tmp = re.sub("}.*", "", tmp)
-						hpd05 = re.sub(",.*", "", tmp)
-						hpd95 = re.sub(".*,", "", tmp)
-						subtrees[name][height] = [hpd05, hpd95]
+						subtrees[name] = {}
 					else:
-						subtrees[name].append(height)
-
-# Writing file -------------------------------------------------------------------------------------
-if args.verbose:
-	print("  Writing table to", out)
-e = math.exp(1)
-with open(out, "w") as outfile:
-	if not args.subtrees and args.hpd:
-		print("time\tlineages\tlnLineages\thpd05\thpd95", file=outfile)
-		n = 0
-		for h in sorted(list(heights.keys()), reverse=True):
-			n += 1
-			ln = math.log(n, e)
-			print(str(h) + "\t" + str(n) + "\t" + str(ln) + "\t" + str(heights[h][0]) + "\t" + str(heights[h][1]), file=outfile)
-		n += 1
-		ln = math.log(n, e)
-		print("0\t" + str(n) + "\t" + str(ln) + "\t0\t0", file=outfile)
-	if not args.subtrees and not args.hpd:
-		print("time\tlineages\tlnLineages", file=outfile)
-		n = 0
-		for h in sorted(heights, reverse=True):
-			n += 1
-			ln = math.log(n, e)
-			print(str(h) + "\t" + str(n) + "\t" + str(ln), file=outfile)
-		n += 1
-		ln = math.log(n, e)
-		print("0\t" + str(n) + "\t" + str(ln), file=outfile)
-	if args.subtrees and args.hpd:
-		print("tree\ttime\tlineages\tlnLineages\thpd05\thpd95", file=outfile)
-		n = 0
-		for h in sorted(list(heights.keys()), reverse=True):
-			n += 1
-			ln = math.log(n, e)
-			print("main\t" + str(h) + "\t" + str(n) + "\t" + str(ln) + "\t" + str(heights[h][0]) + "\t" + str(heights[h][1]), file=outfile)
-		n += 1
-		ln = math.log(n, e)
-		print("main\t0\t" + str(n) + "\t" + str(ln) + "\t0\t0", file=outfile)
-		for key, dicts in subtrees.items():
+						subtrees[name] = list()
+					# The internal nodes of a clade are the ones between the clade and its end in preorder
+					for subclade in internals[bisect.bisect_left(internals, clade):bisect.bisect_left(internals, end[clade])]:
+						if args.hpd:
+							subtrees[name][ages[subclade]] = readHPD(T.comments.get(subclade))
+						else:
+							subtrees[name].append(ages[subclade])
+
+	# Writing file -------------------------------------------------------------------------------------
+	if args.verbose:
+		print("  Writing table to", out)
+	e = math.exp(1)
+	with open(out, "w") as outfile:
+		if not args.subtrees and args.hpd:
+			print("time\tlineages\tlnLineages\thpd05\thpd95", file=outfile)
 			n = 0
-			for h in sorted(list(dicts.keys()), reverse=True):
+			for h in sorted(list(heights.keys()), reverse=True):
 				n += 1
 				ln = math.log(n, e)
-				value = subtrees[key][h]
-				print(str(key) + "\t" + str(h) + "\t" + str(n) + "\t" + str(ln) + "\t" + str(value[0]) + "\t" + str(value[1]), file=outfile)
+				print(str(h) + "\t" + str(n) + "\t" + str(ln) + "\t" + str(heights[h][0]) + "\t" + str(heights[h][1]), file=outfile)
 			n += 1
 			ln = math.log(n, e)
-			print(str(key) + "\t0\t" + str(n) + "\t" + str(ln) + "\t0\t0", file=outfile)
-	if args.subtrees and not args.hpd:
-		print("tree\ttime\tlineages\tlnLineages", file=outfile)
-		n = 0
-		for h in sorted(heights, reverse=True):
+			print("0\t" + str(n) + "\t" + str(ln) + "\t0\t0", file=outfile)
+		if not args.subtrees and not args.hpd:
+			print("time\tlineages\tlnLineages", file=outfile)
+			n = 0
+			for h in sorted(heights, reverse=True):
+				n += 1
+				ln = math.log(n, e)
+				print(str(h) + "\t" + str(n) + "\t" + str(ln), file=outfile)
 			n += 1
 			ln = math.log(n, e)
-			print("main\t" + str(h) + "\t" + str(n) + "\t" + str(ln), file=outfile)
-		for key, values in subtrees.items():
+			print("0\t" + str(n) + "\t" + str(ln), file=outfile)
+		if args.subtrees and args.hpd:
+			print("tree\ttime\tlineages\tlnLineages\thpd05\thpd95", file=outfile)
 			n = 0
-			for h in sorted(values, reverse=True):
+			for h in sorted(list(heights.keys()), reverse=True):
 				n += 1
 				ln = math.log(n, e)
-				print(str(key) + "\t" + str(h) + "\t" + str(n) + "\t" + str(ln), file=outfile)
+				print("main\t" + str(h) + "\t" + str(n) + "\t" + str(ln) + "\t" + str(heights[h][0]) + "\t" + str(heights[h][1]), file=outfile)
 			n += 1
 			ln = math.log(n, e)
-			print(str(key) + "\t0\t" + str(n) + "\t" + str(ln), file=outfile)
+			print("main\t0\t" + str(n) + "\t" + str(ln) + "\t0\t0", file=outfile)
+			for key, dicts in subtrees.items():
+				n = 0
+				for h in sorted(list(dicts.keys()), reverse=True):
+					n += 1
+					ln = math.log(n, e)
+					value = subtrees[key][h]
+					print(str(key) + "\t" + str(h) + "\t" + str(n) + "\t" + str(ln) + "\t" + str(value[0]) + "\t" + str(value[1]), file=outfile)
+				n += 1
+				ln = math.log(n, e)
+				print(str(key) + "\t0\t" + str(n) + "\t" + str(ln) + "\t0\t0", file=outfile)
+		if args.subtrees and not args.hpd:
+			print("tree\ttime\tlineages\tlnLineages", file=outfile)
+			n = 0
+			for h in sorted(heights, reverse=True):
+				n += 1
+				ln = math.log(n, e)
+				print("main\t" + str(h) + "\t" + str(n) + "\t" + str(ln), file=outfile)
+			for key, values in subtrees.items():
+				n = 0
+				for h in sorted(values, reverse=True):
+					n += 1
+					ln = math.log(n, e)
+					print(str(key) + "\t" + str(h) + "\t" + str(n) + "\t" + str(ln), file=outfile)
+				n += 1
+				ln = math.log(n, e)
+				print(str(key) + "\t0\t" + str(n) + "\t" + str(ln), file=outfile)
 
-if args.verbose:
-	print("Done")
+	if args.verbose:
+		print("Done")
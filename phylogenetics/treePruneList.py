@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 
 import argparse
-from Bio import Phylo
+from treeArray import readTree, writeTrees
 
 parser = argparse.ArgumentParser(description="Prunes a tree from tips present in a list.")
 
@@ -47,8 +47,9 @@ else:
 if args.verbose:
 	print("  Reading files")
 
-T = Phylo.read(args.tree, args.formaTree)
-tips_in = T.count_terminals()
+T = readTree(args.tree, args.formaTree)
+names = T.tipNames()
+tips_in = len(names)
 
 tips = [line.strip() for line in open(args.list)]
 
@@ -56,10 +57,11 @@ tips = [line.strip() for line in open(args.list)]
 if args.invert:
 	if args.verbose:
 		print("  Inverting selection of tips")
+	tips = set(tips)
 	toPrune = set()
-	for tip in T.get_terminals():
-		if tip.name not in tips:
-			toPrune.add(tip.name)
+	for name in names:
+		if name not in tips:
+			toPrune.add(name)
 else:
 	toPrune = tips
 toPrunec = len(toPrune)
@@ -70,32 +72,27 @@ if toPrunec != len(set(toPrune)):
 	toPrune = set(toPrune)
 	toPrunec = len(toPrune)
 
+missing = set(toPrune) - set(names)
+if len(missing) > 0:
+	print("  Warning!", len(missing), "tip names were not found in the tree and therefore ignored")
+
 if args.verbose:
 	print("  In total ", toPrunec, " tips have been selected to be pruned", sep="")
 
 # Prunning -----------------------------------------------------------------------------------------
 if args.verbose:
-	print("  Prunning", end="")
-i = 0
-pl = 0
-for tip in toPrune:
-	if args.verbose:
-		i += 1
-		p = round(i/toPrunec*100)
-		if p > pl:
-			pl = p
-			print("\r  Pruning ", p, "%",sep="", end="")
-	T.prune(tip)
+	print("  Prunning")
+T = T.prune(T.tipMask(set(toPrune)))
 
-tips_out = T.count_terminals()
+tips_out = len(T.tips())
 
 if args.verbose:
-	print("\n    Tips in: ", tips_in)
+	print("    Tips in: ", tips_in)
 	print("    Tips out:", tips_out)
 	print("  Writting file to: ", out)
 
 # Writing file -------------------------------------------------------------------------------------
-Phylo.write(T, out, formatOut)
+writeTrees(T, out, formatOut)
 
 if args.verbose:
 	print("Done")
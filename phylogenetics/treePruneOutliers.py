@@ -1,10 +1,11 @@
 #!/usr/bin/env python3
 
 import argparse
-from Bio import SeqIO, Phylo
 import statistics
 import numpy as np
 import re
+import sys
+from treeArray import readTree, writeTrees
 
 parser = argparse.ArgumentParser(description="Prunes a tree of tips which their branch length are identified as outliers by either the Z-scores, the interquartile range or the generalized extreme studentized deviate method.",
 								 epilog="*Depending on the method, outliers are defined if; Z-scores:|i—μ|/σ > t; IQR: i < q1-(t*iqr) OR i > q3+(t*iqr) (being 'i' the given branch length, 'µ' the average branch length, 'σ' the standard deviation, 't' the chosen threshold, 'q1' the 25th quartile, 'q3' the 75th quartile and 'iqr' the difference between 'q3' and 'q1'); and gESD: Rosner, Bernard (1983), Percentage Points for a Generalized ESD Many-Outlier Procedure,Technometrics, 25(2), pp. 165-172.")
@@ -19,25 +20,28 @@ parser.add_argument("-f", "--format", dest="formaTree", required=False, default=
 					help="The tree file format: accepted formats are: newick (default), nexus, nexml, phyloxml or cdao.")
 
 parser.add_argument("-o", "--output", dest="output", required=False, default=None,
-					help="The output file name. By default will add '_pruned' to the file name (including '-iqr' or '-gesd' if selected). If output='false', the tree will not be exported.")
+					help="The output file name. By default will add '_pruned' and the suffix of the method to the file name: '-iqr', '-gesd', '-local' for Z-scores with '-k/--clade', and nothing for Z-scores. A given name is used as it is with one method, while with several methods the suffix of every method is added to it so each tree has its own file. If output='false', the tree will not be exported.")
 
-parser.add_argument("-m", "--method", dest="method", required=False, default='zscores', choices=['zscores', 'iqr', 'gesd'],
-					help="The method to identify outliers: Either by Z-scores ('zscores', default), by the InterQuartile Range ('iqr') or by the generalized Extreme Studentized Deviate (gESD: 'gesd')")
+parser.add_argument("-m", "--method", dest="method", required=False, default=['zscores'], nargs='+', choices=['zscores', 'iqr', 'gesd'],
+					help="The method to identify outliers: Either by Z-scores ('zscores', default), by the InterQuartile Range ('iqr') or by the generalized Extreme Studentized Deviate (gESD: 'gesd'). Several methods can be given to compare them in one run, exporting one pruned tree per method.")
 
-parser.add_argument("-r", "--threshold", dest="threshold", required=False, default=None,
-					help="The threshold to identify outliers. By default: zscores=2; iqr:1.5; gesd: 0.05 (refers to the significance)")
+parser.add_argument("-r", "--threshold", dest="threshold", required=False, default=None, nargs='+', type=float,
+					help="The threshold to identify outliers, one per method in the same order. By default: zscores=2; iqr:1.5; gesd: 0.05 (refers to the significance)")
 
 parser.add_argument("-n", "--maximum", dest="maximum", required=False, default=None,
 					help="For gESD method only, an estimate of the maximum number of outliers in the dataset. Default= 1/10 of the number of tips.")
 
+parser.add_argument("-k", "--clade", dest="clade", required=False, default=None, type=int,
+					help="For Z-scores method only, if selected, every tip is compared to the other tips of the smallest clade with at least 'k' tips containing it, instead of the whole tree. So long branches of fast evolving clades are not flagged, while long branches within slow clades are. '-local' is then the suffix of the Z-scores method in the output names (see '-o/--output').")
+
 parser.add_argument("-l", "--list", dest="table", required=False, action="store_true",
-					help="If selected, will write the tips, its branch lengths and whether it was considered an outlier or not a tab delimited table to the input file adding '_branchLengths.tsv'")
+					help="If selected, will write the tips, its branch lengths and whether it was considered an outlier or not (one column per method, in the same order) a tab delimited table to the input file adding '_branchLengths.tsv'")
 
 parser.add_argument("-i", "--internal", dest="internal", required=False, action="store_true",
-					help="If selected, will also remove internal branches with their doughter branches. WARNING! This option is still in development... Might not be optimized.")
+					help="If selected, will also remove internal branches with their doughter branches.")
 
-parser.add_argument("-R", "--thresholdInternals", dest="thresholdi", required=False, default=None,
-					help="The threshold to identify outliers in internal branches. By default 'r*4' (except for 'gesd': 0.001) to remove only badly resolved or conflicting groups.")
+parser.add_argument("-R", "--thresholdInternals", dest="thresholdi", required=False, default=None, nargs='+', type=float,
+					help="The threshold to identify outliers in internal branches, one per method in the same order. By default 'r*4' (except for 'gesd': 0.001) to remove only badly resolved or conflicting groups.")
 
 parser.add_argument("-T", "--tipsInternal", dest="tipsMax", required=False, default=4, type=int,
 					help="If an internal branch has equal or more than 'T' childs, it is not pruned. Default=4")
@@ -52,268 +56,225 @@ methodsHelp = parser.add_argument_group('Methods')
 
 args = parser.parse_args()
 
+# Checking arguments -------------------------------------------------------------------------------
+if args.threshold is not None and len(args.threshold) != len(args.method):
+	print("Error: Number of thresholds do not match number of methods.")
+	sys.exit(1)
+if args.thresholdi is not None and len(args.thresholdi) != len(args.method):
+	print("Error: Number of internal thresholds do not match number of methods.")
+	sys.exit(1)
+if args.clade is not None and args.clade < 3:
+	print("Error: Clades should have at least 3 tips to compare every tip with the others.")
+	sys.exit(1)
+
 # Reading file -------------------------------------------------------------------------------------
 if args.verbose:
 	print("Reading tree file:", args.tree)
-T = Phylo.read(args.tree, args.formaTree)
+T = readTree(args.tree, args.formaTree)
 
 # Extracting branch lengths ------------------------------------------------------------------------
 if args.verbose:
 	print("  Getting branch lengths")
-tips = list()
-lengths = list()
-for line in T.get_terminals():
-	tips.append(line.name)
-	lengths.append(line.branch_length)
+tips = T.tips()
+names = T.tipNames()
+lengths = T.length[tips].tolist()
 
 if args.internal:
-	branches = 0
-	lengthsi = list()
-	for line in T.get_nonterminals():
-		lengthsi.append(line.branch_length)
-	lengthsi = [i for i in lengthsi if i is not None]
+	# Internal branches are kept together with their node, and the tips of every node are counted once
+	nodes = T.internals()
+	nodes = nodes[~np.isnan(T.length[nodes])]
+	lengthsi = T.length[nodes].tolist()
+	tipCounts = T.tipCounts()
 
 # Setting variables --------------------------------------------------------------------------------
+EXT = {"zscores": "", "iqr": "-iqr", "gesd": "-gesd"}
+if args.clade is not None:
+	EXT["zscores"] = "-local"
 
-# Output file
-if args.output is None:
-	if args.method == "gesd":
-		ext = "-gesd"
-	elif args.method == "iqr":
-		ext = "-iqr"
-	else:
-		ext = ""
-	outFile = re.sub("\\.[^\\.]+$", "_pruned", args.tree) + ext + re.sub(".*\\.", ".", args.tree)
-else:
-	outFile = args.output
+def outputName(method):
+	if args.output is None:
+		return re.sub("\\.[^\\.]+$", "_pruned", args.tree) + EXT[method] + re.sub(".*\\.", ".", args.tree)
+	if len(args.method) > 1 and args.output != "false":
+		return re.sub("\\.[^\\.]+$", "", args.output) + EXT[method] + re.sub(".*\\.", ".", args.output)
+	return args.output
 
 # Branch lengths file if applicable
 if args.table:
-	if args.method == "gesd":
-		ext = "-gesd"
-	elif args.method == "iqr":
-		ext = "-iqr"
-	else:
-		ext = ""
+	ext = EXT[args.method[0]] if len(args.method) == 1 else ""
 	outTable = re.sub("\\.[^\\.]+$", "_branchLengths", args.tree) + ext + ".tsv"
-else:
-	outTable = args.table
-
-# Z-Scores
-if args.method == "zscores":
-	a = statistics.mean(lengths)
-	s = statistics.stdev(lengths)
-	if args.threshold is None:
-		t = 2
-		ext = "(default value)"
-	else:
-		t = float(args.threshold)
-		ext = ""
-	if args.verbose:
-		print("  Using Z-scores method for outlier identification")
-		print("    Average:           ", a)
-		print("    Standard deviation:", s)
-		print("    Threshold:         ", t, ext)
-		print("      Formula: | i —", round(a, 2), " | /", round(s, 2), " >", round(t, 2))
-	if args.internal:
-		if args.thresholdi is None:
-			ti = t*4
+
+if args.internal and args.verbose:
+	print("  Removing also internal branches and their childs")
+
+outliers = {}
+for k, method in enumerate(args.method):
+	threshold = None if args.threshold is None else args.threshold[k]
+	thresholdi = None if args.thresholdi is None else args.thresholdi[k]
+	outlieri = list()
+
+	# Z-Scores
+	if method == "zscores":
+		a = statistics.mean(lengths)
+		s = statistics.stdev(lengths)
+		if threshold is None:
+			t = 2
+			ext = "(default value)"
 		else:
-			ti = float(args.thresholdi)
-		ai = statistics.mean(lengthsi)
-		si = statistics.stdev(lengthsi)
-		if args.verbose:
-			print("      Using threshold", ti, "for internal branches with less than", args.tipsMax, "tips")
-
-# IQR
-if args.method == "iqr":
-	q1 = np.percentile(lengths, 25)
-	q3 = np.percentile(lengths, 75)
-	iqr = q3 - q1
-	if args.threshold is None:
-		t = 1.5
-		ext = "(default value)"
-	else:
-		t = float(args.threshold)
-		ext =""
-	lower = q1-(t*iqr)
-	upper = q3+(t*iqr)
-	if args.verbose:
-		print("  Using IQR method for outlier identification")
-		print("    25th quartile:", q1)
-		print("    75th quartile:", q3)
-		print("    Threshold:    ", t, ext)
-		print("      Formula: i <", round(q1, 4), "- (", t, "*", round(iqr, 4), ") OR i >", round(q3, 4),"+ (", t, "*", round(iqr, 4), ") = i <", round(lower, 4), "| i >", round(upper, 4))
-	if args.internal:
-		if args.thresholdi is None:
-			ti = t*4
+			t = threshold
+			ext = ""
+		if args.verbose and args.clade is None:
+			print("  Using Z-scores method for outlier identification")
+			print("    Average:           ", a)
+			print("    Standard deviation:", s)
+			print("    Threshold:         ", t, ext)
+			print("      Formula: | i —", round(a, 2), " | /", round(s, 2), " >", round(t, 2))
+		if args.clade is None:
+			outlier = np.flatnonzero(np.abs(np.array(lengths) - a) / s > t)
 		else:
-			ti = float(args.thresholdi)
-		q1i = np.percentile(lengthsi, 25)
-		q3i = np.percentile(lengthsi, 75)
-		iqri = q3i - q1i
-		loweri = q1i-(ti*iqri)
-		upperi = q3i+(ti*iqri)
-		if args.verbose:
-			print("      Using threshold", ti, "for internal branches with less than", args.tipsMax, "tips")
-
-# gESD
-if args.method == "gesd":
-	from PyAstronomy import pyasl
-	if args.threshold is None:
-		t = 0.05
-		ext1 = "(default value)"
-	else:
-		t = int(args.threshold)
-		ext1 = ""
-	if args.maximum is None:
-		m = int(len(tips)/10)
-		if m <= 1:
-			ext2 = " - Warning! Default '-n' gives " + str(m) + " maximum expected outliers. This variable was changed!"
-			m = 2
+			# Sums of the (centred) tip branch lengths and of their squares in every clade, so the average and standard deviation
+			# of the other tips of the enclosing clade of every tip are obtained in O(n) whatever the size of the clades
+			x = np.full(len(T), np.nan)
+			x[tips] = np.array(lengths) - a
+			sums = T.cladeSums(x)
+			squares = T.cladeSums(x**2)
+			enclosing = T.enclosingClades(args.clade)[tips]
+			x = x[tips]
+			count = T.tipCounts()[enclosing] - 1
+			ac = (sums[enclosing] - x) / count
+			sc = np.sqrt(np.maximum(squares[enclosing] - x**2 - count * ac**2, 0) / (count - 1))
+			with np.errstate(divide="ignore", invalid="ignore"):
+				z = np.abs(x - ac) / sc
+			outlier = np.flatnonzero(z > t)
+			if args.verbose:
+				print("  Using clade-local Z-scores method for outlier identification")
+				print("    Minimum clade size:", args.clade, "tips (" + str(len(np.unique(enclosing))) + " clades)")
+				print("    Threshold:         ", t, ext)
+				print("      Formula: | i — μc | / σc >", round(t, 2), "(being 'μc' and 'σc' the average and standard deviation of the other tips of the clade)")
+		if args.internal:
+			if thresholdi is None:
+				ti = t*4
+			else:
+				ti = thresholdi
+			ai = statistics.mean(lengthsi)
+			si = statistics.stdev(lengthsi)
+			if args.verbose:
+				print("      Using threshold", ti, "for internal branches with less than", args.tipsMax, "tips")
+			outlieri = np.flatnonzero(np.abs(np.array(lengthsi) - ai) / si > ti)
+
+	# IQR
+	if method == "iqr":
+		q1 = np.percentile(lengths, 25)
+		q3 = np.percentile(lengths, 75)
+		iqr = q3 - q1
+		if threshold is None:
+			t = 1.5
+			ext = "(default value)"
 		else:
-			ext2 = "(default value: 10%)"
-	else:
-		m = int(args.maximum)
-		ext2 = ""
-	if args.verbose:
-		print("  Using gESD method for outlier identification")
-		print("    Significance:                      ", t, ext1)
-		print("    Maximum number of outliers allowed:", m, ext2)
-	if args.internal:
-		ext3=""
-		if args.thresholdi is None:
-			ti = 0.001
+			t = threshold
+			ext =""
+		lower = q1-(t*iqr)
+		upper = q3+(t*iqr)
+		if args.verbose:
+			print("  Using IQR method for outlier identification")
+			print("    25th quartile:", q1)
+			print("    75th quartile:", q3)
+			print("    Threshold:    ", t, ext)
+			print("      Formula: i <", round(q1, 4), "- (", t, "*", round(iqr, 4), ") OR i >", round(q3, 4),"+ (", t, "*", round(iqr, 4), ") = i <", round(lower, 4), "| i >", round(upper, 4))
+		outlier = np.flatnonzero((np.array(lengths) < lower) | (np.array(lengths) > upper))
+		if args.internal:
+			if thresholdi is None:
+				ti = t*4
+			else:
+				ti = thresholdi
+			q1i = np.percentile(lengthsi, 25)
+			q3i = np.percentile(lengthsi, 75)
+			iqri = q3i - q1i
+			loweri = q1i-(ti*iqri)
+			upperi = q3i+(ti*iqri)
+			if args.verbose:
+				print("      Using threshold", ti, "for internal branches with less than", args.tipsMax, "tips")
+			outlieri = np.flatnonzero((np.array(lengthsi) < loweri) | (np.array(lengthsi) > upperi))
+
+	# gESD
+	if method == "gesd":
+		from PyAstronomy import pyasl
+		if threshold is None:
+			t = 0.05
+			ext1 = "(default value)"
 		else:
-			ti = float(args.thresholdi)
-		if args.maximumi is None:
-			mi = int((len(lengthsi)+1)/100)
-			if mi <= 1:
-				ext3 = "\n      Warning! Default '-N' gives " + str(mi) + " maximum expected outliers for internal branches. This variable was changed!"
-				mi = 2
+			t = threshold
+			ext1 = ""
+		if args.maximum is None:
+			m = int(len(lengths)/10)
+			if m <= 1:
+				ext2 = " - Warning! Default '-n' gives " + str(m) + " maximum expected outliers. This variable was changed!"
+				m = 2
+			else:
+				ext2 = "(default value: 10%)"
 		else:
-			mi = int(args.maximumi)
+			m = int(args.maximum)
+			ext2 = ""
 		if args.verbose:
-			print("      Using significance: ", ti, "; and maximum: ", mi, " for internal branches with less than ", args.tipsMax, " tips", ext3, sep="")
-
-
-# Calculating outliers -----------------------------------------------------------------------------
-toPrune = list()
-zips = zip(tips, lengths)
-
-if args.internal and args.verbose:
-	print("  Removing also internal branches and their childs. This might take a while...")
-
-# Z-scores
-if args.method == "zscores":
-	for tip, length in zips:
-		j = abs((length - a)) / s
-		if j > t:
-			toPrune.append(tip)
-	if args.internal:
-		internals = list()
-		for i in lengthsi:
-			ji = abs((i - ai)) / si
-			if ji > ti:
-				branches += 1
-				for line in T.get_nonterminals():
-					if i == line.branch_length:
-						tmp = list()
-						for l in line.get_terminals():
-							tmp.append(l.name)
-						if len(tmp) < args.tipsMax:
-							internals = internals + tmp
-						else:
-							branches -= 1
-
-# IQR
-if args.method == "iqr":
-	for tip, length in zips:
-		if length < lower or length > upper:
-			toPrune.append(tip)
+			print("  Using gESD method for outlier identification")
+			print("    Significance:                      ", t, ext1)
+			print("    Maximum number of outliers allowed:", m, ext2)
+		outlier = pyasl.generalizedESD(lengths, m, t)[1]
+		if args.internal:
+			ext3=""
+			if thresholdi is None:
+				ti = 0.001
+			else:
+				ti = thresholdi
+			if args.maximumi is None:
+				mi = int((len(lengthsi)+1)/100)
+				if mi <= 1:
+					ext3 = "\n      Warning! Default '-N' gives " + str(mi) + " maximum expected outliers for internal branches. This variable was changed!"
+					mi = 2
+			else:
+				mi = int(args.maximumi)
+			if args.verbose:
+				print("      Using significance: ", ti, "; and maximum: ", mi, " for internal branches with less than ", args.tipsMax, " tips", ext3, sep="")
+			outlieri = pyasl.generalizedESD(lengthsi, mi, ti)[1]
+
+	# Calculating outliers -------------------------------------------------------------------------
+	toPrune = np.zeros(len(T), dtype=bool)
+	toPrune[tips[outlier]] = True
+	terminal = int(toPrune.sum())
 	if args.internal:
-		internals = list()
-		for i in lengthsi:
-			if i < loweri or i > upperi:
-				branches += 1
-				for line in T.get_nonterminals():
-					if i == line.branch_length:
-						tmp = list()
-						for l in line.get_terminals():
-							tmp.append(l.name)
-						if len(tmp) < args.tipsMax:
-							internals = internals + tmp
-						else:
-							branches -= 1
-
-# gESD
-if args.method == "gesd":
-	gesd = pyasl.generalizedESD(lengths, m, t)
-	for j in gesd[1]:
-		toPrune.append(tips[j])
-	if args.internal:
-		internals = list()
-		gesdi = pyasl.generalizedESD(lengthsi, mi, ti)
-		for j in gesdi[1]:
-			i = lengthsi[j]
-			branches += 1
-			for line in T.get_nonterminals():
-				if i == line.branch_length:
-					tmp = list()
-					for l in line.get_terminals():
-						tmp.append(l.name)
-					if len(tmp) < args.tipsMax:
-						internals = internals + tmp
-					else:
-						branches -= 1
-
-# Pruning ------------------------------------------------------------------------------------------
-if args.internal:
-	if args.verbose:
-		print("  Prunning a total of", len(set(toPrune+internals)), "tips...")
-		print("    Of which", len(toPrune), "are terminal and", len(internals), "are from", branches, "long internal branches")
-		
-	toPrune = list(set(toPrune+internals))
-else:
+		# Internal branches with less than 'T' tips are expanded to their tips in one pass
+		outlieri = nodes[outlieri]
+		outlieri = outlieri[tipCounts[outlieri] < args.tipsMax]
+		internal = T.cladeTips(outlieri)
+		toPrune |= internal
+	outliers[method] = toPrune[tips]
+
+	# Pruning --------------------------------------------------------------------------------------
 	if args.verbose:
-		print("  Prunning a total of", len(toPrune), "tips...")
-i = 0
-pl = 0
-for tip in toPrune:
-	if args.verbose:
-		i += 1
-		p = round(i/len(toPrune)*100)
-		if p > pl:
-			pl = p
-			print("\r    Pruning ", p, "%",sep="", end="")
-	T.prune(tip)
-if args.verbose:
-	print("")
-
-# Writing files ------------------------------------------------------------------------------------
-if outFile == "false":
-	if args.verbose:
-		print("  Pruned tree is NOT exported")
-if outFile != "false":
+		print("  Prunning a total of", int(toPrune.sum()), "tips...")
+		if args.internal:
+			print("    Of which", terminal, "are terminal and", int(internal.sum()), "are from", len(outlieri), "long internal branches")
+	pruned = T.prune(toPrune)
+
+	# Writing files --------------------------------------------------------------------------------
+	outFile = outputName(method)
+	if outFile == "false":
+		if args.verbose:
+			print("  Pruned tree is NOT exported")
+	if outFile != "false":
+		if args.verbose:
+			print("  Writing pruned tree to", outFile)
+		writeTrees(pruned, outFile, args.formaTree)
 	if args.verbose:
-		print("  Writing pruned tree to", outFile)
-	Phylo.write(T, outFile, args.formaTree)
+		print("  Tips in input tree: ", len(tips))
+		print("  Tips in output tree:", len(pruned.tips()))
 
 if args.table:
 	if args.verbose:
 		print("  Writing branch lengths to", outTable)
-	identified = list()
-	for tip in tips:
-		if tip in toPrune:
-			identified.append("Outlier")
-		else:
-			identified.append("")
 	with open(outTable, "w") as outtable:
-		zips = zip(tips, lengths, identified)
-		for tip, length, iden in zips:
-			print(str(tip) + '\t' + str(length) + '\t' + str(iden), file=outtable)
+		for j, (tip, length) in enumerate(zip(names, lengths)):
+			identified = ["Outlier" if outliers[method][j] else "" for method in args.method]
+			print(str(tip) + '\t' + str(length) + '\t' + '\t'.join(identified), file=outtable)
 
 if args.verbose:
-	print("  Tips in input tree: ", len(tips))
-	print("  Tips in output tree:", T.count_terminals())
 	print("Done")
@@ -1,8 +1,11 @@
 #!/usr/bin/env python3
 
 import argparse
-from Bio import Phylo
+import numpy as np
 import re
+import sys
+import warnings
+from treeArray import readTrees
 
 parser = argparse.ArgumentParser(description="From a time calibrated tree, it will export a tab delimited table with the split rate at every given time interval.")
 
@@ -18,14 +21,23 @@ parser.add_argument("-o", "--out", dest="out", required=False, default=None,
 parser.add_argument("-s", "--steps", dest="steps", required=False, type=int, default=50,
 					help="The number of steps to estimate the split rate. Default=50 steps.")
 
-parser.add_argument("-i", "--interval", dest="interval", required=False, type=int, default=None,
-					help="The time interval within the split rate will be estimated. If used, will ignore the input given in '-s/--steps'.")
+parser.add_argument("-i", "--interval", dest="interval", required=False, type=float, default=None,
+					help="The time interval within the split rate will be estimated, which can be a decimal number. If used, will ignore the input given in '-s/--steps'.")
 
 parser.add_argument("-f", "--format", dest="formaTree", required=False, default='newick',
 					help="The tree file format: accepted formats are: newick (default) and nexus.")
 
 parser.add_argument("-w", "--slidewindow", dest="slidewindow", required=False, action="store_false",
-					help="If selected, will instead return the split rate estimated by sliding windows (of size taken from either '-s/--steps' or -i/--interval) at every unit of time.")
+					help="If selected, will instead return the split rate estimated by sliding windows (of size taken from either '-s/--steps' or -i/--interval) at every unit of time (or every half interval if the interval is smaller than one unit or not an integer).")
+
+parser.add_argument("-p", "--posterior", dest="posterior", required=False, action="store_true",
+					help="If selected, will read all the trees of the file (e.g.; a posterior sample) and export the median number of lineages, splits and split rate at every time, with the credible interval of the split rate. Times are set from the first tree.")
+
+parser.add_argument("-b", "--burnin", dest="burnin", required=False, type=int, default=0,
+					help="With '-p/--posterior', the number of trees to be discarded at the beginning of the file. Default=%(default)s.")
+
+parser.add_argument("-c", "--credible", dest="credible", required=False, type=float, default=0.95,
+					help="With '-p/--posterior', the probability of the (equal tailed) credible interval of the split rate. Default=%(default)s.")
 
 parser.add_argument("-v", "--verbose", dest="verbose", required=False, action="store_false",
 					help="If selected, will not print information to the console.")
@@ -35,31 +47,38 @@ args = parser.parse_args()
 # Reading files ------------------------------------------------------------------------------------
 if args.verbose:
 	print("  Reading file")
-T = Phylo.read(args.tree, args.formaTree)
+trees = readTrees(args.tree, args.formaTree)
+for b in range(args.burnin if args.posterior else 0):
+	next(trees, None)
+T = next(trees, None)
+if T is None:
+	print("Error: No trees found in", args.tree)
+	sys.exit(1)
 
 # Extracting node ages -----------------------------------------------------------------------------
+def nodeAges(T):
+	"""Sorted unique node heights and the number of lineages at each of them (as given by the tips minus the younger splits)."""
+	heights = np.sort(T.heights()[0][T.internals()])
+	ages = np.unique(heights)
+	lineages = len(T.tips()) - (np.searchsorted(heights, ages, side="right") - 1)
+	return ages, lineages
+
 if args.verbose:
 	print("  Extracting node ages")
-heights = list()
-for clade in T.get_nonterminals():
-	height = None
-	for tip in clade.get_terminals():
-		if height is None:
-			height = clade.distance(clade, tip)
-	heights.append(height)
-
-i = T.count_terminals()
-lineages = {}
-for h in sorted(heights):
-	lineages[h] = i
-	i = i - 1
+ages, lineages = nodeAges(T)
 
 # setting variables --------------------------------------------------------------------------------
-rootAge = max(heights)
+rootAge = ages[-1]
 if args.interval is None:
 	inter = int(rootAge / args.steps)
-else:
+	if inter == 0:
+		inter = rootAge / args.steps
+elif args.interval.is_integer():
 	inter = int(args.interval)
+else:
+	inter = args.interval
+integer = isinstance(inter, int)
+end = round(rootAge) if integer else rootAge
 
 if args.verbose:
 	if args.slidewindow:
@@ -81,47 +100,65 @@ if args.out is None:
 else:
 	out = args.out
 
+# Time windows: every interval, or centred at every unit of time (every half interval if not an integer)
+if args.slidewindow:
+	times = [k * inter for k in range(1, int(np.ceil(end / inter)))]
+	lower = np.array(times, dtype=float) - inter
+	upper = np.array(times, dtype=float)
+else:
+	step = 1 if integer else inter / 2
+	times = [k * step for k in range(int(np.ceil(end / step))) if k * step >= (inter/2) and k * step <= (end-(inter/2))]
+	lower = np.array(times, dtype=float) - inter/2
+	upper = np.array(times, dtype=float) + inter/2
+if not integer:
+	times = [round(t, 10) for t in times]
+
+def splitRate(ages, lineages):
+	"""Number of lineages, splits and split rate within every time window (excluding its limits), from binary searches in the sorted node ages.
+	The lineages are those after the oldest split within the window, or before the window if there is no split."""
+	first = np.searchsorted(ages, lower, side="right")
+	splits = np.searchsorted(ages, upper, side="left") - first
+	l = np.where(first < len(ages), lineages[np.minimum(first, len(ages) - 1)], 0)
+	with np.errstate(divide="ignore", invalid="ignore"):
+		rates = np.where(l > 0, splits / np.maximum(l, 1), np.nan)
+	return l, splits, rates
+
 # Writing file -------------------------------------------------------------------------------------
-if args.verbose:
-	print("  Writing table to", out)
-with open(out, "w") as outfile:
-	print("time\tlineages\tsplits\trate", file=outfile)
-	if args.slidewindow:
-		for i in range(0, round(rootAge), inter):
-			if i > 0:
-				j = i - inter
-				l = 0
-				s = 0
-				for height, lineage in lineages.items():
-					if height < i and height > j:
-						s += 1
-						if lineage > l:
-							l = lineage
-				if l == 0:
-					for h2, l2 in lineages.items():
-						if h2 > j:
-							if l2 > l:
-								l = l2
-				print(str(i), "\t", str(l), "\t", str(s), "\t", str(s/l), file=outfile)
-	else:
-		for k in range(0, round(rootAge), 1):
-			if k >= (inter/2) and k <= (round(rootAge)-(inter/2)):
-				i = k+(inter/2)
-				j = k-(inter/2)
-				l = 0
-				s = 0
-				for height, lineage in lineages.items():
-					if height < i and height > j:
-						s += 1
-						if lineage > l:
-							l = lineage
-				if l == 0:
-					for h2, l2 in lineages.items():
-						if h2 > j:
-							if l2 > l:
-								l = l2
-				print(str(k), "\t", str(l), "\t", str(s), "\t", str(s/l), file=outfile)
-				
+if not args.posterior:
+	if args.verbose:
+		print("  Writing table to", out)
+	l, splits, rates = splitRate(ages, lineages)
+	with open(out, "w") as outfile:
+		print("time\tlineages\tsplits\trate", file=outfile)
+		for k, time in enumerate(times):
+			print(str(time), "\t", str(l[k]), "\t", str(splits[k]), "\t", str(splits[k]/l[k]), file=outfile)
+else:
+	# Every tree is summarised on the windows of the first tree, and the windows older than its root are ignored
+	if args.verbose:
+		print("  Estimating split rates for every tree")
+	results = [splitRate(ages, lineages)]
+	for T in trees:
+		results.append(splitRate(*nodeAges(T)))
+		if args.verbose and len(results) % 100 == 0:
+			print("\r    ", len(results), " trees", sep="", end="")
+	if args.verbose:
+		print("\n  Writing table to", out)
+	l = np.array([r[0] for r in results], dtype=float)
+	l[l == 0] = np.nan
+	splits = np.array([r[1] for r in results], dtype=float)
+	splits[np.isnan(l)] = np.nan
+	rates = np.array([r[2] for r in results])
+	# Windows without any tree older than them give nan (with a warning)
+	with warnings.catch_warnings():
+		warnings.simplefilter("ignore", category=RuntimeWarning)
+		medians = [np.nanmedian(x, axis=0) for x in (l, splits, rates)]
+		lowerRate = np.nanquantile(rates, (1 - args.credible) / 2, axis=0)
+		upperRate = np.nanquantile(rates, (1 + args.credible) / 2, axis=0)
+		count = (~np.isnan(rates)).sum(axis=0)
+	with open(out, "w") as outfile:
+		print("time\tlineages\tsplits\trate\tlower\tupper\ttrees", file=outfile)
+		for k, time in enumerate(times):
+			print(str(time), str(medians[0][k]), str(medians[1][k]), str(medians[2][k]), str(lowerRate[k]), str(upperRate[k]), str(count[k]), sep="\t", file=outfile)
 
 if args.verbose:
 	print("Done")
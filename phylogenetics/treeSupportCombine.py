@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 
 import argparse
-from Bio import Phylo
+from treeArray import readTree, writeTrees
 
 parser = argparse.ArgumentParser(description="Will combine the node support from different trees into the first input tree in the given order, and export an annotated tree.")
 
@@ -26,6 +26,9 @@ parser.add_argument("-a", "--absent", dest="absent", required=False, action="sto
 parser.add_argument("-o", "--output", dest="output", required=False, action="store", default=None,
 					help="The output file name. By default will add '_condifenceCombined' to the first input tree with the given extension.")
 
+parser.add_argument("-T", "--threads", dest="threads", required=False, type=int, default=1,
+					help="The number of processes used to read the trees other than the first. Default=%(default)s.")
+
 parser.add_argument("-v", "--verbose", dest="verbose", required=False, action="store_false",
 					help="If selected, will not print information to the console.")
 
@@ -45,70 +48,46 @@ if len(args.trees) == 1:
 	print(  "Warning, only one tree has been given.", flush=True)
 
 # Reading files and checking internal nodes --------------------------------------------------------
-i = 0
-for tree in args.trees:
-	i += 1
-	if i == 1:
-		if args.verbose:
-			print("  Reading tree ", tree, " (", i, "/", len(args.trees), ")", sep="", flush=True)
-		# T = Phylo.read(tree, args.formaTree)
-		T = Phylo.read(tree, "newick")
-		nodesSupport = {}
-		nodesTips = {}
-		c = 0
-		for clade in T.get_nonterminals():
-			c += 1
-			nodesSupport["node" + str(c)] = clade.confidence
-			names = []
-			for tip in clade.get_terminals():
-				names.append(tip.name)
-			nodesTips["node" + str(c)] = str(names)
-	else:
-		if args.verbose:
-			print("  Reading tree ", tree, " (", i, "/", len(args.trees), ")", sep="", end="", flush=True)
-		# Ti = Phylo.read(tree, args.formaTree)
-		Ti = Phylo.read(tree, "newick")
-		if args.verbose:
-			nnodes = len(T.get_nonterminals())
-		nodesSupporti = {}
-		nodesTipsi = {}
-		c = 0
-		for clade in Ti.get_nonterminals():
-			c += 1
-			nodesSupporti["node" + str(c)] = clade.confidence
-			names = []
-			for tip in clade.get_terminals():
-				names.append(tip.name)
-			nodesTipsi["node" + str(c)] = str(names)
-		if args.verbose:
-			c = 0
-		for node, tips in nodesTips.items():
+def supportString(tree):
+	"""Support of every internal node of a tree as text ('None' if missing), with integer values written without decimals as Bio.Phylo does."""
+	return ["None" if s != s else str(int(s)) if s.is_integer() else str(s) for s in tree.support[tree.internals()].tolist()]
+
+def cladeSupports(tree):
+	"""Support of every clade of a tree file by the hash of its tips, so clades are matched with a dictionary look up."""
+	Ti = readTree(tree, "newick")
+	return dict(zip(Ti.cladeHashes()[Ti.internals()].tolist(), supportString(Ti)))
+
+if __name__ == "__main__":
+	if args.verbose:
+		print("  Reading tree ", args.trees[0], " (1/", len(args.trees), ")", sep="", flush=True)
+	T = readTree(args.trees[0], "newick")
+	internals = T.internals()
+	hashes = T.cladeHashes()[internals].tolist()
+	nodesSupport = supportString(T)
+
+	# The other trees are read and hashed in parallel, and combined in the given order
+	if len(args.trees) > 1:
+		from multiprocessing import Pool
+		pool = Pool(args.threads) if args.threads > 1 else None
+		results = map(cladeSupports, args.trees[1:]) if pool is None else pool.imap(cladeSupports, args.trees[1:])
+		for i, supportsi in enumerate(results):
 			if args.verbose:
-				c += 1
-				print("\r  Reading tree ", tree, " (", i, "/", len(args.trees), ") and referencing ", round(c/nnodes*100), "%", sep="", end="", flush=True)
-			found = None
-			for nodei, tipsi in nodesTipsi.items():
-				if sorted(tips) == sorted(tipsi):
-					found = nodei
-			if found is not None:
-				nodesSupport[node] = str(nodesSupport[node]) + str(delim) + str(nodesSupporti[found])
-			else:
-				nodesSupport[node] = str(nodesSupport[node]) + str(delim) + str(absent)
-		if args.verbose:
-			print("")
-
-# Annotating output file ---------------------------------------------------------------------------
-if args.verbose:
-	print("  Annotating tree", flush=True)
-c = 0
-for clade in T.get_nonterminals():
-	c += 1
-	clade.comment = '&combined_confidence="' + nodesSupport["node" + str(c)] + '"'
-
-# Writing file -------------------------------------------------------------------------------------
-if args.verbose:
-	print("  Exporting tree to", output, flush=True)
-Phylo.write(T, output, "nexus")
-
-if args.verbose:
-	print("Done", flush=True)
+				print("  Reading tree ", args.trees[i+1], " (", i+2, "/", len(args.trees), ")", sep="", flush=True)
+			for c, h in enumerate(hashes):
+				nodesSupport[c] = nodesSupport[c] + delim + supportsi.get(h, absent)
+		if pool is not None:
+			pool.close()
+
+	# Annotating output file -----------------------------------------------------------------------
+	if args.verbose:
+		print("  Annotating tree", flush=True)
+	for c, clade in enumerate(internals.tolist()):
+		T.comments[clade] = '&combined_confidence="' + nodesSupport[c] + '"'
+
+	# Writing file ---------------------------------------------------------------------------------
+	if args.verbose:
+		print("  Exporting tree to", output, flush=True)
+	writeTrees(T, output, "nexus")
+
+	if args.verbose:
+		print("Done", flush=True)
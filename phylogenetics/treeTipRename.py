@@ -3,6 +3,10 @@
 import argparse
 from Bio import Phylo
 import re
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "fasta"))
+from nameMap import openNames, lookupNames
 
 parser = argparse.ArgumentParser(description="")
 
@@ -13,7 +17,7 @@ requiredArgs.add_argument("-t", "--tree", dest="tree", required=True,
 						  help="A tree file.")
 
 requiredArgs.add_argument("-l", "--list", dest="table", required=True,
-					help="A tab delimited file with the tips to be renamed in one column and the new name in a second column.")
+					help="A tab delimited file with the tips to be renamed in one column and the new name in a second column. For very large tables, a database built with nameMap.py (in the 'fasta' folder) can be given instead.")
 
 parser.add_argument("-f", "--format", dest="formaTree", required=False, default='newick',
 					help="The tree file format: accepted formats are: newick (default), nexus, nexml, phyloxml or cdao.")
@@ -44,20 +48,18 @@ T = Phylo.read(args.tree, args.formaTree)
 
 if args.verbose:
 	print("Reading list file:", args.table)
-names = {}
-for line in open(args.table):
-	tmp = line.strip().split()
-	names[tmp[0]]=tmp[1]
+names = openNames(args.table)
 
 # Rename tree --------------------------------------------------------------------------------------
 if args.verbose:
 	print("  Renaming")
 notFound = list()
-for line in T.get_terminals():
-	tip = line.name
-	tip = re.sub("\'", "", tip)
-	if tip in names:
-		line.name = names[tip]
+tips = T.get_terminals()
+found = lookupNames(names, [tip.name.replace("'", "") for tip in tips])
+for line in tips:
+	tip = line.name.replace("'", "")
+	if tip in found:
+		line.name = found[tip]
 	else:
 		notFound.append(tip)
 
@@ -5,8 +5,9 @@ usage()
     echo ""
     echo "A wrapper to trim independently two concatenated genes within a fasta file."
     echo ""
-    echo "Requires the scripts 'fastaSplit.py', 'fastaConcat.py' and the package 'trimAl'" 
-    echo "(from Capella-Gutierrez Silla-Martinez, Gabaldon. Bioinformatics 2009, 25:1972-1973.)"    
+    echo "Requires the script 'alignmentTrim.py' (which replaces the previous 'fastaSplit.py' > 'trimAl' > 'fastaConcat.py'"
+    echo "workflow in one single pass and without temporary files). The gap threshold is applied as in 'trimal -gt'"
+    echo "(from Capella-Gutierrez Silla-Martinez, Gabaldon. Bioinformatics 2009, 25:1972-1973.)"
     echo ""
     echo "Usage: trimTwoGenes.sh -f fastaFile -p position -g gapThreshold"
     echo ""
@@ -36,17 +37,5 @@ while getopts "hf:p:g:" opt; do
 	esac
 done
 
-echo "Splittingfile"
-fastaSplit.py -f $FASTA -p "+$POSITION+" -o tmp -r
-
 echo "Trimming"
-for FILE in $(ls tmp)
-do
-	trimal -in tmp/$FILE -out tmp/${FILE/.fasta/_trim.fasta} -gt $GAPTHRESHOLD
-	rm tmp/$FILE
-done
-
-echo "Concatenating"
-fastaConcat.py -f tmp/${FASTA/.fasta/_1_trim.fasta} tmp/${FASTA/.fasta/_2_trim.fasta} -o ${FASTA/.fasta/_trim.fasta} -a
-
-rm -fr tmp
+alignmentTrim.py -f $FASTA -p "$POSITION" -g $GAPTHRESHOLD -r -o ${FASTA/.fasta/_trim.fasta}